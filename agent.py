@@ -0,0 +1,390 @@
+# agent.py
+"""
+SecureDiary unlock agent.
+
+Unlocks the diary once, keeps the diary key in memory and serves diary
+operations over a Unix domain socket (diary_data/agent.sock, mode 0600,
+same-user peers only). After AUTO_LOCK_TIME without requests the agent
+forgets the key, removes the socket and exits, just like the GUI auto-lock.
+
+Protocol: one JSON object per line in each direction.
+    -> {"op": "fetch", "args": {"filter_mood": "Calm"}}
+    <- {"ok": true, "result": [...]}
+
+Operations: ping, fetch, get, add, update, delete, favorite, search, stats, scrub, metadata, sync, lock.
+
+Start it with `securediary unlock --agent` (see cli.py) or directly:
+    echo "$PW" | python agent.py
+"""
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+from auth import AUTO_LOCK_TIME
+
+SOCKET_PATH = "diary_data/agent.sock"
+IDLE_TIMEOUT = AUTO_LOCK_TIME / 1000  # seconds
+CONNECT_TIMEOUT = 5.0
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+
+class AgentError(Exception):
+    """Raised by AgentClient when the agent reports a failure"""
+
+
+def _peer_uid(sock):
+    """UID of the connected peer (Linux SO_PEERCRED), or None if unsupported"""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _pid, uid, _gid = struct.unpack("3i", creds)
+    return uid
+
+
+class DiaryOperations:
+    """
+    Diary operations bound to an unlocked key.
+    Served by DiaryAgent, and used directly by the CLI when no agent runs.
+    """
+    OPERATIONS = ("fetch", "query", "get", "add", "update", "delete", "favorite", "search", "stats", "scrub",
+                  "metadata", "sync", "archive", "trash", "maintenance", "export")
+
+    def __init__(self, key):
+        self.key = key
+
+    def fetch(self, search_query=None, filter_mood=None, filter_favorite=False, filter_tag=None):
+        from database import fetch_entries
+        return fetch_entries(self.key, search_query, filter_mood, filter_favorite, filter_tag=filter_tag)
+
+    def query(self, explain=False, **fields):
+        """Entries matching an EntryQuery built from `fields`, or its query plan with explain=True"""
+        from entry_query import EntryQuery
+        query = EntryQuery(**fields)
+        return query.explain(self.key) if explain else query.fetch(self.key)
+
+    def get(self, entry_id):
+        from database import get_entry_by_id
+        return get_entry_by_id(entry_id, self.key)
+
+    def add(self, title, content, mood=None, tags=None, created_at=None,
+            updated_at=None, is_favorite=False):
+        from database import add_entry
+        return add_entry(title, content, self.key, mood, tags, created_at=created_at,
+                         updated_at=updated_at, is_favorite=is_favorite)
+
+    def update(self, entry_id, title, content, mood=None, tags=None):
+        """False if the entry already read like this (nothing was written)"""
+        from database import update_entry
+        return update_entry(entry_id, title, content, self.key, mood, tags)
+
+    def delete(self, entry_id):
+        """Move an entry to the trash"""
+        from database import delete_entry
+        delete_entry(entry_id)
+        return True
+
+    def favorite(self, entry_id):
+        from database import toggle_favorite
+        toggle_favorite(entry_id)
+        return True
+
+    def search(self, query, content=False, filter_mood=None, filter_favorite=False):
+        """Title search, or title + decrypted content search with content=True"""
+        from database import fetch_entries
+        if not content:
+            return fetch_entries(self.key, query, filter_mood, filter_favorite)
+        needle = query.lower()
+        return [
+            e for e in fetch_entries(self.key, None, filter_mood, filter_favorite)
+            if needle in e["title"].lower() or (e["decryptable"] and needle in e["content"].lower())
+        ]
+
+    def stats(self):
+        from database import get_stats
+        return get_stats(self.key)
+
+    def scrub(self, max_seconds=None, restart=False, workers=None):
+        """Run (or resume) the integrity scrubber, see scrub.py"""
+        import scrub
+        scrubber = scrub.Scrubber(self.key, workers=workers)
+        if restart:
+            scrubber.restart()
+        return scrub.summary(scrubber.run(max_seconds=max_seconds))
+
+    def metadata(self, encrypt=False):
+        """Encrypted-metadata status; encrypt=True migrates the diary first (see metadata_crypto.py)"""
+        import database
+        sealed = database.encrypt_metadata(self.key) if encrypt else 0
+        return {**database.metadata_status(), "sealed_now": sealed}
+
+    def sync(self, action="run", entry_id=None):
+        """Sync with the shared folder, or report its status / the conflict revisions (see sync.py)"""
+        import sync
+        if action == "status":
+            return sync.status()
+        if action == "revisions":
+            return sync.Sync(self.key).revisions(entry_id)
+        return sync.Sync(self.key).run()
+
+    def archive(self, action="status", months=None):
+        """Archive old entries into packs (see archive.py), restore them, or report; run saves `months` as the age"""
+        import archive
+        if action == "run":
+            if months is not None:
+                archive.set_after_months(months)
+            return {**archive.run(self.key), "status": archive.status()}
+        if action == "restore":
+            return {"restored": archive.restore(self.key), "status": archive.status()}
+        return archive.status()
+
+    def trash(self, action="list", entry_id=None, days=None):
+        """List the trash, restore or purge one entry, or empty it; `days` changes how long entries are kept"""
+        import database
+        import maintenance
+        if days is not None:
+            maintenance.set_trash_days(days)
+        if action == "restore":
+            return {"restored": database.restore_entry(entry_id)}
+        if action == "purge":
+            return {"purged": database.purge_trash([entry_id])}
+        if action == "empty":
+            return {"purged": database.purge_trash()}
+        return {"trash_days": maintenance.trash_days(), "entries": database.fetch_trash(self.key)}
+
+    def export(self, since=None):
+        """
+        Decryptable entries to export, oldest first, and the fingerprints of all entries.
+        `since`: the "fingerprints" of an earlier export; its unchanged entries are left
+        out without being decrypted, and "deleted" lists its entries that are gone.
+        """
+        import database
+        database.backfill_fingerprints(self.key)
+        known = {int(entry_id): tuple(state) for entry_id, state in (since or {}).items()}
+        entries, fingerprints = database.fetch_changed_entries(self.key, known)
+        unchanged = len(fingerprints) - len(entries)
+        undecryptable = [e["id"] for e in entries if not e["decryptable"]]
+        for entry_id in undecryptable:
+            del fingerprints[entry_id]  # exported once they decrypt again
+        return {
+            "entries": [e for e in entries if e["decryptable"]],
+            "fingerprints": fingerprints,
+            "unchanged": unchanged,
+            "deleted": sorted(set(known) - set(fingerprints) - set(undecryptable)),
+            "skipped_undecryptable": len(undecryptable),
+        }
+
+    def maintenance(self, action="status", max_seconds=None):
+        """Purge expired trash and hand free pages back to the file system, or report (see maintenance.py)"""
+        import maintenance
+        if action == "run":
+            return {**maintenance.run_slice(max_seconds), "status": maintenance.status()}
+        return maintenance.status()
+
+
+class RemoteDiary:
+    """Same interface as DiaryOperations, forwarded to a running agent"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        if name not in DiaryOperations.OPERATIONS:
+            raise AttributeError(name)
+        return lambda **args: self.client.request(name, **args)
+
+
+class DiaryAgent(DiaryOperations):
+    """Serves DiaryOperations over the agent socket until idle or locked"""
+
+    def __init__(self, key, idle_timeout=IDLE_TIMEOUT):
+        super().__init__(key)
+        self.idle_timeout = idle_timeout
+        self.last_activity = time.monotonic()
+        self.in_flight = 0  # requests being handled; the idle lock waits for them
+        self._activity_lock = threading.Lock()
+        self.server = None
+
+    def ping(self):
+        return {"pid": os.getpid(), "idle_timeout": self.idle_timeout}
+
+    def lock(self):
+        threading.Thread(target=self.shutdown, daemon=True).start()
+        return True
+
+    # ------------------------------------------------------------ plumbing
+
+    def handle(self, request):
+        with self._activity_lock:
+            self.in_flight += 1
+            self.last_activity = time.monotonic()
+        try:
+            return self._dispatch(request)
+        finally:
+            with self._activity_lock:
+                self.in_flight -= 1
+                self.last_activity = time.monotonic()  # idle time counts from when a long request finished
+
+    def _dispatch(self, request):
+        op = request.get("op")
+        if op not in self.OPERATIONS + ("ping", "lock"):
+            return {"ok": False, "error": f"Unknown operation: {op!r}"}
+        try:
+            return {"ok": True, "result": getattr(self, op)(**request.get("args", {}))}
+        except TypeError as e:
+            return {"ok": False, "error": f"Bad arguments for {op}: {e}"}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    def watch_idle(self):
+        """Lock (exit) once no request has been running or arrived for idle_timeout seconds"""
+        while self.server is not None:
+            with self._activity_lock:
+                busy = self.in_flight > 0
+                remaining = self.idle_timeout - (time.monotonic() - self.last_activity)
+            if busy:
+                remaining = self.idle_timeout  # never lock under a running export or scrub
+            elif remaining <= 0:
+                self.shutdown()
+                return
+            time.sleep(min(remaining, 1.0))
+
+    def shutdown(self):
+        """Forget the key, stop serving and remove the socket"""
+        self.key = None
+        server, self.server = self.server, None
+        if server is not None:
+            server.shutdown()
+
+    def serve(self, path=SOCKET_PATH):
+        agent = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                uid = _peer_uid(self.connection)
+                if uid is not None and uid != os.getuid():
+                    return
+                while agent.key is not None:
+                    line = self.rfile.readline(MAX_REQUEST_BYTES)
+                    if not line:
+                        return
+                    try:
+                        response = agent.handle(json.loads(line))
+                    except ValueError:
+                        response = {"ok": False, "error": "Malformed request"}
+                    self.wfile.write(json.dumps(response, default=str).encode() + b"\n")
+                    self.wfile.flush()
+
+        if os.path.exists(path):
+            if AgentClient(path).is_running():
+                raise RuntimeError(f"An agent is already listening on {path}")
+            os.unlink(path)
+
+        # Create the socket owner-only from the start, not chmod-after-bind
+        old_umask = os.umask(0o177)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(path, Handler)
+        finally:
+            os.umask(old_umask)
+        self.server.daemon_threads = True
+        os.chmod(path, 0o600)
+
+        threading.Thread(target=self.watch_idle, name="idle-lock", daemon=True).start()
+        server = self.server
+        try:
+            server.serve_forever(poll_interval=0.5)
+        finally:
+            self.key = None
+            server.server_close()
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+class AgentClient:
+    """Small blocking client for the agent protocol"""
+
+    def __init__(self, path=SOCKET_PATH, timeout=CONNECT_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.sock = None
+        self.reader = None
+
+    def connect(self):
+        if self.sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            sock.settimeout(None)  # export, scrub or sync may take far longer than connecting
+            self.sock = sock
+            self.reader = sock.makefile("rb")
+        return self
+
+    def close(self):
+        if self.sock is not None:
+            self.reader.close()
+            self.sock.close()
+            self.sock = self.reader = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, op, **args):
+        self.connect()
+        self.sock.sendall(json.dumps({"op": op, "args": args}).encode() + b"\n")
+        line = self.reader.readline()
+        if not line:
+            self.close()
+            raise AgentError("Agent closed the connection")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise AgentError(response.get("error", "Unknown agent error"))
+        return response["result"]
+
+    def is_running(self):
+        """True if an agent answers on the socket"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            self.connect().sock.settimeout(self.timeout)  # a hung agent must not hang the caller
+            self.request("ping")
+            return True
+        except (OSError, ValueError, AgentError):
+            return False
+        finally:
+            self.close()
+
+
+def main(argv=None):
+    import argparse
+    from cli import CliError, unlock
+
+    parser = argparse.ArgumentParser(prog="securediary-agent", description="SecureDiary unlock agent")
+    parser.add_argument("--password-fd", type=int, help="read the master password from this file descriptor")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT, help="seconds before auto-lock")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    args = parser.parse_args(argv)
+
+    try:
+        key = unlock(args)
+    except CliError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return e.exit_code
+
+    agent = DiaryAgent(key, idle_timeout=args.idle_timeout)
+    try:
+        agent.serve(args.socket)
+    except RuntimeError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# analytics.py
+"""
+Writing analytics from unencrypted entry metadata.
+
+Everything here comes from created_at, mood and the word / character counts
+stored at write time (database.fetch_entry_metadata), so no entry is
+decrypted. DiaryAnalytics keeps running aggregates and remembers what each
+entry contributed; a database change only subtracts the old contribution and
+adds the new one instead of rescanning the diary.
+
+    analytics = DiaryAnalytics(key)
+    analytics.load(database.fetch_entry_metadata(key=key))
+    analytics.apply_change(change, entry_id)        # from a change listener
+    analytics.monthly_volume(), analytics.mood_trend(), analytics.streaks()
+    analytics.heatmap                                # [weekday][hour] entry counts
+"""
+from collections import Counter
+from datetime import date, timedelta
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def _when(created_at):
+    """(day 'YYYY-MM-DD', month 'YYYY-MM', weekday 0-6, hour) of a stored timestamp"""
+    text = str(created_at)
+    day = text[:10]
+    hour = int(text[11:13]) if len(text) >= 13 and text[11:13].isdigit() else 0
+    return day, text[:7], date.fromisoformat(day).weekday(), hour
+
+
+class DiaryAnalytics:
+    """Incrementally maintained mood, volume, streak and activity aggregates"""
+
+    def __init__(self, key=None):
+        self.key = key  # names moods when the diary's metadata is encrypted
+        self.clear()
+
+    def clear(self):
+        self.records = {}                 # entry id -> (day, month, weekday, hour, mood, words, chars)
+        self.months = {}                  # month -> [entries, words, characters]
+        self.mood_months = {}             # month -> Counter of moods
+        self.days = Counter()             # day -> entries written
+        self.heatmap = [[0] * 24 for _ in range(7)]
+        self.total_words = 0
+        self.total_characters = 0
+        self.uncounted = 0                # entries without stored counts (not backfilled yet)
+
+    def __len__(self):
+        return len(self.records)
+
+    def load(self, rows):
+        """Rebuild from metadata rows (id, created_at, mood, is_favorite, word_count, char_count)"""
+        self.clear()
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        entry_id, created_at, mood, _favorite, words, chars = row
+        self.remove(entry_id)
+        record = (*_when(created_at), mood, words, chars)
+        self.records[entry_id] = record
+        self._count(record, 1)
+
+    def remove(self, entry_id):
+        record = self.records.pop(entry_id, None)
+        if record is not None:
+            self._count(record, -1)
+
+    def apply_change(self, change, entry_id):
+        """Follow one database change (see database.add_change_listener)"""
+        import database
+        if change == database.ENTRY_FAVORITED:
+            return
+        rows = [] if change == database.ENTRY_DELETED else database.fetch_entry_metadata(entry_id, self.key)
+        if rows:
+            self.add(rows[0])
+        else:
+            self.remove(entry_id)
+
+    def _count(self, record, sign):
+        day, month, weekday, hour, mood, words, chars = record
+        volume = self.months.setdefault(month, [0, 0, 0])
+        volume[0] += sign
+        volume[1] += sign * (words or 0)
+        volume[2] += sign * (chars or 0)
+        if not volume[0]:
+            del self.months[month]
+
+        if mood:
+            moods = self.mood_months.setdefault(month, Counter())
+            moods[mood] += sign
+            if not moods[mood]:
+                del moods[mood]
+            if not moods:
+                del self.mood_months[month]
+
+        self.days[day] += sign
+        if not self.days[day]:
+            del self.days[day]
+        self.heatmap[weekday][hour] += sign
+        self.total_words += sign * (words or 0)
+        self.total_characters += sign * (chars or 0)
+        if words is None:
+            self.uncounted += sign
+
+    # ------------------------------------------------------------ series
+
+    def monthly_volume(self, last=None):
+        """[(month, entries, words, characters)] in calendar order, optionally only the `last` months"""
+        months = sorted(self.months)[-last:] if last else sorted(self.months)
+        return [(month, *self.months[month]) for month in months]
+
+    def mood_trend(self, last=None):
+        """[(month, {mood: entries})] in calendar order"""
+        months = sorted(self.mood_months)[-last:] if last else sorted(self.mood_months)
+        return [(month, dict(self.mood_months[month])) for month in months]
+
+    def streaks(self, today=None):
+        """(current, longest) runs of consecutive days with at least one entry"""
+        if not self.days:
+            return 0, 0
+        days = sorted(date.fromisoformat(day) for day in self.days)
+        longest = run = 1
+        for previous, day in zip(days, days[1:]):
+            run = run + 1 if day - previous == timedelta(days=1) else 1
+            longest = max(longest, run)
+        # The current streak survives until a full day is missed
+        today = today or date.today()
+        current = run if today - days[-1] <= timedelta(days=1) else 0
+        return current, longest
+
+    def summary(self, today=None):
+        current, longest = self.streaks(today)
+        entries = len(self.records)
+        counted = entries - self.uncounted
+        return {
+            "entries": entries,
+            "words": self.total_words,
+            "characters": self.total_characters,
+            "average_words": round(self.total_words / counted) if counted else 0,
+            "active_days": len(self.days),
+            "current_streak": current,
+            "longest_streak": longest,
+            "uncounted": self.uncounted,
+        }
@@ -0,0 +1,288 @@
+# archive.py
+"""
+Cold storage for old entries in compressed, encrypted monthly packs.
+
+`securediary archive run` (or run() below) moves the text of entries older
+than the archive age (24 months by default, kept in the settings table) out
+of their rows and into packs. A pack holds the decrypted texts of entries
+from one month, compressed together and encrypted again as one Fernet token
+in diary.db's entry_packs table. zlib finds the repetition across a month's
+entries, which separately encrypted blobs never expose. A pack holds at most
+PACK_BYTES of text, so reading one old entry never unpacks a whole busy month.
+
+Archived rows keep everything except the text: id, dates, favorite, word
+counts and the (plaintext or sealed) title, mood and tags stay in place and
+indexed. The content column is emptied and pack_id names the pack. Lists,
+filters, stats, EntryQuery and year shards work unchanged, and
+database._row_to_entry unpacks the text on demand through a small cache of
+recently used packs. Pack ids are never reused, so cached packs never go
+stale.
+
+Editing an archived entry writes its text back into the row, which makes it
+hot again. Deleting one moves the row, pack_id included, to the trash, where
+it stays readable until it is purged. Once an entry is edited or purged, its
+old copy stays in the (encrypted) pack until the next run repacks that
+month. restore() moves every archived text back into its row.
+"""
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from cryptography.fernet import Fernet
+
+import database
+import metrics
+import shards
+
+DEFAULT_AFTER_MONTHS = 24
+PACK_BYTES = 256 * 1024   # text per pack, before compression
+PACK_CACHE_SIZE = 8       # unpacked packs kept in memory
+COMPRESS_LEVEL = 6
+
+_cache = OrderedDict()    # (diary key, pack id) -> {entry id: text}
+_cache_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------- reading
+
+def unpack(pack_id, key, conn=None):
+    """
+    {entry id: text} of one pack, from the cache if it was used recently.
+    Pass `conn` to read inside a transaction that connection holds.
+    """
+    cache_key = (key, pack_id)
+    with _cache_lock:
+        members = _cache.get(cache_key)
+        if members is not None:
+            _cache.move_to_end(cache_key)
+            metrics.incr("archive.cache_hits")
+            return members
+    own_conn = conn is None
+    if own_conn:
+        conn = database._connect()
+    try:
+        row = conn.execute("SELECT payload FROM main.entry_packs WHERE id=?", (pack_id,)).fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    if row is None:
+        raise KeyError(f"Archive pack {pack_id} is missing")
+    members = _open(row[0], key)
+    metrics.incr("archive.packs_unpacked")
+    with _cache_lock:
+        _cache[cache_key] = members
+        while len(_cache) > PACK_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return members
+
+
+def clear_cache():
+    """Forget unpacked texts (lock)"""
+    with _cache_lock:
+        _cache.clear()
+
+
+def _seal(members, key):
+    """(encrypted payload, text bytes) of {entry id: text}"""
+    raw = json.dumps({str(entry_id): text for entry_id, text in members.items()}).encode()
+    return Fernet(key).encrypt(zlib.compress(raw, COMPRESS_LEVEL)), len(raw)
+
+
+def _open(payload, key):
+    members = json.loads(zlib.decompress(Fernet(key).decrypt(payload)))
+    return {int(entry_id): text for entry_id, text in members.items()}
+
+
+# ---------------------------------------------------------------- settings
+
+def after_months(conn=None):
+    """Entries older than this many months are archived by run()"""
+    own_conn = conn is None
+    if own_conn:
+        conn = database._connect()
+    row = conn.execute("SELECT value FROM settings WHERE name='archive_after_months'").fetchone()
+    if own_conn:
+        conn.close()
+    return int(row[0]) if row else DEFAULT_AFTER_MONTHS
+
+
+def set_after_months(months):
+    if months < 1:
+        raise ValueError("The archive age must be at least one month")
+    conn = database._connect()
+    conn.execute("INSERT OR REPLACE INTO settings (name, value) VALUES ('archive_after_months', ?)", (str(months),))
+    database._commit(conn)
+    conn.close()
+
+
+def _cutoff(months):
+    """First day ('YYYY-MM-01') of the newest month old enough to archive, exclusive"""
+    today = date.today()
+    index = today.year * 12 + today.month - 1 - months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}-01"
+
+
+def _next_month(month):
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+
+
+@contextmanager
+def _month_tables(conn, month):
+    """Tables that can hold the month's entries: diary.db's, the trash, its year shard's (attached for the block)"""
+    year = int(month[:4])
+    if year not in shards.years():
+        yield ["entries", "main.trash"]
+        return
+    with shards.attached(conn, year) as schema:
+        yield ["entries", "main.trash", f"{schema}.entries"]
+
+
+# ---------------------------------------------------------------- archiving
+
+@metrics.timed("archive.run")
+def run(key, months=None):
+    """
+    Archive the entries older than `months` (default: the configured age), one month
+    per transaction, and repack months whose packs lost entries to edits or deletes.
+    Returns {"months", "archived", "packs", "skipped_undecryptable"}.
+    """
+    conn = database._connect()
+    months = months if months is not None else after_months(conn)
+    report = {"months": 0, "archived": 0, "packs": 0, "skipped_undecryptable": 0}
+    for month in _months_to_pack(conn, _cutoff(months)):
+        with _month_tables(conn, month) as tables:
+            _pack_month(conn, month, tables, key, report)
+    conn.close()
+    return report
+
+
+def _months_to_pack(conn, cutoff):
+    """Months with hot entries older than `cutoff`, and months with stale packs"""
+    months = set()
+    live = {}
+    for table in database._stored_tables(conn):
+        months.update(row[0] for row in conn.execute(
+            f"SELECT DISTINCT substr(created_at, 1, 7) FROM {table} WHERE created_at < ? AND pack_id IS NULL",
+            (cutoff,)))
+        for pack_id, count in conn.execute(
+                f"SELECT pack_id, COUNT(*) FROM {table} WHERE pack_id IS NOT NULL GROUP BY pack_id"):
+            live[pack_id] = live.get(pack_id, 0) + count
+    for pack_id, month, entries in conn.execute("SELECT id, month, entries FROM main.entry_packs"):
+        if live.get(pack_id, 0) < entries:
+            months.add(month)
+    return sorted(months)
+
+
+def _pack_month(conn, month, tables, key, report):
+    """Rewrite one month as fresh packs: its hot entries plus the live members of its old packs"""
+    start, end = f"{month}-01", f"{_next_month(month)}-01"
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        old_packs = [row[0] for row in cur.execute("SELECT id FROM main.entry_packs WHERE month=?", (month,))]
+        members = []  # (created_at, id, table, text, counts for rows without them)
+        archived = 0
+        for table in tables:
+            rows = cur.execute(f"SELECT id, created_at, content, pack_id, word_count FROM {table} "
+                               "WHERE created_at >= ? AND created_at < ?", (start, end)).fetchall()
+            for entry_id, created_at, content, pack_id, word_count in rows:
+                if pack_id is not None:
+                    text = unpack(pack_id, key, conn)[entry_id]
+                else:
+                    try:
+                        text = database.decrypt_content(content, key)
+                    except Exception:
+                        report["skipped_undecryptable"] += 1  # left in place for the scrubber to report
+                        continue
+                    archived += 1
+                counts = database.text_counts(text) if word_count is None else (None, None)
+                members.append((str(created_at), entry_id, table, text, counts))
+        members.sort(key=lambda m: (m[0], m[1]))
+
+        packs = 0
+        for chunk in _chunks(members):
+            payload, text_bytes = _seal({m[1]: m[3] for m in chunk}, key)
+            cur.execute("INSERT INTO main.entry_packs (month, entries, text_bytes, packed_at, payload) "
+                        "VALUES (?, ?, ?, ?, ?)", (month, len(chunk), text_bytes, datetime.now(), payload))
+            pack_id = cur.lastrowid
+            packs += 1
+            for table in tables:
+                cur.executemany(
+                    f"UPDATE {table} SET content=X'', pack_id=?, word_count=coalesce(word_count, ?), "
+                    "char_count=coalesce(char_count, ?) WHERE id=?",
+                    [(pack_id, *m[4], m[1]) for m in chunk if m[2] == table])
+        if old_packs:
+            cur.execute(f"DELETE FROM main.entry_packs WHERE id IN ({','.join('?' * len(old_packs))})", old_packs)
+        database._commit(conn)
+    except Exception:
+        conn.rollback()
+        raise
+    report["months"] += 1
+    report["archived"] += archived
+    report["packs"] += packs
+    metrics.incr("archive.entries_archived", archived)
+
+
+def _chunks(members):
+    """Consecutive runs of members holding about PACK_BYTES of text each"""
+    chunk, size = [], 0
+    for member in members:
+        chunk.append(member)
+        size += len(member[3])
+        if size >= PACK_BYTES:
+            yield chunk
+            chunk, size = [], 0
+    if chunk:
+        yield chunk
+
+
+@metrics.timed("archive.restore")
+def restore(key):
+    """Move every archived text back into its row (encrypted as usual) and drop the packs; returns entries restored"""
+    conn = database._connect()
+    months = [row[0] for row in conn.execute("SELECT DISTINCT month FROM main.entry_packs ORDER BY month")]
+    restored = 0
+    for month in months:
+        with _month_tables(conn, month) as tables:
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                for (pack_id,) in cur.execute("SELECT id FROM main.entry_packs WHERE month=?", (month,)).fetchall():
+                    members = unpack(pack_id, key, conn)
+                    for table in tables:
+                        ids = [row[0] for row in cur.execute(f"SELECT id FROM {table} WHERE pack_id=?", (pack_id,))]
+                        cur.executemany(f"UPDATE {table} SET content=?, pack_id=NULL WHERE id=?",
+                                        [(database.encrypt_content(members[i], key), i) for i in ids])
+                        restored += len(ids)
+                cur.execute("DELETE FROM main.entry_packs WHERE month=?", (month,))
+                database._commit(conn)
+            except Exception:
+                conn.rollback()
+                raise
+    conn.close()
+    clear_cache()
+    return restored
+
+
+def status():
+    """Archive age, packs and their sizes; needs no key"""
+    conn = database._connect()
+    packs, months, text_bytes, pack_bytes = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT month), COALESCE(SUM(text_bytes), 0), COALESCE(SUM(length(payload)), 0) "
+        "FROM main.entry_packs").fetchone()
+    archived = sum(conn.execute(f"SELECT COUNT(*) FROM {table} WHERE pack_id IS NOT NULL").fetchone()[0]
+                   for table in database._entry_tables(conn))
+    result = {
+        "after_months": after_months(conn),
+        "archived_entries": archived,
+        "months": months,
+        "packs": packs,
+        "text_bytes": text_bytes,
+        "pack_bytes": pack_bytes,
+    }
+    conn.close()
+    return result
@@ -0,0 +1,339 @@
+# async_db.py
+"""
+asyncio facade over database.py.
+
+AsyncDiary owns one long-lived SQLite connection on a dedicated single-thread
+executor (so every statement runs on the thread that opened it) and a small
+thread pool for Fernet encryption/decryption. Coroutines never block the
+event loop.
+
+    diary = AsyncDiary(key)
+    entries = await diary.fetch_entries(filter_mood="Calm")
+    async for page in diary.iter_pages(page_size=200):
+        ...
+    ids = await diary.add_entries(generate_entries())  # bounded in-flight chunks
+    await diary.close()
+
+Writes call database change listeners like the synchronous API does.
+
+Cancellation: cancelling a read interrupts the running SQLite statement and
+drops pending decryption chunks. Writes are never interrupted: a cancelled
+write that has not started is dropped, one already running still commits
+(and notifies listeners) on the db thread. Bulk writes commit chunk by chunk;
+chunks committed by the time the task is cancelled stay in the diary.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import database
+import metrics
+
+DECRYPT_CHUNK = 256       # rows per crypto-pool job
+BULK_CHUNK = 200          # entries per bulk-write transaction
+MAX_IN_FLIGHT_CHUNKS = 4  # backpressure for add_entries
+
+
+async def _chunks(entries, size):
+    """Group a sync or async iterable into lists of `size`"""
+    chunk = []
+    if hasattr(entries, "__aiter__"):
+        async for entry in entries:
+            chunk.append(entry)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    else:
+        for entry in entries:
+            chunk.append(entry)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+class AsyncDiary:
+    """Async access to the diary with a bound key"""
+
+    def __init__(self, key, crypto_workers=None, max_in_flight=MAX_IN_FLIGHT_CHUNKS):
+        self.key = key
+        self.max_in_flight = max_in_flight
+        self._local = threading.local()
+        self._connections = []
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diary-db")
+        self._crypto = ThreadPoolExecutor(max_workers=crypto_workers or min(4, os.cpu_count() or 1),
+                                          thread_name_prefix="diary-crypto")
+        self._active_job = None  # (job, conn) of the running read
+        self._job_lock = threading.Lock()  # a cancel must not interrupt the job that follows
+        self._closed = False
+
+    # ------------------------------------------------------------ executors
+
+    def _conn(self):
+        """Connection owned by the db executor thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            metrics.incr("db.connections")
+            conn = sqlite3.connect(database.DB_PATH)
+            self._local.conn = conn
+            self._connections.append(conn)
+        return conn
+
+    async def _run_db(self, fn, *args, write=False):
+        """
+        Run fn(conn, *args) on the db thread. Cancelling a read interrupts its
+        statement; a running write is left to finish, so it never commits halfway.
+        """
+        if self._closed:
+            raise RuntimeError("AsyncDiary is closed")
+        loop = asyncio.get_running_loop()
+        job = object()
+
+        def run():
+            conn = self._conn()
+            with self._job_lock:
+                self._active_job = None if write else (job, conn)
+            try:
+                return fn(conn, *args)
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()  # never leave a failed statement's changes for the next commit
+                raise
+            finally:
+                with self._job_lock:
+                    self._active_job = None
+
+        future = loop.run_in_executor(self._db, run)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            with self._job_lock:
+                active = self._active_job
+                if active is not None and active[0] is job:
+                    # Already running: abort the statement instead of waiting for it
+                    # (cancelling the asyncio future would not stop the executor thread)
+                    active[1].interrupt()
+                else:
+                    future.cancel()  # not started yet (or a write, which is left to finish)
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())  # nobody awaits it now
+            raise
+
+    async def _run_crypto(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._crypto, fn, *args)
+
+    async def _decrypt_rows(self, rows, undecryptable_text=database.UNDECRYPTABLE_TEXT):
+        """Decrypt rows in parallel chunks on the crypto pool, preserving order"""
+        if not rows:
+            return []
+        database._count_decrypted(rows)
+        key = self.key
+
+        def decrypt(chunk):
+            return database._rows_to_entries(chunk, key, undecryptable_text)
+
+        tasks = [asyncio.ensure_future(self._run_crypto(decrypt, rows[i:i + DECRYPT_CHUNK]))
+                 for i in range(0, len(rows), DECRYPT_CHUNK)]
+        try:
+            pages = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return [entry for page in pages for entry in page]
+
+    # ------------------------------------------------------------ reads
+
+    async def fetch_entries(self, search_query=None, filter_mood=None, filter_favorite=False,
+                            limit=None, offset=0):
+        def select(conn):
+            return database._select_entry_rows(conn.cursor(), search_query, filter_mood,
+                                               filter_favorite, limit, offset, key=self.key)
+        return await self._decrypt_rows(await self._run_db(select))
+
+    async def count_entries(self, search_query=None, filter_mood=None, filter_favorite=False):
+        def count(conn):
+            return database._count_entries(conn, search_query, filter_mood, filter_favorite, key=self.key)
+        return await self._run_db(count)
+
+    async def get_entry_by_id(self, entry_id):
+        row = await self._run_db(database._select_entry_row, entry_id)
+        if row is None:
+            return None
+        return (await self._decrypt_rows([row], "🔒 Undecryptable"))[0]
+
+    async def get_stats(self):
+        return await self._run_db(database._stats, self.key)
+
+    async def iter_pages(self, search_query=None, filter_mood=None, filter_favorite=False,
+                         page_size=100):
+        """
+        Async iterator over decrypted pages, newest first.
+        Uses keyset paging and reads the next page while the caller handles the current one.
+        """
+        def select(conn, after):
+            return database._select_entry_rows(conn.cursor(), search_query, filter_mood,
+                                               filter_favorite, page_size, 0, after, key=self.key)
+
+        next_rows = asyncio.ensure_future(self._run_db(select, None))
+        try:
+            while True:
+                rows = await next_rows
+                if not rows:
+                    return
+                if len(rows) == page_size:
+                    last = rows[-1]
+                    next_rows = asyncio.ensure_future(self._run_db(select, (last[5], last[0])))
+                else:
+                    next_rows = None
+                yield await self._decrypt_rows(rows)
+                if next_rows is None:
+                    return
+        finally:
+            if next_rows is not None and not next_rows.done():
+                next_rows.cancel()
+
+    async def iter_entries(self, search_query=None, filter_mood=None, filter_favorite=False,
+                           page_size=100):
+        """Async iterator over single decrypted entries"""
+        async for page in self.iter_pages(search_query, filter_mood, filter_favorite, page_size):
+            for entry in page:
+                yield entry
+
+    # ------------------------------------------------------------ writes
+
+    async def add_entry(self, title, content, mood=None, tags=None, created_at=None,
+                        updated_at=None, is_favorite=False):
+        enc_content = await self._run_crypto(database.encrypt_content, content, self.key)
+        sealed = await self._run_crypto(database.seal_metadata, title, mood, tags, self.key)
+        fingerprint = database.entry_fingerprint(title, content, mood, tags, self.key)
+        now = datetime.now()
+
+        def insert(conn):
+            entry_id = database._insert_entry(conn.cursor(), title, enc_content, mood, tags,
+                                              created_at or now, updated_at or created_at or now,
+                                              is_favorite, *database.text_counts(content), sealed, fingerprint)
+            database._commit(conn)
+            database._notify(database.ENTRY_ADDED, entry_id)
+            return entry_id
+        return await self._run_db(insert, write=True)
+
+    async def update_entry(self, entry_id, title, content, mood=None, tags=None):
+        """Returns False, having written nothing, if nothing changed; an unchanged text is not encrypted again"""
+        key = self.key
+        fingerprint = database.entry_fingerprint(title, content, mood, tags, key)
+        stored = await self._run_db(database._stored_fingerprint, entry_id)
+        if stored == fingerprint:
+            metrics.incr("db.unchanged_updates")
+            return False
+        enc_content = None
+        if stored is None or stored.content != fingerprint.content:
+            enc_content = await self._run_crypto(database.encrypt_content, content, key)
+        sealed = await self._run_crypto(database.seal_metadata, title, mood, tags, key)
+
+        def update(conn):
+            text = enc_content
+            if text is None and database._stored_fingerprint(conn, entry_id) != stored:
+                text = database.encrypt_content(content, key)  # changed by another process meanwhile
+            changed = database._update_entry(conn.cursor(), entry_id, title, text, mood, tags, datetime.now(),
+                                             *database.text_counts(content), sealed, fingerprint)
+            database._commit(conn)
+            if changed:
+                database._notify(database.ENTRY_UPDATED, entry_id)
+            return changed
+        return await self._run_db(update, write=True)
+
+    async def delete_entry(self, entry_id):
+        def delete(conn):
+            database._delete_entry(conn.cursor(), entry_id)
+            database._commit(conn)
+            database._notify(database.ENTRY_DELETED, entry_id)
+        await self._run_db(delete, write=True)
+
+    async def toggle_favorite(self, entry_id):
+        def toggle(conn):
+            database._toggle_favorite(conn.cursor(), entry_id)
+            database._commit(conn)
+            database._notify(database.ENTRY_FAVORITED, entry_id)
+        await self._run_db(toggle, write=True)
+
+    async def add_entries(self, entries, chunk_size=BULK_CHUNK):
+        """
+        Bulk insert entry dicts (title, content, mood, tags, created_at, ...) from a sync or
+        async iterable. Chunks are encrypted in parallel and committed in order; at most
+        max_in_flight chunks are buffered, so a fast producer is slowed to the write rate.
+        Returns the new ids in input order.
+        """
+        key = self.key
+
+        def encrypt(chunk):
+            now = datetime.now()
+            return [(
+                e["title"], database.encrypt_content(e["content"], key), e.get("mood"), e.get("tags"),
+                e.get("created_at") or now, e.get("updated_at") or e.get("created_at") or now,
+                e.get("is_favorite", False), *database.text_counts(e["content"]),
+                database.seal_metadata(e["title"], e.get("mood"), e.get("tags"), key),
+                database.entry_fingerprint(e["title"], e["content"], e.get("mood"), e.get("tags"), key)
+            ) for e in chunk]
+
+        def insert(conn, rows):
+            cur = conn.cursor()
+            ids = [database._insert_entry(cur, *row) for row in rows]
+            database._commit(conn)
+            for entry_id in ids:
+                database._notify(database.ENTRY_ADDED, entry_id)
+            return ids
+
+        async def write_chunk(chunk, previous):
+            rows = await self._run_crypto(encrypt, chunk)
+            if previous is not None:
+                await previous  # keep commit order == input order
+            return await self._run_db(insert, rows, write=True)
+
+        ids = []
+        in_flight = deque()
+        try:
+            async for chunk in _chunks(entries, chunk_size):
+                if len(in_flight) >= self.max_in_flight:
+                    ids.extend(await in_flight.popleft())
+                previous = in_flight[-1] if in_flight else None
+                in_flight.append(asyncio.ensure_future(write_chunk(chunk, previous)))
+            while in_flight:
+                ids.extend(await in_flight.popleft())
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            raise
+        return ids
+
+    # ------------------------------------------------------------ lifecycle
+
+    async def close(self):
+        """Finish queued work, close the connection and forget the key"""
+        if self._closed:
+            return
+        self._closed = True
+
+        def close_conn():
+            conn = getattr(self._local, "conn", None)
+            if conn is not None:
+                conn.close()
+                self._local.conn = None
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._db, close_conn)
+        self._db.shutdown(wait=True)
+        self._crypto.shutdown(wait=True)
+        self._connections.clear()
+        self.key = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -5,11 +5,15 @@ import base64
 import uuid
 import platform
 
+import metrics
+
 MASTER_FILE = "diary_data/master.key"
 SALT_FILE = "diary_data/salt.bin"
 DEVICE_FILE = "diary_data/device.lock"
 KDF_ITERATIONS = 200_000
+AUTO_LOCK_TIME = 10 * 60 * 1000  # 10 minutes auto-lock (ms), shared by the GUI and the agent
 
+@metrics.timed("auth.get_kek")
 def get_kek(password: str) -> bytes:
     """Key-encryption-key derived from master password + salt.bin"""
     if not os.path.exists(SALT_FILE):
@@ -18,20 +22,24 @@ def get_kek(password: str) -> bytes:
         salt = f.read()
     return get_key_from_password(password, salt)
 
+@metrics.timed("auth.generate_salt")
 def generate_salt():
     return os.urandom(16)
 
 
+@metrics.timed("auth.get_key_from_password")
 def get_key_from_password(password: str, salt: bytes) -> bytes:
     key = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, KDF_ITERATIONS, dklen=32)
     return base64.urlsafe_b64encode(key)
 
 
+@metrics.timed("auth.get_device_id")
 def get_device_id() -> str:
     sys_info = platform.node() + platform.system() + str(uuid.getnode())
     return hashlib.sha256(sys_info.encode()).hexdigest()[:32]
 
 
+@metrics.timed("auth.create_master_password")
 def create_master_password(password: str):
     if not os.path.exists("diary_data"):
         os.makedirs("diary_data", exist_ok=True)
@@ -47,6 +55,7 @@ def create_master_password(password: str):
         f.write(get_device_id())
 
 
+@metrics.timed("auth.verify_master_password")
 def verify_master_password(password: str) -> bool:
     if not os.path.exists(MASTER_FILE) or not os.path.exists(SALT_FILE):
         return False
@@ -68,6 +77,7 @@ def verify_master_password(password: str) -> bool:
         return False
 
 
+@metrics.timed("auth.check_password_strength")
 def check_password_strength(password: str) -> tuple[str, str]:
     """Returns (strength_level, color) tuple"""
     score = 0
@@ -0,0 +1,4 @@
+"""
+SecureDiary Benchmarks
+Performance harness and synthetic diary generator
+"""
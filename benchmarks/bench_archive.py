@@ -0,0 +1,103 @@
+# benchmarks/bench_archive.py
+"""
+Archive pack benchmark.
+
+Builds a synthetic diary spanning ten years, times the common reads, then
+archives everything older than the archive age (archive.py) and compacts
+diary.db, and times the same reads again. Reading an old entry is timed
+both with its pack unpacked from disk (cold) and from the pack cache (warm).
+
+Usage (from the repository root):
+    python -m benchmarks.bench_archive
+    python -m benchmarks.bench_archive --entries 100k --months 12
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date
+
+import archive
+import auth
+import database
+import shards
+from benchmarks.bench_db import BENCH_PASSWORD, diary_workdir
+from benchmarks.synthetic import format_size, parse_size, populate
+from entry_query import EntryQuery
+
+DEFAULT_OUTPUT = "benchmarks/archive.json"
+
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def measure(key, old_ids, repeat):
+    rng = random.Random(1)
+
+    def cold_get():
+        archive.clear_cache()
+        database.get_entry_by_id(rng.choice(old_ids), key)
+
+    archive.clear_cache()
+    old_page = EntryQuery(date_to=date(date.today().year - 3, 12, 31), limit=50)
+    return {
+        "fetch_page_ms": median_ms(lambda: database.fetch_entries(key, limit=50), repeat),
+        "fetch_old_page_ms": median_ms(lambda: old_page.fetch(key), repeat),
+        "get_old_cold_ms": median_ms(cold_get, repeat * 4),
+        "get_old_warm_ms": median_ms(lambda: database.get_entry_by_id(old_ids[0], key), repeat * 4),
+        "fetch_all_ms": median_ms(lambda: database.fetch_entries(key), max(1, repeat // 3)),
+        "get_stats_ms": median_ms(lambda: database.get_stats(key), repeat),
+        "db_bytes": os.path.getsize(database.DB_PATH),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare reads before and after archiving old entries")
+    parser.add_argument("--entries", default="10k", help="synthetic diary size, e.g. 10k, 100k")
+    parser.add_argument("--months", type=int, default=archive.DEFAULT_AFTER_MONTHS,
+                        help="archive entries older than this many months")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output)
+    count = parse_size(args.entries)
+
+    with diary_workdir():
+        auth.create_master_password(BENCH_PASSWORD)
+        database.init_db()
+        key = database.load_or_create_diary_key(BENCH_PASSWORD)
+        populate(database.DB_PATH, key, count)
+        old_ids = [e["id"] for e in EntryQuery(order="oldest", limit=1000).fetch(key)]
+
+        before = measure(key, old_ids, args.repeat)
+        start = time.perf_counter()
+        report = archive.run(key, args.months)
+        archive_s = time.perf_counter() - start
+        shards.compact()  # VACUUM diary.db: archiving frees the pages, compacting returns them
+        after = measure(key, old_ids, args.repeat)
+        status = archive.status()
+
+    print(f"🗄️ {format_size(count)} entries: archived {report['archived']} into {report['packs']} packs "
+          f"in {archive_s:.1f} s ({status['text_bytes'] / 1e6:.1f} MB of text -> {status['pack_bytes'] / 1e6:.1f} MB)")
+    for name in before:
+        print(f"   {name:<18} before {before[name]:>12}  after {after[name]:>12}")
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"entries": count, "months": args.months, "archive_seconds": round(archive_s, 2),
+                   "archive": status, "before": before, "after": after}, f, indent=2)
+    print(f"✅ Report written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+# benchmarks/bench_db.py
+"""
+Database benchmark harness.
+
+Builds a synthetic diary of each requested size in a throwaway directory,
+times the public database.py / auth.py operations against it and writes the
+results to JSON. When a baseline file exists, every operation is compared
+against it and the run fails if anything regressed past the threshold.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_db --sizes 1k,10k
+    python -m benchmarks.bench_db --sizes 1k,10k,100k,1m --save-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import auth
+import database
+from benchmarks.synthetic import MOODS, format_size, parse_size, populate
+
+BENCH_PASSWORD = "Bench-Password-123!"
+DEFAULT_SIZES = "1k,10k"
+DEFAULT_OUTPUT = "benchmarks/results.json"
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+DEFAULT_THRESHOLD = 0.25  # 25% slower than baseline counts as a regression
+
+
+@contextmanager
+def diary_workdir(keep=False):
+    """Run inside a fresh directory so the relative diary_data/ paths are isolated"""
+    old_cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="securediary-bench-")
+    os.chdir(workdir)
+    try:
+        yield workdir
+    finally:
+        os.chdir(old_cwd)
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def measure(fn, repeat):
+    """Call fn `repeat` times and summarize wall-clock timings in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples):
+    return {
+        "runs": len(samples),
+        "min_ms": round(min(samples), 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "max_ms": round(max(samples), 4),
+    }
+
+
+def scaled_repeat(repeat, size):
+    """Operations that touch every row get fewer repetitions on big diaries"""
+    return max(1, min(repeat, (repeat * 10_000) // max(size, 1)))
+
+
+def bench_size(size, repeat, seed, keep=False):
+    """Benchmark every operation against one diary size"""
+    rng = random.Random(seed)
+    results = {}
+
+    with diary_workdir(keep=keep) as workdir:
+        auth.create_master_password(BENCH_PASSWORD)
+
+        results["init_db"] = measure(database.init_db, repeat)
+
+        def unlock():
+            assert auth.verify_master_password(BENCH_PASSWORD)
+            return database.load_or_create_diary_key(BENCH_PASSWORD)
+
+        key = unlock()  # first call creates diary.key
+        results["unlock"] = measure(unlock, max(1, repeat // 2))
+
+        start = time.perf_counter()
+        populate(database.DB_PATH, key, size, seed=seed)
+        populate_s = time.perf_counter() - start
+
+        # Re-opening a populated diary is what every login pays
+        results["init_db_populated"] = measure(database.init_db, repeat)
+
+        add_samples = []
+        for i in range(repeat * 10):
+            t0 = time.perf_counter()
+            database.add_entry(f"Benchmark entry {i}", "Short benchmark text. " * 40, key,
+                               rng.choice(MOODS), "bench, synthetic")
+            add_samples.append((time.perf_counter() - t0) * 1000)
+        results["add_entry"] = summarize(add_samples)
+
+        fetch_repeat = scaled_repeat(repeat, size)
+        filters = {
+            "fetch_entries_all": {},
+            "fetch_entries_search": {"search_query": "morning"},
+            "fetch_entries_mood": {"filter_mood": "Calm"},
+            "fetch_entries_favorites": {"filter_favorite": True},
+            "fetch_entries_combined": {"search_query": "day", "filter_mood": "Happy",
+                                       "filter_favorite": True},
+        }
+        for name, kwargs in filters.items():
+            results[name] = measure(lambda kw=kwargs: database.fetch_entries(key, **kw), fetch_repeat)
+
+        conn = sqlite3.connect(database.DB_PATH)
+        max_id = conn.execute("SELECT MAX(id) FROM entries").fetchone()[0]
+        conn.close()
+        ids = [rng.randint(1, max_id) for _ in range(repeat * 20)]
+
+        id_iter = iter(ids)
+        results["get_entry_by_id"] = measure(lambda: database.get_entry_by_id(next(id_iter), key), len(ids))
+        results["get_stats"] = measure(lambda: database.get_stats(key), fetch_repeat)
+
+        delete_ids = iter(rng.sample(range(1, max_id + 1), min(max_id, repeat * 10)))
+        results["delete_entry"] = measure(lambda: database.delete_entry(next(delete_ids)), repeat * 10)
+
+        db_bytes = os.path.getsize(database.DB_PATH)
+        if keep:
+            print(f"  kept diary at {workdir}")
+
+    return {
+        "entries": size,
+        "populate_s": round(populate_s, 3),
+        "db_bytes": db_bytes,
+        "operations": results,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare median timings with the baseline.
+    Returns a list of (size, operation, baseline_ms, current_ms, ratio) regressions.
+    """
+    regressions = []
+    for label, current in results["sizes"].items():
+        base = baseline.get("sizes", {}).get(label)
+        if not base:
+            continue
+        for op, stats in current["operations"].items():
+            base_stats = base["operations"].get(op)
+            if not base_stats or base_stats["median_ms"] <= 0:
+                continue
+            ratio = stats["median_ms"] / base_stats["median_ms"]
+            marker = "❌" if ratio > 1 + threshold else "  "
+            print(f"{marker} {label:>5} {op:<28} {base_stats['median_ms']:>10.3f} ms -> "
+                  f"{stats['median_ms']:>10.3f} ms  ({ratio:5.2f}x)")
+            if ratio > 1 + threshold:
+                regressions.append((label, op, base_stats["median_ms"], stats["median_ms"], ratio))
+    return regressions
+
+
+def environment_info():
+    try:
+        import cryptography
+        crypto_version = cryptography.__version__
+    except Exception:
+        crypto_version = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sqlite": sqlite3.sqlite_version,
+        "cryptography": crypto_version,
+        "kdf_iterations": auth.KDF_ITERATIONS,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark SecureDiary's database layer")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help="comma separated diary sizes, e.g. 1k,10k,100k,1m")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions per operation")
+    parser.add_argument("--seed", type=int, default=42, help="synthetic diary seed")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write results JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown ratio before a regression is reported")
+    parser.add_argument("--keep", action="store_true", help="keep the generated diaries on disk")
+    args = parser.parse_args(argv)
+
+    # Resolve paths before the harness starts changing directories
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline)
+
+    results = {"meta": {**environment_info(), "seed": args.seed, "repeat": args.repeat}, "sizes": {}}
+    for raw in args.sizes.split(","):
+        size = parse_size(raw)
+        label = format_size(size)
+        print(f"📊 Benchmarking {label} entries...")
+        results["sizes"][label] = bench_size(size, args.repeat, args.seed, keep=args.keep)
+        for op, stats in results["sizes"][label]["operations"].items():
+            print(f"   {op:<28} median {stats['median_ms']:>10.3f} ms")
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {output}")
+
+    if args.save_baseline:
+        shutil.copyfile(output, baseline_path)
+        print(f"✅ Baseline saved to {baseline_path}")
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print("ℹ️ No baseline found; run with --save-baseline to create one.")
+        return 0
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"❌ {len(regressions)} operation(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    print("✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
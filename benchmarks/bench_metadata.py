@@ -0,0 +1,138 @@
+# benchmarks/bench_metadata.py
+"""
+Encrypted metadata benchmark.
+
+Builds a synthetic diary of each requested size, times the list filters,
+counts and stats with plaintext titles / moods / tags, migrates the diary
+with database.encrypt_metadata and times the same operations against the
+blind indexes. The run fails if any encrypted filter query plan scans the
+entries table without an index.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_metadata
+    python -m benchmarks.bench_metadata --sizes 10k,100k --repeat 10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import auth
+import database
+from benchmarks.bench_db import BENCH_PASSWORD, diary_workdir, measure, scaled_repeat
+from benchmarks.synthetic import format_size, parse_size, populate
+
+DEFAULT_OUTPUT = "benchmarks/metadata.json"
+DEFAULT_SIZES = "1k,10k"
+PAGE = 100
+
+FILTERS = {
+    "page_all": {},
+    "page_mood": {"filter_mood": "Calm"},
+    "page_tag": {"filter_tag": "work"},
+    "page_title": {"search_query": "morning"},
+    "page_title_prefix": {"search_query": "quiet mor"},
+    "page_combined": {"search_query": "day", "filter_mood": "Happy", "filter_favorite": True},
+}
+
+
+def bench_operations(key, repeat, size):
+    results = {}
+    for name, kwargs in FILTERS.items():
+        results[name] = measure(lambda kw=kwargs: database.fetch_entries(key, limit=PAGE, **kw), repeat)
+        results[name.replace("page", "count")] = measure(
+            lambda kw=kwargs: database.count_entries(key=key, **kw), scaled_repeat(repeat, size))
+    results["get_stats"] = measure(lambda: database.get_stats(key), scaled_repeat(repeat, size))
+    counter = iter(range(repeat * 10))
+    results["add_entry"] = measure(
+        lambda: database.add_entry(f"Benchmark morning {next(counter)}", "Short benchmark text. " * 40, key,
+                                   "Calm", "bench, work"), repeat * 10)
+    return results
+
+
+def query_plans(key):
+    """EXPLAIN QUERY PLAN of every filtered list and count query"""
+    conn = database._connect()
+    plans = {}
+    for name, kwargs in FILTERS.items():
+        if not kwargs:
+            continue
+        where, params = database._filter_sql(key=key, paged=True, **kwargs)
+        plans[name] = [row[3] for row in conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT {database.ENTRY_COLUMNS} FROM entries{where} "
+            f"ORDER BY created_at DESC, id DESC LIMIT {PAGE}", params)]
+        where, params = database._filter_sql(key=key, **kwargs)
+        plans[name.replace("page", "count")] = [row[3] for row in conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT COUNT(*) FROM entries{where}", params)]
+    conn.close()
+    return plans
+
+
+def bench_size(size, repeat, seed):
+    with diary_workdir():
+        auth.create_master_password(BENCH_PASSWORD)
+        database.init_db()
+        key = database.load_or_create_diary_key(BENCH_PASSWORD)
+        populate(database.DB_PATH, key, size, seed=seed)
+        database.init_db()
+
+        plaintext = bench_operations(key, repeat, size)
+        plaintext_bytes = os.path.getsize(database.DB_PATH)
+
+        start = time.perf_counter()
+        database.encrypt_metadata(key)
+        migrate_s = time.perf_counter() - start
+
+        encrypted = bench_operations(key, repeat, size)
+        plans = query_plans(key)
+        encrypted_bytes = os.path.getsize(database.DB_PATH)
+
+    return {
+        "entries": size,
+        "migrate_s": round(migrate_s, 3),
+        "db_bytes": {"plaintext": plaintext_bytes, "encrypted": encrypted_bytes},
+        "plaintext": plaintext,
+        "encrypted": encrypted,
+        "overhead": {op: round(encrypted[op]["median_ms"] / plaintext[op]["median_ms"], 2)
+                     for op in plaintext if plaintext[op]["median_ms"] > 0},
+        "plans": plans,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark encrypted titles, moods and tags")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated diary sizes, e.g. 1k,10k,100k")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions per operation")
+    parser.add_argument("--seed", type=int, default=42, help="synthetic diary seed")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output)
+
+    results = {}
+    failed = False
+    for raw in args.sizes.split(","):
+        size = parse_size(raw)
+        label = format_size(size)
+        print(f"🔐 Benchmarking {label} entries...")
+        result = bench_size(size, args.repeat, args.seed)
+        results[label] = result
+        print(f"   migration {result['migrate_s']:.2f} s, file {result['db_bytes']['plaintext']:,} -> "
+              f"{result['db_bytes']['encrypted']:,} bytes")
+        for op in result["plaintext"]:
+            print(f"   {op:<20} plaintext {result['plaintext'][op]['median_ms']:>9.3f} ms  "
+                  f"encrypted {result['encrypted'][op]['median_ms']:>9.3f} ms  ({result['overhead'].get(op, 0):5.2f}x)")
+        for query, plan in result["plans"].items():
+            if any(step.startswith("SCAN entries") and "INDEX" not in step for step in plan):
+                print(f"❌ {query} scans the entries table: {plan}")
+                failed = True
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"repeat": args.repeat, "page": PAGE, "results": results}, f, indent=2)
+    print(f"✅ Report written to {output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# benchmarks/bench_related.py
+"""
+Related-entries benchmark.
+
+Indexes synthetic entries (no database or encryption involved, only the
+RelatedIndex the diary window builds after unlock), then times top-k queries
+for random entries, re-indexing edited ones, and queries again while the
+edits wait in the index's tail. The matrix and postings rebuild a query
+makes once the tail outgrows REBUILD_TAIL is timed on its own. The run fails
+if the p95 query time at any size is over budget.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_related
+    python -m benchmarks.bench_related --sizes 10k,50k --queries 200 --budget-ms 10
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+from benchmarks.bench_search import percentile
+from benchmarks.synthetic import generate_entries, parse_size, format_size
+from related import BUILD_PAGE, RelatedIndex, TOP_K
+
+DEFAULT_OUTPUT = "benchmarks/related.json"
+DEFAULT_SIZES = "10k,50k"
+DEFAULT_BUDGET_MS = 10
+
+
+def build_index(entries):
+    """Index the entries page by page with one rebuild at the end, the way RelatedIndexer does"""
+    index = RelatedIndex()
+    start = time.perf_counter()
+    for i in range(0, len(entries), BUILD_PAGE):
+        index.add_many([(i + j + 1, e["title"], e["content"])
+                        for j, e in enumerate(entries[i:i + BUILD_PAGE])])
+    index.rebuild()
+    return index, time.perf_counter() - start
+
+
+def timed_ms(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark related-entries queries")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated entry counts, e.g. 10k,50k")
+    parser.add_argument("--queries", type=int, default=200, help="timed queries (and edits) per size")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="maximum p95 query time")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+
+    results = {}
+    failed = False
+    for count in [parse_size(s) for s in args.sizes.split(",")]:
+        label = format_size(count)
+        entries = list(generate_entries(count))
+        index, build_seconds = build_index(entries)
+        rng = random.Random(7)
+
+        queries = [timed_ms(lambda: index.related(rng.randint(1, count), TOP_K)) for _ in range(args.queries)]
+        edits = []
+        for _ in range(args.queries):
+            entry_id = rng.randint(1, count)
+            entry = entries[entry_id - 1]
+            edits.append(timed_ms(lambda: index.add(entry_id, entry["title"], entry["content"] + " edited")))
+        after_edits = [timed_ms(lambda: index.related(rng.randint(1, count), TOP_K)) for _ in range(args.queries)]
+        rebuild_ms = timed_ms(index.rebuild)
+
+        samples = queries + after_edits
+        result = {
+            "build_s": round(build_seconds, 2),
+            "vocabulary": len(index.term_id),
+            "dense_terms": index.dense.shape[1],
+            "postings": len(index.post_slots),
+            "p50_ms": round(statistics.median(samples), 3),
+            "p95_ms": round(percentile(samples, 0.95), 3),
+            "max_ms": round(max(samples), 3),
+            "edit_p50_ms": round(statistics.median(edits), 3),
+            "edit_max_ms": round(max(edits), 3),
+            "rebuild_ms": round(rebuild_ms, 1),
+        }
+        results[label] = result
+        print(f"🔗 {label:>5} entries  build {result['build_s']:6.2f} s  "
+              f"p50 {result['p50_ms']:6.2f} ms  p95 {result['p95_ms']:6.2f} ms  max {result['max_ms']:6.2f} ms  "
+              f"edit p50 {result['edit_p50_ms']:5.2f} ms  rebuild {result['rebuild_ms']:7.1f} ms")
+        if result["p95_ms"] > args.budget_ms:
+            print(f"❌ p95 over the {args.budget_ms:.0f} ms budget at {label} entries")
+            failed = True
+
+    report = {"queries": args.queries, "top_k": TOP_K, "budget_ms": args.budget_ms, "results": results}
+    output = os.path.abspath(args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Report written to {output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# benchmarks/bench_relock.py
+"""
+Lock / re-unlock benchmark.
+
+Creates a synthetic diary in a throwaway directory, logs in through the
+real LoginWindow and then locks and re-unlocks it repeatedly in the same
+QApplication, the way auto-lock does. Each re-unlock is timed from the
+password being submitted to the diary window being painted, with the key
+derivation (PBKDF2, run by verify_master_password and
+load_or_create_diary_key) reported separately. For comparison, the cold
+start that the old respawning lock paid before the login window even
+appeared is measured with benchmarks/bench_startup.py's probe.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_relock
+    python -m benchmarks.bench_relock --entries 10k --cycles 10
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtTest import QTest
+from PyQt6.QtCore import QTimer
+
+import auth
+import database
+from benchmarks.bench_db import BENCH_PASSWORD, diary_workdir
+from benchmarks.bench_startup import run_once
+from benchmarks.synthetic import format_size, parse_size, populate
+
+DEFAULT_OUTPUT = "benchmarks/relock.json"
+
+
+def key_derivation_ms():
+    start = time.perf_counter()
+    auth.verify_master_password(BENCH_PASSWORD)
+    database.load_or_create_diary_key(BENCH_PASSWORD)
+    return (time.perf_counter() - start) * 1000
+
+
+def unlock(app, window):
+    """Submit the password and wait until the unlock has been measured"""
+    window.last_unlock_ms = None
+    window.password_input.setText(BENCH_PASSWORD)
+    if not window.unlocks:
+        # Dismiss the first login's welcome dialog (its time is not counted)
+        QTimer.singleShot(0, lambda: app.activeModalWidget().accept())
+    window.check_password()
+    while window.last_unlock_ms is None:
+        QTest.qWait(5)
+    return window.last_unlock_ms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure in-process lock and re-unlock")
+    parser.add_argument("--entries", default="1k", help="synthetic diary size, e.g. 1k, 10k")
+    parser.add_argument("--cycles", type=int, default=5, help="lock / re-unlock cycles")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output)
+    count = parse_size(args.entries)
+
+    import main as app_main
+    app = QApplication.instance() or QApplication(sys.argv)
+    app_main.apply_theme(app)
+
+    with diary_workdir() as workdir:
+        auth.create_master_password(BENCH_PASSWORD)
+        database.init_db()
+        populate(database.DB_PATH, database.load_or_create_diary_key(BENCH_PASSWORD), count)
+
+        cold_start_ms, _, _ = run_once(workdir)
+
+        window = app_main.LoginWindow()
+        window.show()
+        QTest.qWait(50)
+        first_ms = unlock(app, window)
+
+        lock_samples, reunlock_samples, kdf_samples = [], [], []
+        for _ in range(args.cycles):
+            start = time.perf_counter()
+            window.diary.lock_diary("🔒 Benchmark lock")
+            QTest.qWait(0)
+            lock_samples.append((time.perf_counter() - start) * 1000)
+            assert window.isVisible() and window.diary is None
+            kdf_samples.append(key_derivation_ms())
+            reunlock_samples.append(unlock(app, window))
+        window.diary.close()
+        window.close()
+
+    kdf_ms = statistics.median(kdf_samples)
+    reunlock_ms = statistics.median(reunlock_samples)
+    report = {
+        "entries": count,
+        "cycles": args.cycles,
+        "first_unlock_ms": round(first_ms, 2),
+        "lock_ms": round(statistics.median(lock_samples), 2),
+        "reunlock_ms": round(reunlock_ms, 2),
+        "reunlock_max_ms": round(max(reunlock_samples), 2),
+        "key_derivation_ms": round(kdf_ms, 2),
+        "reunlock_without_kdf_ms": round(reunlock_ms - kdf_ms, 2),
+        "respawn_cold_start_ms": round(cold_start_ms, 2),
+    }
+
+    print(f"🔒 {format_size(count)} entries, {args.cycles} cycles")
+    print(f"   lock                      {report['lock_ms']:8.1f} ms")
+    print(f"   re-unlock (median)        {report['reunlock_ms']:8.1f} ms "
+          f"(key derivation {report['key_derivation_ms']:.1f} ms, "
+          f"rest {report['reunlock_without_kdf_ms']:.1f} ms)")
+    print(f"   first unlock              {report['first_unlock_ms']:8.1f} ms")
+    print(f"   respawn to login screen   {report['respawn_cold_start_ms']:8.1f} ms (old lock, before typing)")
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Report written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# benchmarks/bench_search.py
+"""
+In-memory search index benchmark.
+
+Indexes synthetic entries (no database or encryption involved, only the
+TrigramIndex the diary window builds after unlock) and times a fixed set of
+exact, prefix, typo and multi-word queries. The run fails if the p95 query
+time at any size is over budget.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_search
+    python -m benchmarks.bench_search --sizes 10k,100k --runs 20 --budget-ms 10
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from benchmarks.synthetic import generate_entries, parse_size, format_size
+from search_index import TrigramIndex, BUILD_PAGE
+
+DEFAULT_OUTPUT = "benchmarks/search.json"
+DEFAULT_SIZES = "10k,100k"
+DEFAULT_BUDGET_MS = 10
+
+QUERIES = [
+    "morning",              # exact
+    "mornin",               # prefix, as typed
+    "mroning",              # transposed letters
+    "coffee music",
+    "deadline projct",      # typo in the second word
+    "walk dinner family",
+    "painting hall",
+    "the",                  # matches nearly everything
+    "zebra",                # matches nothing
+]
+
+
+def build_index(count):
+    """Index `count` synthetic entries newest-first, the way DiaryIndexer does; returns (index, seconds)"""
+    documents = [(i + 1, e["title"], e["content"], i) for i, e in enumerate(generate_entries(count))]
+    index = TrigramIndex()
+    start = time.perf_counter()
+    index.reserve(count)
+    for i in range(len(documents), 0, -BUILD_PAGE):
+        index.add_many(documents[max(i - BUILD_PAGE, 0):i])
+    return index, time.perf_counter() - start
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the in-memory fuzzy search index")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated entry counts, e.g. 10k,100k")
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per query")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="maximum p95 query time")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+
+    results = {}
+    failed = False
+    for count in [parse_size(s) for s in args.sizes.split(",")]:
+        label = format_size(count)
+        index, build_seconds = build_index(count)
+        samples, queries = [], {}
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                ids, _ = index.search(query)
+                timings.append((time.perf_counter() - start) * 1000)
+            samples.extend(timings)
+            queries[query] = {"matches": len(ids), "p50_ms": round(statistics.median(timings), 3)}
+
+        result = {
+            "build_s": round(build_seconds, 2),
+            "vocabulary": len(index.vocabulary),
+            "p50_ms": round(statistics.median(samples), 3),
+            "p95_ms": round(percentile(samples, 0.95), 3),
+            "max_ms": round(max(samples), 3),
+            "queries": queries,
+        }
+        results[label] = result
+        print(f"🔎 {label:>5} entries  build {result['build_s']:6.2f} s  "
+              f"p50 {result['p50_ms']:6.2f} ms  p95 {result['p95_ms']:6.2f} ms  max {result['max_ms']:6.2f} ms")
+        for query, figures in queries.items():
+            print(f"     {query:<22} {figures['matches']:>4} matches  {figures['p50_ms']:6.2f} ms")
+        if result["p95_ms"] > args.budget_ms:
+            print(f"❌ p95 over the {args.budget_ms:.0f} ms budget at {label} entries")
+            failed = True
+
+    report = {"runs": args.runs, "budget_ms": args.budget_ms, "results": results}
+    output = os.path.abspath(args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Report written to {output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
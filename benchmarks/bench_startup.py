@@ -0,0 +1,120 @@
+# benchmarks/bench_startup.py
+"""
+GUI startup report.
+
+Launches main.py under `python -X importtime` with SECUREDIARY_STARTUP_PROBE
+set, so the login window reports its time-to-first-paint and exits. The
+import breakdown shows what the login screen pays for, and the run fails if
+the time budget is exceeded or a post-login module was imported eagerly.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --budget-ms 250
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_OUTPUT = "benchmarks/startup.json"
+DEFAULT_BUDGET_MS = 300
+# Modules that must not be imported before the login window has painted
+DEFERRED_MODULES = ["database", "cryptography.fernet", "ui.diary_ui", "ui.entry_ui"]
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us, depth)} from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), (len(indent) - 1) // 2)
+    return modules
+
+
+def run_once(workdir):
+    env = dict(os.environ, SECUREDIARY_STARTUP_PROBE="1")
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(REPO_ROOT, "main.py")],
+        cwd=workdir, env=env, capture_output=True, text=True, timeout=60
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    probe = None
+    for line in proc.stdout.splitlines():
+        if line.startswith("{"):
+            probe = json.loads(line)
+    if proc.returncode != 0 or probe is None:
+        raise RuntimeError(f"main.py startup probe failed:\n{proc.stderr[-2000:]}")
+    return wall_ms, probe, parse_importtime(proc.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure SecureDiary GUI startup")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="maximum median time-to-first-paint")
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to list")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+
+    walls, paints, imports = [], [], []
+    last_modules = {}
+    with tempfile.TemporaryDirectory(prefix="securediary-startup-") as workdir:
+        for _ in range(args.runs):
+            wall_ms, probe, modules = run_once(workdir)
+            walls.append(wall_ms)
+            paints.append(probe["first_paint_ms"])
+            imports.append(sum(cum for _, cum, depth in modules.values() if depth == 0) / 1000)
+            last_modules = modules
+
+    top_level = sorted(
+        ((name, cum / 1000) for name, (_, cum, depth) in last_modules.items() if depth == 0),
+        key=lambda item: item[1], reverse=True
+    )[:args.top]
+    eager = [m for m in DEFERRED_MODULES if m in last_modules]
+
+    report = {
+        "runs": args.runs,
+        "process_wall_ms": round(statistics.median(walls), 2),
+        "first_paint_ms": round(statistics.median(paints), 2),
+        "import_ms": round(statistics.median(imports), 2),
+        "budget_ms": args.budget_ms,
+        "eager_deferred_modules": eager,
+        "top_imports_ms": {name: round(ms, 2) for name, ms in top_level},
+    }
+
+    print(f"🚀 time-to-first-paint  {report['first_paint_ms']:8.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"   process wall time    {report['process_wall_ms']:8.1f} ms")
+    print(f"   total import time    {report['import_ms']:8.1f} ms")
+    for name, ms in report["top_imports_ms"].items():
+        print(f"     {name:<40} {ms:8.2f} ms")
+
+    output = os.path.abspath(args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Report written to {output}")
+
+    failed = False
+    if eager:
+        print(f"❌ Imported before first paint: {', '.join(eager)}")
+        failed = True
+    if report["first_paint_ms"] > args.budget_ms:
+        print("❌ Startup budget exceeded")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
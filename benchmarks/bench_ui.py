@@ -0,0 +1,263 @@
+# benchmarks/bench_ui.py
+"""
+Entry card rendering benchmark.
+
+Compares three ways of putting N entry cards on screen:
+
+  inline_stylesheets  QFrame cards that call setStyleSheet on themselves and their
+                      labels (the original create_entry_card), inside a window
+                      with its own stylesheet
+  app_theme           the same widget tree styled only through the application
+                      stylesheet (ui/theme.py) with object names and properties
+  delegate            the list's EntryCardDelegate painting the cards (no widgets)
+
+Widget runs report construction time and show time (polish + layout + first
+paint); the delegate run reports paint time.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_ui
+    python -m benchmarks.bench_ui --count 500 --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import (
+    QApplication, QWidget, QFrame, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QStyleOptionViewItem
+)
+from PyQt6.QtCore import QRect
+from PyQt6.QtGui import QFont, QImage, QPainter
+
+from benchmarks.synthetic import generate_entries
+from ui.entry_list import EntryListModel, EntryCardDelegate, to_list_item
+from ui import theme
+from ui.theme import apply_theme
+from utils import format_date_only, get_preview, get_mood_emoji
+
+DEFAULT_OUTPUT = "benchmarks/ui.json"
+UNDECRYPTABLE_EVERY = 50  # every n-th card uses the undecryptable variant
+
+# Window-level stylesheet DiaryWindow set before ui/theme.py existed
+LEGACY_WINDOW_STYLESHEET = """
+    QWidget { background-color: #0a0a0a; color: #EEEEEE; font-family: 'Segoe UI'; }
+    QPushButton { background-color: #2a2a2a; border-radius: 6px; padding: 8px 15px;
+                  color: #EEEEEE; font-weight: bold; min-width: 80px; }
+    QPushButton:hover { background-color: #3a3a3a; }
+"""
+
+LEGACY_CARD_STYLESHEET = """
+    QFrame { background-color: #1a1a1a; border: 2px solid #2a2a2a; border-radius: 10px; padding: 15px; }
+    QFrame:hover { border: 2px solid #8b7355; }
+"""
+
+# Application-level rules for the widget cards; the app itself paints cards in EntryCardDelegate
+CARD_STYLESHEET = f"""
+QFrame#EntryCard {{
+    background-color: {theme.SURFACE};
+    border: 2px solid {theme.BORDER};
+    border-radius: 10px;
+    padding: 15px;
+}}
+QFrame#EntryCard:hover {{ border: 2px solid {theme.ACCENT}; }}
+QFrame#EntryCard[favorite="true"] {{ border-color: {theme.ACCENT_DIM}; }}
+QFrame#EntryCard QLabel#CardTitle {{ color: {theme.TEXT_STRONG}; }}
+QFrame#EntryCard QLabel#CardPreview {{ color: {theme.TEXT_BODY}; font-size: 12px; }}
+QFrame#EntryCard[undecryptable="true"] QLabel#CardPreview {{ color: {theme.ERROR}; }}
+QFrame#EntryCard QLabel#CardStar {{ font-size: 18px; }}
+"""
+
+
+def sample_entries(count):
+    entries = []
+    for i, entry in enumerate(generate_entries(count)):
+        decryptable = (i + 1) % UNDECRYPTABLE_EVERY != 0
+        entries.append(dict(
+            entry, id=i + 1, decryptable=decryptable, is_favorite=bool(entry["is_favorite"]),
+            content=entry["content"] if decryptable else "🔒 Undecryptable - Diary key missing or corrupted"
+        ))
+    return entries
+
+
+def build_card(entry, inline):
+    """One entry card as widgets; inline=True styles it the pre-theme way"""
+    card = QFrame()
+    card.setFrameShape(QFrame.Shape.StyledPanel)
+    if inline:
+        card.setStyleSheet(LEGACY_CARD_STYLESHEET)
+    else:
+        card.setObjectName("EntryCard")
+        card.setProperty("favorite", entry["is_favorite"])
+        card.setProperty("undecryptable", not entry["decryptable"])
+    card_layout = QVBoxLayout(card)
+    card_layout.setSpacing(10)
+
+    header_row = QHBoxLayout()
+    title_label = QLabel(entry["title"])
+    title_label.setFont(QFont("Segoe UI", 14, QFont.Weight.Bold))
+    if inline:
+        title_label.setStyleSheet("color: #FFFFFF;")
+    else:
+        title_label.setObjectName("CardTitle")
+    header_row.addWidget(title_label)
+    header_row.addStretch()
+
+    if entry["mood"]:
+        mood_label = QLabel(f"{get_mood_emoji(entry['mood'])} {entry['mood']}")
+        if inline:
+            mood_label.setStyleSheet("color: #AAAAAA; font-size: 12px;")
+        else:
+            mood_label.setProperty("role", "mood")
+        header_row.addWidget(mood_label)
+
+    favorite_label = QLabel("⭐" if entry["is_favorite"] else "☆")
+    if inline:
+        favorite_label.setStyleSheet("font-size: 18px;")
+    else:
+        favorite_label.setObjectName("CardStar")
+    header_row.addWidget(favorite_label)
+    card_layout.addLayout(header_row)
+
+    date_label = QLabel(format_date_only(entry["created_at"]))
+    if inline:
+        date_label.setStyleSheet("color: #888888; font-size: 11px;")
+    else:
+        date_label.setProperty("role", "caption")
+    card_layout.addWidget(date_label)
+
+    preview = get_preview(entry["content"], 200) if entry["decryptable"] else entry["content"]
+    content_label = QLabel(preview)
+    content_label.setWordWrap(True)
+    if inline:
+        content_label.setStyleSheet(
+            "color: #CCCCCC; font-size: 12px; line-height: 1.5;" if entry["decryptable"]
+            else "color: #FF6666; font-size: 12px;"
+        )
+    else:
+        content_label.setObjectName("CardPreview")
+    card_layout.addWidget(content_label)
+
+    if entry["tags"]:
+        tags_label = QLabel(f"🏷️ {entry['tags']}")
+        if inline:
+            tags_label.setStyleSheet("color: #8b7355; font-size: 11px;")
+        else:
+            tags_label.setProperty("role", "tags")
+        card_layout.addWidget(tags_label)
+
+    btn_layout = QHBoxLayout()
+    btn_layout.addStretch()
+    for text, width in [("👁 Read", 80), ("✏ Edit", 80), ("⭐" if not entry["is_favorite"] else "☆", 50)]:
+        btn = QPushButton(text)
+        btn.setMaximumWidth(width)
+        btn_layout.addWidget(btn)
+    delete_btn = QPushButton("🗑")
+    delete_btn.setMaximumWidth(50)
+    if inline:
+        delete_btn.setStyleSheet("QPushButton { background-color: #8b0000; }")
+    else:
+        delete_btn.setProperty("variant", "danger")
+    btn_layout.addWidget(delete_btn)
+    card_layout.addLayout(btn_layout)
+    return card
+
+
+def run_widgets(app, entries, inline):
+    """Build a window of cards, then show it; returns (build_ms, show_ms)"""
+    window = QWidget()
+    window.resize(1200, 700)
+    if inline:
+        window.setStyleSheet(LEGACY_WINDOW_STYLESHEET)
+    else:
+        window.setObjectName("DiaryWindow")
+    layout = QVBoxLayout(window)
+
+    start = time.perf_counter()
+    for entry in entries:
+        layout.addWidget(build_card(entry, inline))
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    window.show()
+    window.grab()  # forces polish, layout and a full paint
+    app.processEvents()
+    show_ms = (time.perf_counter() - start) * 1000
+
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+    return build_ms, show_ms
+
+
+def run_delegate(entries):
+    """Paint every card through EntryCardDelegate; returns paint_ms"""
+    model = EntryListModel(key=None)
+    model.apply_page((None, None, False), len(entries), [to_list_item(e) for e in entries])
+    delegate = EntryCardDelegate()
+    image = QImage(1200, EntryCardDelegate.CARD_HEIGHT, QImage.Format.Format_ARGB32_Premultiplied)
+    option = QStyleOptionViewItem()
+    option.rect = QRect(0, 0, image.width(), image.height())
+
+    painter = QPainter(image)
+    start = time.perf_counter()
+    for row in range(model.rowCount()):
+        delegate.paint(painter, option, model.index(row))
+    paint_ms = (time.perf_counter() - start) * 1000
+    painter.end()
+    return paint_ms
+
+
+def per_card(samples, count):
+    return round(statistics.median(samples) / count, 4)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark entry card construction and painting")
+    parser.add_argument("--count", type=int, default=200, help="cards per run")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    entries = sample_entries(args.count)
+    results = {}
+
+    # Inline stylesheets first: the application stylesheet cannot be removed once set
+    for name, inline in [("inline_stylesheets", True), ("app_theme", False)]:
+        if not inline:
+            apply_theme(app)
+            app.setStyleSheet(theme.STYLESHEET + CARD_STYLESHEET)
+        builds, shows = [], []
+        for _ in range(args.runs):
+            build_ms, show_ms = run_widgets(app, entries, inline)
+            builds.append(build_ms)
+            shows.append(show_ms)
+        results[name] = {
+            "build_ms_per_card": per_card(builds, args.count),
+            "show_ms_per_card": per_card(shows, args.count),
+            "total_ms_per_card": per_card([b + s for b, s in zip(builds, shows)], args.count),
+        }
+
+    paints = [run_delegate(entries) for _ in range(args.runs)]
+    results["delegate"] = {"paint_ms_per_card": per_card(paints, args.count)}
+
+    print(f"🎨 {args.count} cards, median of {args.runs} runs (ms per card)")
+    for name, figures in results.items():
+        print(f"   {name:<20} " + "  ".join(f"{k.replace('_ms_per_card', '')} {v:7.3f}"
+                                           for k, v in figures.items()))
+
+    report = {"count": args.count, "runs": args.runs, "results": results}
+    output = os.path.abspath(args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Report written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+# benchmarks/bench_writes.py
+"""
+Write queue benchmark.
+
+Runs the same burst of writes (new entries, then favorite toggles) through
+the synchronous database.py functions, which commit every write on the
+calling thread, and through write_queue.WriteQueue in each durability mode.
+Reports how long the caller was blocked per write, the time until every
+write had committed, and the number of transactions (journal syncs).
+
+Usage (from the repository root):
+    python -m benchmarks.bench_writes
+    python -m benchmarks.bench_writes --entries 10k --writes 500
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import auth
+import database
+import metrics
+import write_queue
+from benchmarks.bench_db import BENCH_PASSWORD, diary_workdir, summarize
+from benchmarks.synthetic import format_size, parse_size, populate
+
+DEFAULT_OUTPUT = "benchmarks/writes.json"
+CONTENT = "A short benchmark entry about nothing much. " * 20
+
+
+def _transactions():
+    return metrics.snapshot_counters().get("db.transactions", 0)
+
+
+def run_direct(key, writes):
+    calls = []
+    start = time.perf_counter()
+    ids = []
+    for i in range(writes):
+        t = time.perf_counter()
+        ids.append(database.add_entry(f"Direct {i}", CONTENT, key, "Calm", "bench"))
+        calls.append((time.perf_counter() - t) * 1000)
+    for entry_id in ids:
+        t = time.perf_counter()
+        database.toggle_favorite(entry_id)
+        calls.append((time.perf_counter() - t) * 1000)
+    return calls, (time.perf_counter() - start) * 1000
+
+
+def run_queued(key, writes, durability):
+    queue = write_queue.WriteQueue(key)
+    calls = []
+    start = time.perf_counter()
+    futures = []
+    for i in range(writes):
+        t = time.perf_counter()
+        futures.append(queue.add_entry(f"Queued {i}", CONTENT, "Calm", "bench", durability=durability))
+        calls.append((time.perf_counter() - t) * 1000)
+    for future in list(futures):
+        entry_id = future.result()
+        t = time.perf_counter()
+        futures.append(queue.toggle_favorite(entry_id, durability=durability))
+        calls.append((time.perf_counter() - t) * 1000)
+    queue.flush()
+    committed_ms = (time.perf_counter() - start) * 1000
+    queue.close()
+    for future in futures:
+        future.result()
+    return calls, committed_ms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-call commits with the group-commit write queue")
+    parser.add_argument("--entries", default="1k", help="synthetic diary size, e.g. 1k, 10k")
+    parser.add_argument("--writes", type=int, default=200, help="entries added (each is then favorited)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output)
+    count = parse_size(args.entries)
+    if not metrics.ENABLED:
+        print("ℹ️ Set SECUREDIARY_METRICS=1 to count transactions")
+
+    results = {}
+    with diary_workdir():
+        auth.create_master_password(BENCH_PASSWORD)
+        database.init_db()
+        key = database.load_or_create_diary_key(BENCH_PASSWORD)
+        populate(database.DB_PATH, key, count)
+        runs = [("direct", lambda: run_direct(key, args.writes))] + [
+            (mode, lambda mode=mode: run_queued(key, args.writes, mode)) for mode in write_queue.DURABILITY_MODES
+        ]
+        for name, run in runs:
+            before = _transactions()
+            calls, committed_ms = run()
+            results[name] = {
+                "caller_blocked": summarize(calls),
+                "caller_blocked_p95_ms": round(sorted(calls)[int(len(calls) * 0.95) - 1], 4),
+                "all_committed_ms": round(committed_ms, 2),
+                "transactions": _transactions() - before if metrics.ENABLED else None,
+            }
+
+    print(f"✍️ {args.writes} adds + {args.writes} favorite toggles on {format_size(count)} entries")
+    for name, result in results.items():
+        print(f"   {name:<10} caller median {result['caller_blocked']['median_ms']:7.3f} ms  "
+              f"p95 {result['caller_blocked_p95_ms']:7.3f} ms  all committed {result['all_committed_ms']:8.1f} ms  "
+              f"transactions {result['transactions']}")
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"entries": count, "writes": args.writes, "results": results}, f, indent=2)
+    print(f"✅ Report written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# benchmarks/synthetic.py
+"""
+Deterministic synthetic diary generator.
+
+The same seed and size always produce the same titles, text, moods, tags and
+timestamps, so benchmark runs on different machines stay comparable.
+"""
+import math
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+MOODS = [
+    "Happy", "Sad", "Excited", "Angry", "Calm",
+    "Anxious", "Grateful", "Reflective", "Loved", "Tired"
+]
+# Real diaries skew towards a handful of moods
+MOOD_WEIGHTS = [18, 8, 7, 3, 14, 9, 12, 15, 6, 8]
+NO_MOOD_RATE = 0.15
+
+TAG_POOL = [
+    "personal", "work", "ideas", "family", "friends", "travel", "health",
+    "fitness", "books", "music", "goals", "dreams", "gratitude", "money",
+    "school", "weekend", "holiday", "food", "nature", "therapy"
+]
+
+VOCABULARY = (
+    "today i felt the morning was quiet and then work got busy again we went "
+    "for a long walk after dinner my friend called to talk about her new job "
+    "it rained all afternoon so i stayed inside reading a book about history "
+    "i keep thinking about what she said last week and whether i was fair "
+    "the kids laughed at the park while the sun went down behind the hills "
+    "tired but grateful for small things like coffee music and good sleep "
+    "meeting ran late and the project deadline moved up by two days again "
+    "i want to write more often because it helps me slow down and notice "
+    "dinner with family was loud and warm and everyone stayed until midnight "
+    "anxious about tomorrow presentation but practiced it three times tonight "
+    "finally finished the painting i started in spring and hung it in the hall "
+    "training for the race is going well my knee feels much better this month "
+    "missed the train and ended up talking to a stranger about old movies "
+    "decided to cook something new and it turned out surprisingly good"
+).split()
+
+TITLE_OPENERS = [
+    "A quiet", "Another long", "The best", "A strange", "A rainy", "One more",
+    "An unexpected", "A slow", "A busy", "A perfect", "The last", "A hard"
+]
+TITLE_SUBJECTS = [
+    "morning", "day at work", "evening walk", "weekend", "conversation",
+    "dinner", "trip", "night", "afternoon", "week", "decision", "surprise"
+]
+
+# Fixed reference point so generated timestamps never depend on "now"
+EPOCH_END = datetime(2025, 12, 31, 22, 0, 0)
+
+
+def parse_size(text):
+    """Parse sizes like '1k', '10k', '1m' or '2500' into an int"""
+    text = text.strip().lower()
+    multiplier = 1
+    if text.endswith("k"):
+        multiplier, text = 1_000, text[:-1]
+    elif text.endswith("m"):
+        multiplier, text = 1_000_000, text[:-1]
+    return int(float(text) * multiplier)
+
+
+def format_size(count):
+    """Inverse of parse_size for labels: 1000 -> '1k'"""
+    if count >= 1_000_000 and count % 1_000_000 == 0:
+        return f"{count // 1_000_000}m"
+    if count >= 1_000 and count % 1_000 == 0:
+        return f"{count // 1_000}k"
+    return str(count)
+
+
+def _word_count(rng):
+    """Log-normal entry length: median ~180 words, long tail up to 3000"""
+    return max(5, min(3000, int(rng.lognormvariate(math.log(180), 0.8))))
+
+
+def _paragraphs(rng, words):
+    out = []
+    remaining = words
+    while remaining > 0:
+        n = min(remaining, rng.randint(30, 120))
+        sentence_words = [rng.choice(VOCABULARY) for _ in range(n)]
+        sentence_words[0] = sentence_words[0].capitalize()
+        out.append(" ".join(sentence_words) + ".")
+        remaining -= n
+    return "\n\n".join(out)
+
+
+def generate_entries(count, seed=42, years=10):
+    """
+    Yield `count` synthetic entries in chronological order.
+    Each entry is a dict with the same keys add_entry/fetch_entries use.
+    """
+    rng = random.Random(seed)
+    span = timedelta(days=365 * years).total_seconds()
+    start = EPOCH_END - timedelta(seconds=span)
+    step = span / max(count, 1)
+
+    for i in range(count):
+        # Roughly even spread with jitter so several entries can share a day
+        offset = i * step + rng.uniform(0, step)
+        created_at = start + timedelta(seconds=offset)
+        edited = rng.random() < 0.2
+        updated_at = created_at + timedelta(hours=rng.randint(1, 72)) if edited else created_at
+
+        mood = None
+        if rng.random() >= NO_MOOD_RATE:
+            mood = rng.choices(MOODS, weights=MOOD_WEIGHTS)[0]
+
+        tag_count = rng.choices([0, 1, 2, 3], weights=[30, 35, 25, 10])[0]
+        tags = ", ".join(rng.sample(TAG_POOL, tag_count)) or None
+
+        yield {
+            "title": f"{rng.choice(TITLE_OPENERS)} {rng.choice(TITLE_SUBJECTS)}",
+            "content": _paragraphs(rng, _word_count(rng)),
+            "mood": mood,
+            "tags": tags,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "is_favorite": 1 if rng.random() < 0.08 else 0,
+        }
+
+
+_INSERT_SQL = """
+    INSERT INTO entries (title, content, mood, tags, created_at, updated_at, is_favorite,
+                         word_count, char_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def populate(db_path, key, count, seed=42, batch_size=5000):
+    """
+    Bulk-insert a synthetic diary straight into the entries table.
+    Content is encrypted with the real diary key so reads exercise decryption.
+    """
+    from database import encrypt_content, text_counts
+
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    batch = []
+    for entry in generate_entries(count, seed):
+        batch.append((
+            entry["title"], encrypt_content(entry["content"], key), entry["mood"],
+            entry["tags"], entry["created_at"], entry["updated_at"], entry["is_favorite"],
+            *text_counts(entry["content"])
+        ))
+        if len(batch) >= batch_size:
+            cur.executemany(_INSERT_SQL, batch)
+            conn.commit()
+            batch = []
+    if batch:
+        cur.executemany(_INSERT_SQL, batch)
+        conn.commit()
+    conn.close()
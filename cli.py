@@ -0,0 +1,500 @@
+# cli.py
+"""
+SecureDiary headless command-line interface.
+
+Scripting entry point that works without a display: it talks to auth.py and
+database.py directly and never imports PyQt6. The master password is read
+from the first line of stdin (or --password-fd), and every command prints
+JSON on stdout. If an unlock agent is running (`unlock --agent`, see
+agent.py) commands are served by it and no password is needed.
+
+Examples:
+    echo "$PW" | python cli.py add --title "Cron note" --content "Backup ran"
+    echo "$PW" | python cli.py search morning --mood Calm
+    python cli.py --password-fd 3 export -o backup.json 3<pw.txt
+    python cli.py --password-fd 3 export --since backup.json -o changes.json 3<pw.txt
+"""
+import time
+
+_START = time.perf_counter()
+
+import argparse
+import getpass
+import json
+import os
+import sys
+
+STARTUP_BUDGET_MS = 100  # imports + argument parsing, excluding key derivation
+AGENT_START_TIMEOUT = 15.0
+EXPORT_FORMAT = "securediary-export"
+EXPORT_VERSION = 2  # 2: entry fingerprints, incremental exports (--since)
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_AUTH = 3
+
+
+class CliError(Exception):
+    """Error reported to the caller as {"ok": false, "error": ...}"""
+    def __init__(self, message, exit_code=EXIT_ERROR):
+        super().__init__(message)
+        self.exit_code = exit_code
+
+
+def emit(payload):
+    json.dump(payload, sys.stdout, ensure_ascii=False, default=str)
+    sys.stdout.write("\n")
+    sys.stdout.flush()
+
+
+def read_password(args):
+    """Master password from --password-fd, a TTY prompt, or the first stdin line"""
+    if args.password_fd is not None:
+        with os.fdopen(args.password_fd, "r", closefd=False) as f:
+            password = f.readline()
+    elif sys.stdin.isatty():
+        password = getpass.getpass("Master password: ")
+    else:
+        password = sys.stdin.readline()
+    password = password.rstrip("\r\n").strip()
+    if not password:
+        raise CliError("No master password provided", EXIT_AUTH)
+    return password
+
+
+def unlock(args, password=None):
+    """Verify the master password (read from the caller unless given) and return the diary key"""
+    from auth import MASTER_FILE, verify_master_password
+    from database import init_db, load_or_create_diary_key
+
+    if not os.path.exists(MASTER_FILE):
+        raise CliError("No diary found. Create a master password in the app first.", EXIT_AUTH)
+
+    password = password or read_password(args)
+    if not verify_master_password(password):
+        raise CliError("Incorrect master password or wrong device", EXIT_AUTH)
+
+    init_db()
+    try:
+        return load_or_create_diary_key(password)
+    except FileNotFoundError as e:
+        raise CliError(f"Critical security files are missing: {e}", EXIT_AUTH)
+    except ValueError:
+        raise CliError("Unable to decrypt diary key", EXIT_AUTH)
+
+
+def entry_to_json(entry, full=True):
+    out = {
+        "id": entry["id"],
+        "title": entry["title"],
+        "mood": entry["mood"],
+        "tags": entry["tags"],
+        "created_at": entry["created_at"],
+        "updated_at": entry["updated_at"],
+        "is_favorite": entry["is_favorite"],
+        "decryptable": entry["decryptable"],
+    }
+    if full:
+        out["content"] = entry["content"]
+    else:
+        from utils import get_preview
+        out["preview"] = get_preview(entry["content"], 200) if entry["decryptable"] else None
+    return out
+
+
+def read_content(args):
+    if args.content is not None:
+        return args.content
+    if args.content_file == "-":
+        return sys.stdin.read()
+    with open(args.content_file, encoding="utf-8") as f:
+        return f.read()
+
+
+# ---------------------------------------------------------------- commands
+
+def cmd_unlock(args, diary):
+    return {"unlocked": True, "entries": diary.stats()["total_entries"]}
+
+
+def cmd_add(args, diary):
+    content = read_content(args).strip()
+    if not args.title.strip() or not content:
+        raise CliError("Both a title and content are required")
+    entry_id = diary.add(title=args.title.strip(), content=content, mood=args.mood,
+                         tags=args.tags, is_favorite=args.favorite)
+    return {"id": entry_id}
+
+
+def cmd_list(args, diary):
+    fields = {"moods": args.mood, "tags_all": args.tag, "tags_any": args.any_tag,
+              "favorite": True if args.favorites else None, "date_from": args.since, "date_to": args.until,
+              "min_words": args.min_words, "max_words": args.max_words, "order": args.sort,
+              "limit": args.limit or None}
+    if args.explain:
+        return {"plan": diary.query(explain=True, **fields)}
+    entries = diary.query(**fields)
+    return {"entries": [entry_to_json(e, full=args.full) for e in entries]}
+
+
+def cmd_search(args, diary):
+    entries = diary.search(query=args.query, content=args.content,
+                           filter_mood=args.mood, filter_favorite=args.favorites)
+    if args.limit:
+        entries = entries[:args.limit]
+    return {"query": args.query, "entries": [entry_to_json(e, full=args.full) for e in entries]}
+
+
+def cmd_show(args, diary):
+    entry = diary.get(entry_id=args.id)
+    if not entry:
+        raise CliError(f"Entry {args.id} not found")
+    return {"entry": entry_to_json(entry)}
+
+
+def cmd_export(args, diary):
+    from datetime import datetime
+    base = None
+    if args.since:
+        with open(args.since, encoding="utf-8") as f:
+            base = json.load(f)
+        if base.get("format") != EXPORT_FORMAT or "fingerprints" not in base:
+            raise CliError("--since needs an export file written by this version (with fingerprints)")
+    result = diary.export(since=base["fingerprints"] if base else None)
+    payload = {
+        "format": EXPORT_FORMAT,
+        "version": EXPORT_VERSION,
+        "exported_at": datetime.now().isoformat(timespec="seconds"),
+        "entries": [{**entry_to_json(e), "fingerprint": e["fingerprint"]} for e in result["entries"]],
+        # {id: [fingerprint, is_favorite]} of the whole diary, the base of the next --since export
+        "fingerprints": result["fingerprints"],
+    }
+    if base:
+        payload.update({"since": base["exported_at"], "unchanged": result["unchanged"],
+                        "deleted": result["deleted"]})
+    summary = {"exported": len(payload["entries"]), "skipped_undecryptable": result["skipped_undecryptable"]}
+    if base:
+        summary.update({"unchanged": result["unchanged"], "deleted": len(result["deleted"])})
+    if args.output == "-":
+        return payload
+    # ⚠️ The export is plaintext: create it readable by the owner only
+    fd = os.open(args.output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2, default=str)
+    return {"output": args.output, **summary}
+
+
+def cmd_import(args, diary):
+    if args.file == "-":
+        payload = json.load(sys.stdin)
+    else:
+        with open(args.file, encoding="utf-8") as f:
+            payload = json.load(f)
+    if payload.get("format") != EXPORT_FORMAT:
+        raise CliError("Not a SecureDiary export file")
+
+    imported = []
+    for entry in payload.get("entries", []):
+        imported.append(diary.add(
+            title=entry["title"], content=entry["content"], mood=entry.get("mood"),
+            tags=entry.get("tags"), created_at=entry.get("created_at"),
+            updated_at=entry.get("updated_at"), is_favorite=bool(entry.get("is_favorite"))
+        ))
+    return {"imported": len(imported), "ids": imported}
+
+
+def cmd_stats(args, diary):
+    return {"stats": diary.stats()}
+
+
+def cmd_verify(args, diary):
+    entries = diary.fetch()
+    bad = [{"id": e["id"], "title": e["title"], "created_at": e["created_at"]}
+           for e in entries if not e["decryptable"]]
+    return {"entries": len(entries), "undecryptable": bad, "healthy": not bad}
+
+
+def cmd_scrub(args, diary):
+    return {"scrub": diary.scrub(max_seconds=args.max_seconds, restart=args.restart, workers=args.workers)}
+
+
+def cmd_metadata(args, diary):
+    return {"metadata": diary.metadata(encrypt=args.action == "encrypt")}
+
+
+def cmd_archive(args, diary):
+    return {"archive": diary.archive(action=args.action, months=args.months)}
+
+
+def cmd_trash(args, diary):
+    if args.action in ("restore", "purge") and args.id is None:
+        raise CliError(f"{args.action} needs --id")
+    result = diary.trash(action=args.action, entry_id=args.id, days=args.days)
+    if args.action == "list":
+        result["entries"] = [{**entry_to_json(e, full=False), "deleted_at": e["deleted_at"]}
+                             for e in result["entries"]]
+    return {"trash": result}
+
+
+def cmd_maintenance(args, diary):
+    return {"maintenance": diary.maintenance(action=args.action, max_seconds=args.max_seconds)}
+
+
+def cmd_sync(args, diary):
+    return {"sync": diary.sync(action=args.action, entry_id=args.id)}
+
+
+def sync_setup(args):
+    """Connect the diary to a sync folder; needs the password itself, so never goes through the agent"""
+    from agent import AgentClient
+    import sync
+    if not args.folder:
+        raise CliError("setup needs a folder")
+    if AgentClient().is_running():
+        raise CliError("Lock the unlock agent first (securediary lock)")
+    password = read_password(args)
+    key = unlock(args, password)
+    try:
+        sync.setup(args.folder, password, key)
+    except ValueError as e:
+        raise CliError(str(e))
+    return {"sync": sync.status()}
+
+
+def cmd_shards(args, diary):
+    """Year shard maintenance (see shards.py); works on the files, the key is only checked"""
+    import shards
+    if args.action == "rotate":
+        moved = shards.rotate(args.before)
+        return {"moved": {str(year): count for year, count in moved.items()}}
+    if args.action == "status":
+        return {"shards": shards.status()}
+    if args.year is None and args.action == "backup":
+        raise CliError("backup needs --year")
+    years = [args.year] if args.year is not None else shards.years()
+    if args.action == "compact":
+        sizes = {str(year): shards.compact(year) for year in years}
+        if args.year is None:
+            sizes["diary.db"] = shards.compact()
+        return {"compacted": {name: {"bytes_before": b, "bytes_after": a} for name, (b, a) in sizes.items()}}
+    if args.action == "check":
+        problems = {str(year): shards.check(year) for year in years}
+        return {"problems": {year: p for year, p in problems.items() if p},
+                "healthy": not any(problems.values())}
+    if not args.output:
+        raise CliError("backup needs --output")
+    return {"backup": shards.backup(args.year, args.output)}
+
+
+def start_agent(args):
+    """Hand the password to a detached agent process and wait for its socket"""
+    import subprocess
+    from agent import SOCKET_PATH, AgentClient
+
+    client = AgentClient()
+    if client.is_running():
+        return {"unlocked": True, "agent": os.path.abspath(SOCKET_PATH), "already_running": True}
+
+    password = read_password(args)
+    agent_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent.py")
+    cmd = [sys.executable, agent_script, "--password-fd", "0"]
+    if args.idle_timeout:
+        cmd += ["--idle-timeout", str(args.idle_timeout)]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, start_new_session=True)
+    proc.stdin.write((password + "\n").encode())
+    proc.stdin.close()
+
+    deadline = time.monotonic() + AGENT_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            message = proc.stderr.read().decode(errors="replace").strip().lstrip("❌ ")
+            raise CliError(message or "Agent failed to start", proc.returncode or EXIT_ERROR)
+        if client.is_running():
+            proc.stderr.close()
+            return {"unlocked": True, "agent": os.path.abspath(SOCKET_PATH), "pid": proc.pid}
+        time.sleep(0.05)
+    proc.kill()
+    raise CliError("Agent did not start in time")
+
+
+def stop_agent():
+    from agent import AgentClient, AgentError
+    client = AgentClient()
+    if not client.is_running():
+        return {"locked": True, "agent_was_running": False}
+    try:
+        with client:
+            client.request("lock")
+    except (OSError, AgentError):
+        pass
+    return {"locked": True, "agent_was_running": True}
+
+
+def open_diary(args):
+    """A running agent if there is one, otherwise unlock in this process"""
+    from agent import AgentClient, DiaryOperations, RemoteDiary
+    if not args.no_agent:
+        client = AgentClient()
+        if client.is_running():
+            return RemoteDiary(client)
+    return DiaryOperations(unlock(args))
+
+
+# ---------------------------------------------------------------- parser
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="securediary",
+        description="SecureDiary command-line interface (JSON output, no GUI)"
+    )
+    parser.add_argument("-C", "--directory", help="directory containing diary_data/ (default: current)")
+    parser.add_argument("--password-fd", type=int, help="read the master password from this file descriptor")
+    parser.add_argument("--timing", action="store_true", help="report startup and total time on stderr")
+    parser.add_argument("--no-agent", action="store_true", help="ignore a running unlock agent")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("unlock", help="check the master password and diary key")
+    p.add_argument("--agent", action="store_true", help="start an unlock agent holding the key")
+    p.add_argument("--idle-timeout", type=float, help="agent auto-lock after this many idle seconds")
+    sub.add_parser("lock", help="stop the unlock agent")
+
+    p = sub.add_parser("add", help="add a new entry")
+    p.add_argument("--title", required=True)
+    content = p.add_mutually_exclusive_group(required=True)
+    content.add_argument("--content", help="entry text")
+    content.add_argument("--content-file", help="read entry text from a file ('-' = rest of stdin)")
+    p.add_argument("--mood")
+    p.add_argument("--tags", help="comma separated tags")
+    p.add_argument("--favorite", action="store_true")
+
+    for name, help_text in (("list", "list entries"), ("search", "search entries by title")):
+        p = sub.add_parser(name, help=help_text)
+        if name == "search":
+            p.add_argument("query")
+            p.add_argument("--content", action="store_true", help="also search decrypted entry text")
+        if name == "search":
+            p.add_argument("--mood")
+        else:
+            p.add_argument("--mood", action="append", help="only entries with this mood (repeat for any of several)")
+        p.add_argument("--favorites", action="store_true", help="only favorite entries")
+        if name == "list":
+            p.add_argument("--tag", action="append", help="only entries with this tag (repeat: all of them)")
+            p.add_argument("--any-tag", action="append", help="only entries with one of these tags (repeatable)")
+            p.add_argument("--since", help="first day, YYYY-MM-DD")
+            p.add_argument("--until", help="last day, YYYY-MM-DD")
+            p.add_argument("--min-words", type=int)
+            p.add_argument("--max-words", type=int)
+            p.add_argument("--sort", choices=("newest", "oldest", "longest", "shortest"), default="newest")
+            p.add_argument("--explain", action="store_true", help="print SQLite's query plan instead of entries")
+        p.add_argument("--limit", type=int)
+        p.add_argument("--full", action="store_true", help="include full content instead of a preview")
+
+    p = sub.add_parser("show", help="show one entry")
+    p.add_argument("id", type=int)
+
+    p = sub.add_parser("export", help="export decrypted entries to JSON")
+    p.add_argument("-o", "--output", default="-", help="output file ('-' = stdout)")
+    p.add_argument("--since", metavar="EXPORT",
+                   help="only entries added or changed since this earlier export (and the ids deleted since)")
+
+    p = sub.add_parser("import", help="import entries from an export file")
+    p.add_argument("file", help="export file ('-' = stdin after the password line)")
+
+    sub.add_parser("stats", help="diary statistics")
+    sub.add_parser("verify", help="check that every entry decrypts")
+
+    p = sub.add_parser("scrub", help="check every encrypted blob and the database files (resumable)")
+    p.add_argument("--max-seconds", type=float, help="stop after this long; the next run resumes")
+    p.add_argument("--restart", action="store_true", help="discard the checkpoint and start a new pass")
+    p.add_argument("--workers", type=int, help="parallel checks (default: up to 4)")
+
+    p = sub.add_parser("metadata", help="encrypt titles, moods and tags (blind-indexed filters)")
+    p.add_argument("action", choices=["status", "encrypt"])
+
+    p = sub.add_parser("sync", help="sync with other devices through a shared folder")
+    p.add_argument("action", nargs="?", default="run", choices=["run", "setup", "status", "revisions"])
+    p.add_argument("folder", nargs="?", help="setup: the shared folder (a mounted or synced directory)")
+    p.add_argument("--id", type=int, help="revisions: only those of this entry")
+
+    p = sub.add_parser("archive", help="move old entries' text into compressed monthly packs")
+    p.add_argument("action", nargs="?", default="status", choices=["status", "run", "restore"])
+    p.add_argument("--months", type=int, help="run: archive entries older than this many months (saved as the default)")
+
+    p = sub.add_parser("trash", help="deleted entries: list, restore or purge them")
+    p.add_argument("action", nargs="?", default="list", choices=["list", "restore", "purge", "empty"])
+    p.add_argument("--id", type=int, help="restore / purge: the entry")
+    p.add_argument("--days", type=int, help="keep trashed entries this many days (saved as the default)")
+
+    p = sub.add_parser("maintenance", help="purge expired trash and return free space to the file system")
+    p.add_argument("action", nargs="?", default="status", choices=["status", "run"])
+    p.add_argument("--max-seconds", type=float, help="run: stop reclaiming after this long; the next run continues")
+
+    p = sub.add_parser("shards", help="year-sharded storage: rotate past years out, compact, check, backup")
+    p.add_argument("action", choices=["status", "rotate", "compact", "check", "backup"])
+    p.add_argument("--year", type=int, help="only this year's shard (required for backup)")
+    p.add_argument("--before", type=int, help="rotate: move entries older than this year (default: current)")
+    p.add_argument("-o", "--output", help="backup: destination file")
+    return parser
+
+
+COMMANDS = {
+    "unlock": cmd_unlock,
+    "add": cmd_add,
+    "list": cmd_list,
+    "search": cmd_search,
+    "show": cmd_show,
+    "export": cmd_export,
+    "import": cmd_import,
+    "stats": cmd_stats,
+    "verify": cmd_verify,
+    "scrub": cmd_scrub,
+    "metadata": cmd_metadata,
+    "shards": cmd_shards,
+    "archive": cmd_archive,
+    "trash": cmd_trash,
+    "maintenance": cmd_maintenance,
+    "sync": cmd_sync,
+}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.directory:
+        os.chdir(args.directory)
+
+    # Everything imported so far is the fixed startup cost of the CLI
+    startup_ms = (time.perf_counter() - _START) * 1000
+    if startup_ms > STARTUP_BUDGET_MS:
+        print(f"⚠️ startup took {startup_ms:.0f} ms (budget {STARTUP_BUDGET_MS} ms)", file=sys.stderr)
+
+    try:
+        if args.command == "lock":
+            result = stop_agent()
+        elif args.command == "unlock" and args.agent:
+            result = start_agent(args)
+        elif args.command == "sync" and args.action == "setup":
+            result = sync_setup(args)
+        else:
+            result = COMMANDS[args.command](args, open_diary(args))
+        emit({"ok": True, **result})
+        code = EXIT_OK
+        if args.command in ("verify", "shards") and not result.get("healthy", True):
+            code = EXIT_ERROR
+        if args.command == "scrub" and not result["scrub"]["healthy"]:
+            code = EXIT_ERROR
+    except CliError as e:
+        emit({"ok": False, "error": str(e)})
+        code = e.exit_code
+    except Exception as e:
+        emit({"ok": False, "error": f"{type(e).__name__}: {e}"})
+        code = EXIT_ERROR
+
+    if args.timing:
+        total_ms = (time.perf_counter() - _START) * 1000
+        print(f"startup {startup_ms:.1f} ms, total {total_ms:.1f} ms", file=sys.stderr)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
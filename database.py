@@ -1,35 +1,274 @@
 # database.py
 import os
 import sqlite3
+import threading
+import time
 from cryptography.fernet import Fernet
 from auth import get_kek
-from datetime import datetime
+from datetime import datetime, timedelta
+from utils import count_words
+import archive
+import metadata_crypto
+import metrics
+import shards
 
 DB_PATH = "diary_data/diary.db"
 DIARY_KEY_FILE = "diary_data/diary.key"
 
 
+def _connect():
+    metrics.incr("db.connections")
+    return sqlite3.connect(DB_PATH)
+
+
+def _commit(conn):
+    metrics.incr("db.transactions")
+    conn.commit()
+
+
+# Shared by diary.db and the year shards (shards.py), which keep the ids diary.db assigned
+ENTRIES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        {id_column},
+        title TEXT NOT NULL,
+        content BLOB NOT NULL,
+        mood TEXT,
+        tags TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        is_favorite INTEGER DEFAULT 0,
+        word_count INTEGER,
+        char_count INTEGER,
+        meta BLOB,
+        mood_index BLOB,
+        pack_id INTEGER,
+        content_mac BLOB,
+        meta_mac BLOB
+    )
+"""
+
+
+@metrics.timed("database.init_db")
 def init_db():
     if not os.path.exists("diary_data"):
         os.makedirs("diary_data", exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     cur = conn.cursor()
+    # Only takes effect before the first table is created; older diaries get it by migration
+    cur.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    cur.execute(ENTRIES_TABLE_SQL.format(table="entries", id_column="id INTEGER PRIMARY KEY AUTOINCREMENT"))
+    # Entry lists are always ordered newest first
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_entries_created ON entries(created_at, id)")
+    _migrate(cur)
+    _commit(conn)
+    _watch_settings()
+    for year in shards.years():
+        with shards.attached(conn, year) as schema:
+            _migrate(cur, schema)
+            _commit(conn)
+    conn.close()
+
+
+# Schema migrations, applied in order by init_db.
+# PRAGMA user_version records how many have run on a diary.
+
+def _add_text_counts(cur, schema):
+    """Plaintext word / character counts per entry, for analytics without decryption"""
+    columns = {row[1] for row in cur.execute(f"PRAGMA {schema}.table_info(entries)")}
+    for column in ("word_count", "char_count"):
+        if column not in columns:
+            cur.execute(f"ALTER TABLE {schema}.entries ADD COLUMN {column} INTEGER")
+
+
+def _add_sealed_metadata(cur, schema):
+    """Encrypted title / mood / tags and their blind indexes (metadata_crypto.py)"""
+    columns = {row[1] for row in cur.execute(f"PRAGMA {schema}.table_info(entries)")}
+    for column in ("meta", "mood_index"):
+        if column not in columns:
+            cur.execute(f"ALTER TABLE {schema}.entries ADD COLUMN {column} BLOB")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_entries_mood_index ON entries(mood_index, created_at, id)")
+    if schema == "main":
+        # Title word and tag terms of every entry, including those in year shards
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS entry_terms (
+                term BLOB NOT NULL,
+                entry_id INTEGER NOT NULL,
+                PRIMARY KEY (term, entry_id)
+            ) WITHOUT ROWID
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_entry_terms_entry ON entry_terms(entry_id)")
+        cur.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT)")
+
+
+def _add_sync_tables(cur, schema):
+    """Change tracking and version vectors for directory sync (sync.py)"""
+    if schema != "main":
+        return
+    # Entries written since the last sync, queued by the write helpers below
+    cur.execute("CREATE TABLE IF NOT EXISTS sync_pending (entry_id INTEGER PRIMARY KEY)")
+    # Sync identity and version of every entry; a tombstone keeps the id while its entry is in the trash
     cur.execute("""
-        CREATE TABLE IF NOT EXISTS entries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            content BLOB NOT NULL,
-            mood TEXT,
-            tags TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_favorite INTEGER DEFAULT 0
+        CREATE TABLE IF NOT EXISTS sync_entries (
+            uid TEXT PRIMARY KEY,
+            entry_id INTEGER UNIQUE,
+            vv TEXT NOT NULL,
+            writer TEXT NOT NULL,
+            seq INTEGER NOT NULL DEFAULT 0,
+            deleted INTEGER NOT NULL DEFAULT 0
         )
     """)
-    conn.commit()
-    conn.close()
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sync_entries_seq ON sync_entries(seq)")
+    cur.execute("CREATE TABLE IF NOT EXISTS sync_peers (device TEXT PRIMARY KEY, imported_seq INTEGER NOT NULL)")
+    # Versions that lost a conflict, encrypted with the diary key
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS sync_revisions (
+            id INTEGER PRIMARY KEY,
+            uid TEXT NOT NULL,
+            entry_id INTEGER,
+            writer TEXT NOT NULL,
+            vv TEXT NOT NULL,
+            updated_at TIMESTAMP,
+            saved_at TIMESTAMP,
+            payload BLOB NOT NULL
+        )
+    """)
+
+
+def _add_word_count_index(cur, schema):
+    """Word-count ranges and longest / shortest ordering (entry_query.py)"""
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_entries_words ON entries(word_count, id)")
+
+
+def _add_archive_packs(cur, schema):
+    """Compressed monthly packs holding the text of archived entries (archive.py)"""
+    columns = {row[1] for row in cur.execute(f"PRAGMA {schema}.table_info(entries)")}
+    if "pack_id" not in columns:
+        cur.execute(f"ALTER TABLE {schema}.entries ADD COLUMN pack_id INTEGER")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_entries_pack ON entries(pack_id) WHERE pack_id IS NOT NULL")
+    if schema == "main":
+        # AUTOINCREMENT: pack ids are never reused, so archive.py's pack cache never goes stale
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS entry_packs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                month TEXT NOT NULL,
+                entries INTEGER NOT NULL,
+                text_bytes INTEGER NOT NULL,
+                packed_at TIMESTAMP,
+                payload BLOB NOT NULL
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_entry_packs_month ON entry_packs(month)")
+
+
+def _add_trash(cur, schema):
+    """Deleted entries, kept for restore until purged (see the trash helpers below)"""
+    if schema != "main":
+        return
+    cur.execute(ENTRIES_TABLE_SQL.format(table="main.trash", id_column="id INTEGER PRIMARY KEY"))
+    columns = {row[1] for row in cur.execute("PRAGMA main.table_info(trash)")}
+    if "deleted_at" not in columns:
+        cur.execute("ALTER TABLE main.trash ADD COLUMN deleted_at TIMESTAMP")
+    cur.execute("CREATE INDEX IF NOT EXISTS main.idx_trash_deleted ON trash(deleted_at)")
+
+
+INCREMENTAL_VACUUM = 2  # PRAGMA auto_vacuum value
+
+
+def _enable_incremental_vacuum(cur, schema):
+    """Keep track of free pages so maintenance.py can hand them back to the file system a few at a time"""
+    if cur.execute(f"PRAGMA {schema}.auto_vacuum").fetchone()[0] == INCREMENTAL_VACUUM:
+        return  # a diary (or shard) created with it
+    cur.execute(f"PRAGMA {schema}.auto_vacuum = INCREMENTAL")
+    # An existing file only switches through one full VACUUM, which cannot run inside a transaction
+    if cur.connection.in_transaction:
+        _commit(cur.connection)
+    cur.execute(f"VACUUM {schema}")
+
+
+def _add_fingerprints(cur, schema):
+    """Keyed fingerprints of each entry's text and metadata (metadata_crypto.py); NULL until it is next written"""
+    for table in ("entries", "trash") if schema == "main" else ("entries",):
+        columns = {row[1] for row in cur.execute(f"PRAGMA {schema}.table_info({table})")}
+        for column in ("content_mac", "meta_mac"):
+            if column not in columns:
+                cur.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {column} BLOB")
 
 
+MIGRATIONS = [_add_text_counts, _add_sealed_metadata, _add_sync_tables, _add_word_count_index, _add_archive_packs,
+              _add_trash, _enable_incremental_vacuum, _add_fingerprints]
+
+
+def _migrate(cur, schema="main"):
+    """Run pending migrations on diary.db or an attached year shard"""
+    version = cur.execute(f"PRAGMA {schema}.user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        migration(cur, schema)
+        cur.execute(f"PRAGMA {schema}.user_version = {number}")
+
+
+# Diary-wide settings (the settings table), read by init_db and reloaded whenever
+# another connection commits, e.g. `securediary metadata encrypt` in another process
+_metadata_encrypted = False
+_settings_conn = None
+_settings_version = None
+_settings_lock = threading.Lock()
+
+
+def _load_settings(cur):
+    global _metadata_encrypted
+    row = cur.execute("SELECT value FROM settings WHERE name='encrypted_metadata'").fetchone()
+    _metadata_encrypted = row is not None and row[0] == "1"
+    return _metadata_encrypted
+
+
+def _watch_settings():
+    """(Re)open the connection whose PRAGMA data_version tells when the settings may have changed"""
+    global _settings_conn, _settings_version
+    with _settings_lock:
+        if _settings_conn is not None:
+            _settings_conn.close()
+        _settings_conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        _settings_version = _settings_conn.execute("PRAGMA data_version").fetchone()[0]
+        _load_settings(_settings_conn.cursor())
+
+
+def _refresh_settings():
+    """Reload the settings if any other connection has committed since they were read"""
+    global _settings_version
+    with _settings_lock:
+        if _settings_conn is None:
+            return
+        version = _settings_conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != _settings_version:
+            _settings_version = version
+            _load_settings(_settings_conn.cursor())
+
+
+def metadata_encrypted():
+    """True once titles, moods and tags are stored encrypted (see encrypt_metadata)"""
+    _refresh_settings()
+    return _metadata_encrypted
+
+
+def _metadata_keys(key):
+    if key is None:
+        raise ValueError("🔒 Titles, moods and tags are encrypted: this needs the diary key")
+    return metadata_crypto.keys_for(key)
+
+
+def seal_metadata(title, mood, tags, key):
+    """Encrypted copy and blind indexes of an entry's metadata, or None while it is stored in plaintext"""
+    if not metadata_encrypted():
+        return None
+    return metadata_crypto.keys_for(key).seal(title, mood, tags)
+
+
+def entry_fingerprint(title, content, mood, tags, key):
+    """Keyed fingerprint of an entry's plaintext (metadata_crypto.Fingerprint), stored with the row"""
+    return metadata_crypto.keys_for(key).fingerprint(title, content, mood, tags)
+
+
+@metrics.timed("database.load_or_create_diary_key")
 def load_or_create_diary_key(master_password: str) -> bytes:
     """
     Return the decrypted Fernet key used for the diary.
@@ -56,10 +295,12 @@ def load_or_create_diary_key(master_password: str) -> bytes:
             raise ValueError("Wrong master password: unable to decrypt diary key.")
 
 
+@metrics.timed("database.encrypt_content")
 def encrypt_content(content: str, key: bytes) -> bytes:
     return Fernet(key).encrypt(content.encode())
 
 
+@metrics.timed("database.decrypt_content")
 def decrypt_content(enc_content: bytes, key: bytes) -> str:
     """
     🔒 CRITICAL: This will fail if diary.key was deleted/corrupted
@@ -67,156 +308,762 @@ def decrypt_content(enc_content: bytes, key: bytes) -> str:
     return Fernet(key).decrypt(enc_content).decode()
 
 
-def add_entry(title, content, key, mood=None, tags=None):
-    """Add new diary entry"""
-    conn = sqlite3.connect(DB_PATH)
+ENTRY_COLUMNS = ("id, title, content, mood, tags, created_at, updated_at, is_favorite, word_count, char_count, "
+                 "meta, mood_index, pack_id, content_mac, meta_mac")
+UNDECRYPTABLE_TEXT = "🔒 Undecryptable - Diary key missing or corrupted"
+
+
+# Low-level helpers operating on an open cursor/connection.
+# The public functions below wrap them in their own connection and commit;
+# async_db.py reuses them on its own long-lived connection.
+
+def text_counts(content):
+    """(words, characters) stored next to the encrypted content"""
+    return count_words(content), len(content or "")
+
+
+def _stored_metadata(cur, title, mood, tags, sealed):
+    """Plaintext column values: blanked when the row carries a sealed copy"""
+    if sealed is None:
+        # Checked again inside the write: the setting may have changed since seal_metadata ran
+        if _load_settings(cur):
+            raise ValueError("🔒 Titles, moods and tags were just encrypted by another process: save again")
+        return title, mood, tags, None, None
+    return "", None, None, sealed.meta, sealed.mood_index
+
+
+def _store_terms(cur, entry_id, sealed, replace=False):
+    if replace:
+        cur.execute("DELETE FROM main.entry_terms WHERE entry_id=?", (entry_id,))
+    if sealed is not None:
+        cur.executemany("INSERT OR IGNORE INTO main.entry_terms (term, entry_id) VALUES (?, ?)",
+                        [(term, entry_id) for term in sealed.terms])
+
+
+def _mark_changed(cur, entry_id):
+    """Queue a written entry for the next sync (sync.py)"""
+    cur.execute("INSERT OR IGNORE INTO main.sync_pending (entry_id) VALUES (?)", (entry_id,))
+
+
+def _insert_entry(cur, title, enc_content, mood, tags, created_at, updated_at, is_favorite,
+                  word_count=None, char_count=None, sealed=None, fingerprint=None):
+    title, mood, tags, meta, mood_index = _stored_metadata(cur, title, mood, tags, sealed)
+    content_mac, meta_mac = fingerprint or (None, None)
+    cur.execute("""
+        INSERT INTO entries (title, content, mood, tags, created_at, updated_at, is_favorite,
+                             word_count, char_count, meta, mood_index, content_mac, meta_mac)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (title, enc_content, mood, tags, created_at, updated_at, 1 if is_favorite else 0,
+          word_count, char_count, meta, mood_index, content_mac, meta_mac))
+    entry_id = cur.lastrowid
+    _store_terms(cur, entry_id, sealed)
+    _mark_changed(cur, entry_id)
+    return entry_id
+
+
+def _update_entry(cur, entry_id, title, enc_content, mood, tags, updated_at, word_count=None, char_count=None,
+                  sealed=None, fingerprint=None):
+    """
+    Rewrite an entry; returns False, having written nothing, when `fingerprint`
+    matches the stored one. If only the metadata changed the text is left in
+    place (an archived entry stays archived) and `enc_content` may be None.
+    """
+    table = _entry_table(cur.connection, entry_id)
+    stored = _stored_fingerprint(cur.connection, entry_id)
+    if fingerprint is not None and stored == fingerprint:
+        metrics.incr("db.unchanged_updates")
+        return False
+    same_text = fingerprint is not None and stored is not None and stored.content == fingerprint.content
+    if enc_content is None and not same_text:
+        raise ValueError(f"The text of entry {entry_id} changed: it has to be encrypted again")
+    content_mac, meta_mac = fingerprint or (None, None)
+    title, mood, tags, meta, mood_index = _stored_metadata(cur, title, mood, tags, sealed)
+    if same_text:
+        metrics.incr("db.text_writes_skipped")
+        cur.execute(f"""
+            UPDATE {table}
+            SET title=?, mood=?, tags=?, updated_at=?, meta=?, mood_index=?, meta_mac=?
+            WHERE id=?
+        """, (title, mood, tags, updated_at, meta, mood_index, meta_mac, entry_id))
+    else:
+        cur.execute(f"""
+            UPDATE {table}
+            SET title=?, content=?, mood=?, tags=?, updated_at=?, word_count=?, char_count=?, meta=?, mood_index=?,
+                pack_id=NULL, content_mac=?, meta_mac=?
+            WHERE id=?
+        """, (title, enc_content, mood, tags, updated_at, word_count, char_count, meta, mood_index,
+              content_mac, meta_mac, entry_id))
+    _store_terms(cur, entry_id, sealed, replace=True)
+    _mark_changed(cur, entry_id)
+    return True
+
+
+def _stored_fingerprint(conn, entry_id):
+    """Fingerprint stored with an entry; None if it has none yet or does not exist"""
+    row = conn.execute(f"SELECT content_mac, meta_mac FROM {_entry_table(conn, entry_id)} WHERE id=?",
+                       (entry_id,)).fetchone()
+    return metadata_crypto.Fingerprint(*row) if row is not None and row[0] is not None else None
+
+
+def _delete_entry(cur, entry_id):
+    """Move an entry to the trash"""
+    table = _entry_table(cur.connection, entry_id)
+    cur.execute(f"INSERT OR REPLACE INTO main.trash ({ENTRY_COLUMNS}, deleted_at) "
+                f"SELECT {ENTRY_COLUMNS}, ? FROM {table} WHERE id=?", (datetime.now(), entry_id))
+    cur.execute(f"DELETE FROM {table} WHERE id=?", (entry_id,))
+    if table != "entries":
+        cur.execute("DELETE FROM entry_shards WHERE id=?", (entry_id,))
+    _mark_changed(cur, entry_id)
+
+
+def _restore_entry(cur, entry_id):
+    """
+    Move an entry from the trash back into diary.db (rotating again files a past
+    year's entry in its shard). False if it is not in the trash.
+    """
+    cur.execute(f"INSERT INTO main.entries ({ENTRY_COLUMNS}) SELECT {ENTRY_COLUMNS} FROM main.trash WHERE id=?",
+                (entry_id,))
+    if not cur.rowcount:
+        return False
+    cur.execute("DELETE FROM main.trash WHERE id=?", (entry_id,))
+    _mark_changed(cur, entry_id)
+    return True
+
+
+def _purge_trash(cur, entry_ids=None, deleted_before=None):
+    """Delete trashed entries for good (the given ids, those deleted before a time, or all); returns their ids"""
+    if entry_ids is not None:
+        ids = []
+        for i in range(0, len(entry_ids), ID_CHUNK):
+            chunk = entry_ids[i:i + ID_CHUNK]
+            ids += [row[0] for row in cur.execute(
+                f"SELECT id FROM main.trash WHERE id IN ({','.join('?' * len(chunk))})", chunk).fetchall()]
+    elif deleted_before is not None:
+        ids = [row[0] for row in cur.execute("SELECT id FROM main.trash WHERE deleted_at < ?",
+                                             (deleted_before,)).fetchall()]
+    else:
+        ids = [row[0] for row in cur.execute("SELECT id FROM main.trash").fetchall()]
+    for i in range(0, len(ids), ID_CHUNK):
+        chunk = ids[i:i + ID_CHUNK]
+        marks = ','.join('?' * len(chunk))
+        cur.execute(f"DELETE FROM main.trash WHERE id IN ({marks})", chunk)
+        # Kept while trashed so a restore needs no key
+        cur.execute(f"DELETE FROM main.entry_terms WHERE entry_id IN ({marks})", chunk)
+        cur.execute(f"UPDATE main.sync_entries SET entry_id=NULL WHERE entry_id IN ({marks})", chunk)
+    return ids
+
+
+def _toggle_favorite(cur, entry_id):
+    table = _entry_table(cur.connection, entry_id)
+    cur.execute(f"SELECT is_favorite FROM {table} WHERE id=?", (entry_id,))
+    current = cur.fetchone()[0]
+    cur.execute(f"UPDATE {table} SET is_favorite=? WHERE id=?", (1 if current == 0 else 0, entry_id))
+    _mark_changed(cur, entry_id)
+
+
+# Entries live in diary.db and, once old years have been rotated out, in year
+# shards (shards.py). These helpers hide that from the queries below.
+
+def _entry_tables(conn, newest_year=None, oldest_year=None, oldest_first=False):
+    """
+    Every table holding entries: diary.db's, then each year shard's newest first
+    (optionally oldest first, or only years from `oldest_year` to `newest_year`).
+    A shard is attached while it is iterated.
+    """
+    yield "entries"
+    years = shards.years()
+    for year in reversed(years) if oldest_first else years:
+        if (newest_year is None or year <= newest_year) and (oldest_year is None or year >= oldest_year):
+            with shards.attached(conn, year) as schema:
+                yield f"{schema}.entries"
+
+
+def _entry_table(conn, entry_id):
+    """The table holding one entry; its shard stays attached until the connection closes"""
+    year = shards.year_of(conn, entry_id)
+    return "entries" if year is None else f"{shards.attach(conn, year)}.entries"
+
+
+def _stored_tables(conn):
+    """_entry_tables and the trash: every table holding entry rows"""
+    yield from _entry_tables(conn)
+    yield "main.trash"
+
+
+def _entry_id_groups(conn, entry_ids):
+    """(table, ids) pairs covering `entry_ids`, each shard attached while it is iterated"""
+    for year, ids in shards.group_ids(conn, entry_ids).items():
+        if year is None:
+            yield "entries", ids
+        else:
+            with shards.attached(conn, year) as schema:
+                yield f"{schema}.entries", ids
+
+
+def _filter_sql(search_query=None, filter_mood=None, filter_favorite=False, filter_tag=None, key=None,
+                paged=False):
+    """
+    WHERE clause fragment and parameters for the entry list filters (see entry_query.py).
+    With encrypted metadata the filters match blind indexes, computed with `key`.
+    """
+    from entry_query import EntryQuery
+    return EntryQuery.from_filters(search_query, filter_mood, filter_favorite, filter_tag).where(key, paged)
+
+
+def _select_entry_rows(cur, search_query=None, filter_mood=None, filter_favorite=False,
+                       limit=None, offset=0, after=None, filter_tag=None, key=None, query=None):
+    """
+    Encrypted rows, newest first (or in `query`'s order; an EntryQuery replaces the filters).
+    `after` is a (created_at, id) keyset cursor: only rows older than it are returned.
+    """
+    from entry_query import EntryQuery
+    if query is None:
+        query = EntryQuery.from_filters(search_query, filter_mood, filter_favorite, filter_tag,
+                                        limit=limit, offset=offset, after=after)
+    return query._rows(cur.connection, key)
+
+
+def _row_to_entry(r, key, undecryptable_text=UNDECRYPTABLE_TEXT, pack=None):
+    """Decrypted entry dict; `pack` is the unpacked archive pack of an archived row, if already loaded"""
+    try:
+        # 🔒 CRITICAL: This will fail if diary.key was deleted
+        if r[12] is not None:
+            # Archived: the text is in a compressed pack (archive.py)
+            content = (pack if pack is not None else archive.unpack(r[12], key))[r[0]]
+        else:
+            content = decrypt_content(r[2], key)
+        decryptable = True
+    except Exception:
+        content = undecryptable_text
+        decryptable = False
+    
+    title, mood, tags = r[1], r[3], r[4]
+    if r[10] is not None:
+        try:
+            title, mood, tags = metadata_crypto.keys_for(key).open(r[10])
+        except Exception:
+            title = "🔒 Undecryptable"
+            decryptable = False
+    
+    return {
+        "id": r[0],
+        "title": title,
+        "content": content,
+        "mood": mood,
+        "tags": tags,
+        "created_at": r[5],
+        "updated_at": r[6],
+        "is_favorite": r[7] == 1,
+        "word_count": r[8],
+        "char_count": r[9],
+        "fingerprint": _fingerprint_hex(r),
+        "decryptable": decryptable
+    }
+
+
+def _fingerprint_hex(r):
+    if r[13] is None:
+        return None  # written before fingerprints were stored
+    return metadata_crypto.fingerprint_hex(metadata_crypto.Fingerprint(r[13], r[14]))
+
+
+def _rows_to_entries(rows, key, undecryptable_text=UNDECRYPTABLE_TEXT, conn=None):
+    """_row_to_entry for many rows, unpacking each archive pack they need once"""
+    packs = {}
+    for pack_id in {r[12] for r in rows if r[12] is not None}:
+        try:
+            packs[pack_id] = archive.unpack(pack_id, key, conn)
+        except Exception:
+            packs[pack_id] = {}  # its entries come out undecryptable
+    return [_row_to_entry(r, key, undecryptable_text, packs.get(r[12])) for r in rows]
+
+
+def _count_decrypted(rows):
+    if metrics.ENABLED:
+        metrics.incr("db.rows_decrypted", len(rows))
+        metrics.incr("db.bytes_decrypted", sum(len(r[2]) + len(r[10] or b"") for r in rows))
+
+
+# Change notifications: listeners are called as listener(change, entry_id) after a write
+# has been committed, on the thread that made it.
+ENTRY_ADDED = "added"
+ENTRY_UPDATED = "updated"
+ENTRY_DELETED = "deleted"
+ENTRY_FAVORITED = "favorited"
+
+_change_listeners = []
+
+
+def add_change_listener(listener):
+    """Register listener(change, entry_id) for committed writes"""
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+
+
+def remove_change_listener(listener):
+    if listener in _change_listeners:
+        _change_listeners.remove(listener)
+
+
+def _notify(change, entry_id):
+    for listener in list(_change_listeners):
+        try:
+            listener(change, entry_id)
+        except Exception:
+            # The write is already committed; a broken listener must not make it look failed
+            metrics.incr("database.listener_failures")
+
+
+@metrics.timed("database.add_entry")
+def add_entry(title, content, key, mood=None, tags=None, created_at=None, updated_at=None, is_favorite=False):
+    """Add new diary entry and return its id (timestamps default to now, used by import)"""
+    conn = _connect()
     cur = conn.cursor()
     enc_content = encrypt_content(content, key)
-    cur.execute("""
-        INSERT INTO entries (title, content, mood, tags, created_at, updated_at, is_favorite)
-        VALUES (?, ?, ?, ?, ?, ?, 0)
-    """, (title, enc_content, mood, tags, datetime.now(), datetime.now()))
-    conn.commit()
+    now = datetime.now()
+    entry_id = _insert_entry(cur, title, enc_content, mood, tags, created_at or now,
+                             updated_at or created_at or now, is_favorite, *text_counts(content),
+                             seal_metadata(title, mood, tags, key),
+                             entry_fingerprint(title, content, mood, tags, key))
+    _commit(conn)
     conn.close()
+    _notify(ENTRY_ADDED, entry_id)
+    return entry_id
 
 
+@metrics.timed("database.update_entry")
 def update_entry(entry_id, title, content, key, mood=None, tags=None):
-    """Update existing diary entry"""
-    conn = sqlite3.connect(DB_PATH)
+    """
+    Update existing diary entry; returns False if nothing changed. An unchanged
+    text is not encrypted and written again.
+    """
+    conn = _connect()
     cur = conn.cursor()
-    enc_content = encrypt_content(content, key)
-    cur.execute("""
-        UPDATE entries 
-        SET title=?, content=?, mood=?, tags=?, updated_at=?
-        WHERE id=?
-    """, (title, enc_content, mood, tags, datetime.now(), entry_id))
-    conn.commit()
+    fingerprint = entry_fingerprint(title, content, mood, tags, key)
+    stored = _stored_fingerprint(conn, entry_id)
+    if stored == fingerprint:
+        conn.close()
+        metrics.incr("db.unchanged_updates")
+        return False
+    same_text = stored is not None and stored.content == fingerprint.content
+    enc_content = None if same_text else encrypt_content(content, key)
+    changed = _update_entry(cur, entry_id, title, enc_content, mood, tags, datetime.now(), *text_counts(content),
+                            seal_metadata(title, mood, tags, key), fingerprint)
+    _commit(conn)
     conn.close()
+    if changed:
+        _notify(ENTRY_UPDATED, entry_id)
+    return changed
 
 
+@metrics.timed("database.delete_entry")
 def delete_entry(entry_id):
-    """Delete diary entry"""
-    conn = sqlite3.connect(DB_PATH)
+    """Move diary entry to the trash"""
+    conn = _connect()
     cur = conn.cursor()
-    cur.execute("DELETE FROM entries WHERE id=?", (entry_id,))
-    conn.commit()
+    _delete_entry(cur, entry_id)
+    _commit(conn)
+    conn.close()
+    _notify(ENTRY_DELETED, entry_id)
+
+
+@metrics.timed("database.restore_entry")
+def restore_entry(entry_id):
+    """Move an entry back out of the trash; False if it is not there (purged meanwhile)"""
+    conn = _connect()
+    restored = _restore_entry(conn.cursor(), entry_id)
+    _commit(conn)
+    conn.close()
+    if restored:
+        _notify(ENTRY_ADDED, entry_id)
+    return restored
+
+
+@metrics.timed("database.fetch_trash")
+def fetch_trash(key):
+    """Trashed entries, most recently deleted first, with their deleted_at times"""
+    conn = _connect()
+    rows = conn.execute(f"SELECT {ENTRY_COLUMNS}, deleted_at FROM main.trash "
+                        "ORDER BY deleted_at DESC, id DESC").fetchall()
+    _count_decrypted(rows)
+    entries = _rows_to_entries(rows, key, conn=conn)
+    conn.close()
+    for entry, row in zip(entries, rows):
+        entry["deleted_at"] = row[-1]
+    return entries
+
+
+@metrics.timed("database.purge_trash")
+def purge_trash(entry_ids=None, older_than_days=None):
+    """
+    Delete trashed entries for good: the given ids, those deleted more than
+    `older_than_days` ago, or (with neither) the whole trash. Returns the number purged.
+    """
+    deleted_before = datetime.now() - timedelta(days=older_than_days) if older_than_days is not None else None
+    conn = _connect()
+    purged = _purge_trash(conn.cursor(), entry_ids, deleted_before)
+    _commit(conn)
     conn.close()
+    return len(purged)
 
 
+@metrics.timed("database.toggle_favorite")
 def toggle_favorite(entry_id):
     """Toggle favorite status"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     cur = conn.cursor()
-    cur.execute("SELECT is_favorite FROM entries WHERE id=?", (entry_id,))
-    current = cur.fetchone()[0]
-    cur.execute("UPDATE entries SET is_favorite=? WHERE id=?", (1 if current == 0 else 0, entry_id))
-    conn.commit()
+    _toggle_favorite(cur, entry_id)
+    _commit(conn)
     conn.close()
+    _notify(ENTRY_FAVORITED, entry_id)
 
 
-def fetch_entries(key, search_query=None, filter_mood=None, filter_favorite=False):
+@metrics.timed("database.fetch_entries")
+def fetch_entries(key, search_query=None, filter_mood=None, filter_favorite=False, limit=None, offset=0,
+                  after=None, filter_tag=None, query=None):
     """
-    Fetch all diary entries with optional filters.
+    Fetch diary entries (newest first) with optional filters and paging.
+    `after` is a (created_at, id) cursor from the last entry of the previous page.
+    `query` is an EntryQuery (entry_query.py) used instead of the filter arguments.
     🔒 Returns 'Undecryptable' if diary.key is missing/corrupted
     """
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    query = "SELECT id, title, content, mood, tags, created_at, updated_at, is_favorite FROM entries WHERE 1=1"
-    params = []
-    
-    if search_query:
-        query += " AND title LIKE ?"
-        params.append(f'%{search_query}%')
-    
-    if filter_mood:
-        query += " AND mood=?"
-        params.append(filter_mood)
-    
-    if filter_favorite:
-        query += " AND is_favorite=1"
-    
-    query += " ORDER BY created_at DESC"
-    
-    cur.execute(query, params)
-    rows = cur.fetchall()
+    conn = _connect()
+    rows = _select_entry_rows(conn.cursor(), search_query, filter_mood, filter_favorite, limit, offset, after,
+                              filter_tag, key, query)
     conn.close()
     
-    result = []
-    for r in rows:
-        try:
-            # 🔒 CRITICAL: This will fail if diary.key was deleted
-            content = decrypt_content(r[2], key)
-            decryptable = True
-        except Exception:
-            content = "🔒 Undecryptable - Diary key missing or corrupted"
-            decryptable = False
-        
-        result.append({
-            "id": r[0],
-            "title": r[1],
-            "content": content,
-            "mood": r[3],
-            "tags": r[4],
-            "created_at": r[5],
-            "updated_at": r[6],
-            "is_favorite": r[7] == 1,
-            "decryptable": decryptable
-        })
-    
-    return result
+    _count_decrypted(rows)
+    return _rows_to_entries(rows, key)
+
+
+@metrics.timed("database.count_entries")
+def count_entries(search_query=None, filter_mood=None, filter_favorite=False, filter_tag=None, key=None,
+                  query=None):
+    """Number of entries matching the filters or `query` (no decryption; `key` is needed with encrypted metadata)"""
+    conn = _connect()
+    total = _count_entries(conn, search_query, filter_mood, filter_favorite, filter_tag, key, query)
+    conn.close()
+    return total
+
+
+def _count_entries(conn, search_query=None, filter_mood=None, filter_favorite=False, filter_tag=None, key=None,
+                   query=None):
+    from entry_query import EntryQuery
+    if query is None:
+        query = EntryQuery.from_filters(search_query, filter_mood, filter_favorite, filter_tag)
+    return query._count(conn, key)
+
+
+@metrics.timed("database.entry_matches")
+def entry_matches(entry_id, search_query=None, filter_mood=None, filter_favorite=False, key=None):
+    """True if the entry exists and passes the list filters (same SQL as fetch_entries)"""
+    conn = _connect()
+    where, params = _filter_sql(search_query, filter_mood, filter_favorite, key=key)
+    row = conn.execute(f"SELECT 1 FROM {_entry_table(conn, entry_id)}{where} AND id=?",
+                       params + [entry_id]).fetchone()
+    conn.close()
+    return row is not None
 
 
+@metrics.timed("database.get_entry_by_id")
 def get_entry_by_id(entry_id, key):
     """Get single entry by ID"""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT id, title, content, mood, tags, created_at, updated_at, is_favorite FROM entries WHERE id=?", (entry_id,))
-    r = cur.fetchone()
+    conn = _connect()
+    r = _select_entry_row(conn, entry_id)
     conn.close()
     
     if not r:
         return None
     
-    try:
-        content = decrypt_content(r[2], key)
-        decryptable = True
-    except Exception:
-        content = "🔒 Undecryptable"
-        decryptable = False
+    _count_decrypted([r])
+    return _row_to_entry(r, key, "🔒 Undecryptable")
+
+
+def _select_entry_row(conn, entry_id):
+    return conn.execute(f"SELECT {ENTRY_COLUMNS} FROM {_entry_table(conn, entry_id)} WHERE id=?",
+                        (entry_id,)).fetchone()
+
+
+# Id lists are queried in chunks to stay under SQLite's bound parameter limit
+ID_CHUNK = 500
+
+
+@metrics.timed("database.get_entries_by_ids")
+def get_entries_by_ids(entry_ids, key):
+    """Entries for the given ids, in the same order (ids that no longer exist are skipped)"""
+    conn = _connect()
+    rows = _select_entry_rows_by_ids(conn, entry_ids)
+    conn.close()
     
-    return {
-        "id": r[0],
-        "title": r[1],
-        "content": content,
-        "mood": r[3],
-        "tags": r[4],
-        "created_at": r[5],
-        "updated_at": r[6],
-        "is_favorite": r[7] == 1,
-        "decryptable": decryptable
-    }
+    _count_decrypted(list(rows.values()))
+    found = [rows[i] for i in entry_ids if i in rows]
+    return _rows_to_entries(found, key)
+
+
+def _select_entry_rows_by_ids(conn, entry_ids):
+    """{id: encrypted row} for the ids that exist"""
+    rows = {}
+    for table, ids in _entry_id_groups(conn, entry_ids):
+        for i in range(0, len(ids), ID_CHUNK):
+            chunk = ids[i:i + ID_CHUNK]
+            cur = conn.execute(f"SELECT {ENTRY_COLUMNS} FROM {table} WHERE id IN ({','.join('?' * len(chunk))})",
+                               chunk)
+            rows.update((r[0], r) for r in cur.fetchall())
+    return rows
 
 
-def get_stats():
-    """Get diary statistics"""
-    conn = sqlite3.connect(DB_PATH)
+@metrics.timed("database.filter_entry_ids")
+def filter_entry_ids(entry_ids, filter_mood=None, filter_favorite=False, key=None):
+    """The ids (in the given order) of entries that exist and pass the mood / favorite filters"""
+    if not entry_ids:
+        return []
+    conn = _connect()
+    where, params = _filter_sql(None, filter_mood, filter_favorite, key=key)
+    keep = set()
+    for table, ids in _entry_id_groups(conn, entry_ids):
+        for i in range(0, len(ids), ID_CHUNK):
+            chunk = ids[i:i + ID_CHUNK]
+            cur = conn.execute(f"SELECT id FROM {table}{where} AND id IN ({','.join('?' * len(chunk))})",
+                               params + list(chunk))
+            keep.update(r[0] for r in cur.fetchall())
+    conn.close()
+    return [i for i in entry_ids if i in keep]
+
+
+# Columns analytics.py aggregates: nothing here needs the diary key
+METADATA_COLUMNS = "id, created_at, mood, is_favorite, word_count, char_count"
+
+
+@metrics.timed("database.fetch_entry_metadata")
+def fetch_entry_metadata(entry_id=None, key=None):
+    """
+    Unencrypted metadata rows (METADATA_COLUMNS) of one entry or of all entries.
+    With encrypted metadata, moods are named through their blind index (`key` needed).
+    """
+    conn = _connect()
+    columns = METADATA_COLUMNS + ", mood_index"
+    if entry_id is None:
+        rows = [row for table in _entry_tables(conn)
+                for row in conn.execute(f"SELECT {columns} FROM {table}").fetchall()]
+    else:
+        rows = conn.execute(f"SELECT {columns} FROM {_entry_table(conn, entry_id)} WHERE id=?",
+                            (entry_id,)).fetchall()
+    tokens = {row[6] for row in rows if row[6] is not None}
+    names = _mood_names(conn, tokens, key) if tokens else {}
+    conn.close()
+    return [(*row[:2], row[2] or names.get(row[6]), *row[3:6]) for row in rows]
+
+
+def _mood_names(conn, tokens, key):
+    """{mood_index: mood}; decrypts one entry for each mood not seen before"""
+    keys = _metadata_keys(key)
+    for token in tokens:
+        if token in keys.mood_names:
+            continue
+        for table in _entry_tables(conn):
+            row = conn.execute(f"SELECT meta FROM {table} WHERE mood_index=? LIMIT 1", (token,)).fetchone()
+            if row:
+                try:
+                    keys.open(row[0])
+                except Exception:
+                    pass
+                break
+    return {token: keys.mood_names.get(token, "🔒 Undecryptable") for token in tokens}
+
+
+@metrics.timed("database.backfill_text_counts")
+def backfill_text_counts(key, batch_size=500):
+    """
+    Store word / character counts for entries written before they existed.
+    Decrypts each such entry once; undecryptable ones are left without counts.
+    Returns the number of entries updated.
+    """
+    conn = _connect()
+    updated = 0
+    for table in _entry_tables(conn):
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                f"SELECT id, content FROM {table} WHERE word_count IS NULL AND pack_id IS NULL AND id > ? "
+                "ORDER BY id LIMIT ?",
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            counts = []
+            for entry_id, enc_content in rows:
+                try:
+                    counts.append((*text_counts(decrypt_content(enc_content, key)), entry_id))
+                except Exception:
+                    continue
+            conn.executemany(f"UPDATE {table} SET word_count=?, char_count=? WHERE id=?", counts)
+            _commit(conn)
+            updated += len(counts)
+    conn.close()
+    return updated
+
+
+@metrics.timed("database.backfill_fingerprints")
+def backfill_fingerprints(key, batch_size=200, max_seconds=None, passed=None):
+    """
+    Store fingerprints for entries last written before they existed, a batch per
+    transaction until done or `max_seconds` have passed. Each batch is read,
+    decrypted and updated under the write lock, so an edit committed meanwhile
+    is never given the old text's fingerprint. Undecryptable entries are left
+    without one; pass the same `passed` dict ({table: last id looked at}) to
+    later calls so they resume there instead of decrypting those again.
+    Returns the number of entries updated.
+    """
+    deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+    passed = {} if passed is None else passed
+    conn = _connect()
     cur = conn.cursor()
+    updated = 0
+    try:
+        for table in _entry_tables(conn):
+            while deadline is None or time.monotonic() < deadline:
+                cur.execute("BEGIN IMMEDIATE")
+                try:
+                    rows = cur.execute(
+                        f"SELECT {ENTRY_COLUMNS} FROM {table} WHERE content_mac IS NULL AND id > ? ORDER BY id LIMIT ?",
+                        (passed.get(table, 0), batch_size)
+                    ).fetchall()
+                    fingerprints = [(*entry_fingerprint(e["title"], e["content"], e["mood"], e["tags"], key), e["id"])
+                                    for e in _rows_to_entries(rows, key, conn=conn) if e["decryptable"]]
+                    cur.executemany(f"UPDATE {table} SET content_mac=?, meta_mac=? WHERE id=? AND content_mac IS NULL",
+                                    fingerprints)
+                    _commit(conn)
+                except Exception:
+                    conn.rollback()
+                    raise
+                if not rows:
+                    break
+                passed[table] = rows[-1][0]
+                updated += len(fingerprints)
+    finally:
+        conn.close()
+    return updated
+
+
+@metrics.timed("database.fetch_changed_entries")
+def fetch_changed_entries(key, known=None):
+    """
+    Entries, oldest first, whose (fingerprint, is_favorite) differs from `known`
+    {entry id: (fingerprint hex, is_favorite)}, e.g. from an earlier export; all
+    of them without it. Matching entries are not decrypted; entries without a
+    stored fingerprint always count as changed.
+    Returns (entries, {entry id: (fingerprint hex, is_favorite)} of every entry).
+    """
+    known = known or {}
+    conn = _connect()
+    current, changed = {}, []
+    for table in _entry_tables(conn):
+        for entry_id, content_mac, meta_mac, is_favorite in conn.execute(
+                f"SELECT id, content_mac, meta_mac, is_favorite FROM {table}"):
+            fingerprint = None
+            if content_mac is not None:
+                fingerprint = metadata_crypto.fingerprint_hex(metadata_crypto.Fingerprint(content_mac, meta_mac))
+            current[entry_id] = (fingerprint, is_favorite == 1)
+            if fingerprint is None or known.get(entry_id) != current[entry_id]:
+                changed.append(entry_id)
+    conn.close()
+    entries = get_entries_by_ids(changed, key)
+    entries.sort(key=lambda e: (str(e["created_at"]), e["id"]))
+    return entries, current
+
+
+@metrics.timed("database.get_stats")
+def get_stats(key=None):
+    """Get diary statistics (`key` names the moods when metadata is encrypted)"""
+    conn = _connect()
+    try:
+        return _stats(conn, key)
+    finally:
+        conn.close()
+
+
+def _stats(conn, key=None):
+    """get_stats on an open connection"""
+    cur = conn.cursor()
+    encrypted = _load_settings(cur)
     
-    cur.execute("SELECT COUNT(*) FROM entries")
-    total = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM entries WHERE is_favorite=1")
-    favorites = cur.fetchone()[0]
-    
-    cur.execute("SELECT mood, COUNT(*) FROM entries WHERE mood IS NOT NULL GROUP BY mood")
-    moods = dict(cur.fetchall())
+    total = favorites = 0
+    moods = {}
+    sealed_moods = {}
+    for table in _entry_tables(conn):
+        cur.execute(f"SELECT COUNT(*) FROM {table}")
+        total += cur.fetchone()[0]
+        
+        cur.execute(f"SELECT COUNT(*) FROM {table} WHERE is_favorite=1")
+        favorites += cur.fetchone()[0]
+        
+        cur.execute(f"SELECT mood, COUNT(*) FROM {table} WHERE mood IS NOT NULL GROUP BY mood")
+        for mood, count in cur.fetchall():
+            moods[mood] = moods.get(mood, 0) + count
+        
+        if encrypted:
+            cur.execute(f"SELECT mood_index, COUNT(*) FROM {table} WHERE mood_index IS NOT NULL GROUP BY mood_index")
+            for token, count in cur.fetchall():
+                sealed_moods[token] = sealed_moods.get(token, 0) + count
     
-    conn.close()
+    if sealed_moods:
+        for token, mood in _mood_names(conn, sealed_moods, key).items():
+            moods[mood] = moods.get(mood, 0) + sealed_moods[token]
     
     return {
         "total_entries": total,
         "favorites": favorites,
         "moods": moods,
         "diary_encrypted": os.path.exists(DIARY_KEY_FILE)
-    }
\ No newline at end of file
+    }
+
+@metrics.timed("database.encrypt_metadata")
+def encrypt_metadata(key, batch_size=500):
+    """
+    Switch the diary to encrypted titles, moods and tags (see metadata_crypto.py).
+    Seals every row still stored in plaintext, a batch per transaction, with
+    secure_delete on so the overwritten plaintext is zeroed in the file.
+    Safe to run again; returns the number of rows sealed.
+    """
+    global _metadata_encrypted
+    keys = metadata_crypto.keys_for(key)
+    conn = _connect()
+    conn.execute("INSERT OR REPLACE INTO settings (name, value) VALUES ('encrypted_metadata', '1')")
+    _commit(conn)
+    _metadata_encrypted = True
+
+    sealed_rows = 0
+    for table in _stored_tables(conn):
+        schema = table.split(".")[0] if "." in table else "main"
+        conn.execute(f"PRAGMA {schema}.secure_delete = ON")
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                f"SELECT id, title, mood, tags FROM {table} WHERE meta IS NULL AND id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            cur = conn.cursor()
+            for entry_id, title, mood, tags in rows:
+                sealed = keys.seal(title, mood, tags)
+                cur.execute(f"UPDATE {table} SET title='', mood=NULL, tags=NULL, meta=?, mood_index=? WHERE id=?",
+                            (sealed.meta, sealed.mood_index, entry_id))
+                _store_terms(cur, entry_id, sealed, replace=True)
+            _commit(conn)
+            sealed_rows += len(rows)
+    conn.close()
+    return sealed_rows
+
+
+@metrics.timed("database.metadata_status")
+def metadata_status():
+    """{"encrypted": bool, "plaintext_rows": rows whose title / mood / tags are still readable}"""
+    conn = _connect()
+    plaintext = sum(conn.execute(f"SELECT COUNT(*) FROM {table} WHERE meta IS NULL").fetchone()[0]
+                    for table in _stored_tables(conn))
+    terms = conn.execute("SELECT COUNT(*) FROM entry_terms").fetchone()[0]
+    conn.close()
+    return {"encrypted": metadata_encrypted(), "plaintext_rows": plaintext, "index_terms": terms}
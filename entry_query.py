@@ -0,0 +1,299 @@
+# entry_query.py
+"""
+Structured entry queries.
+
+EntryQuery describes which entries to list and in what order: title text,
+a set of moods, tags (any / all), a date range, favorites, word counts,
+sort order and paging. It compiles to parameterized SQL run against every
+entry table (diary.db and the year shards, see shards.py). With encrypted
+metadata the text, mood and tag filters match blind indexes instead
+(metadata_crypto.py), so they need the diary key.
+
+The SQL only depends on the query's shape (which filters are set, how many
+values each binds, order, paging), never on the values themselves. Compiled
+statements are cached per shape, and the stable SQL text lets sqlite3 reuse
+its prepared statements on long-lived connections (async_db.py, the write
+queue).
+
+    q = EntryQuery(moods={"Calm", "Happy"}, tags_any=["work", "travel"],
+                   date_from=date(2024, 1, 1), min_words=200, order="longest", limit=50)
+    entries = q.fetch(key)
+    total = q.count(key)
+    print("\\n".join(q.explain(key)))     # SQLite's plan for each entry table
+"""
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import database
+import metadata_crypto
+import metrics
+import shards
+
+# Order name -> (ORDER BY clause, python sort key over ENTRY_COLUMNS rows, descending)
+ORDERS = {
+    "newest": ("created_at DESC, id DESC", lambda r: (str(r[5]), r[0]), True),
+    "oldest": ("created_at ASC, id ASC", lambda r: (str(r[5]), r[0]), False),
+    "longest": ("word_count DESC, id DESC", lambda r: (-1 if r[8] is None else r[8], r[0]), True),
+    "shortest": ("word_count ASC, id ASC", lambda r: (-1 if r[8] is None else r[8], r[0]), False),
+}
+STATEMENT_CACHE_SIZE = 256
+
+_TAG_SQL = "',' || replace(replace(lower(tags), ' ', ''), char(9), '') || ',' LIKE ?"
+_SIMPLE_SQL = {
+    "favorite": "is_favorite=?",
+    "date_from": "created_at >= ?",
+    "date_before": "created_at < ?",
+    "date_to": "created_at <= ?",
+    "min_words": "word_count >= ?",
+    "max_words": "word_count <= ?",
+    "after_newest": "(created_at < ? OR (created_at = ? AND id < ?))",
+    "after_oldest": "(created_at > ? OR (created_at = ? AND id > ?))",
+}
+
+
+def _in(column, count):
+    return f"{column}=?" if count == 1 else f"{column} IN ({', '.join('?' * count)})"
+
+
+def _fragment(name, count, encrypted, paged):
+    """SQL for one filter binding `count` values"""
+    # Counts look matching ids up by rowid. Pages walk the order's index instead and stop
+    # once full (+id keeps SQLite from using the rowid), rather than sorting every match.
+    terms = f"{'+' if paged else ''}id IN (SELECT entry_id FROM main.entry_terms WHERE {{}})"
+    if name == "text" and encrypted:
+        # Every query word must start one of the title's words
+        return " AND " + " AND ".join([terms.format("term=?")] * count) if count else " AND 0"
+    if name == "text":
+        return " AND title LIKE ?"
+    if name == "moods":
+        return " AND " + _in("mood_index" if encrypted else "mood", count)
+    if name == "tags_any" and encrypted:
+        return " AND " + terms.format(_in("term", count))
+    if name == "tags_any":
+        return " AND (" + " OR ".join([_TAG_SQL] * count) + ")"
+    if name == "tags_all":
+        return " AND " + " AND ".join([terms.format("term=?") if encrypted else _TAG_SQL] * count)
+    return " AND " + _SIMPLE_SQL[name]
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _compile_where(shape):
+    encrypted, paged, filters = shape
+    return " WHERE 1=1" + "".join(_fragment(name, count, encrypted, paged) for name, count in filters)
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _statement(kind, shape, order=None, limited=False):
+    """
+    Cached statement text with a {table} placeholder: kind "rows" selects ENTRY_COLUMNS
+    in `order`, "count" counts matches.
+    """
+    if kind == "count":
+        return "SELECT COUNT(*) FROM {table}" + _compile_where(shape)
+    sql = f"SELECT {database.ENTRY_COLUMNS} FROM {{table}}{_compile_where(shape)} ORDER BY {ORDERS[order][0]}"
+    return sql + " LIMIT ? OFFSET ?" if limited else sql
+
+
+def statement_cache_info():
+    """functools cache statistics of the compiled statement cache"""
+    return _statement.cache_info()
+
+
+def _timestamp(value):
+    """date, datetime or ISO string -> date or datetime"""
+    if isinstance(value, str):
+        return date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+    return value
+
+
+class EntryQuery:
+    """
+    Entry filters, order and paging; see the module docstring.
+
+    text         title search (every word must start a title word once metadata is encrypted)
+    moods        any of these moods
+    tags_any     at least one of these tags
+    tags_all     every one of these tags
+    favorite     True / False for only favorites / non-favorites, None for both
+    date_from    first day (date) or moment (datetime), inclusive
+    date_to      last day (date) or moment (datetime), inclusive
+    min_words    word count range, inclusive (entries without counts yet, see
+    max_words    database.backfill_text_counts, never match and sort as shortest)
+    order        "newest", "oldest", "longest" or "shortest"
+    limit        page size (None = all), with offset
+    after        (created_at, id) keyset cursor from the previous page's last entry
+                 (newest / oldest order only)
+    """
+
+    def __init__(self, text=None, moods=None, tags_any=None, tags_all=None, favorite=None,
+                 date_from=None, date_to=None, min_words=None, max_words=None,
+                 order="newest", limit=None, offset=0, after=None):
+        if order not in ORDERS:
+            raise ValueError(f"Unknown order: {order!r} (expected one of {', '.join(ORDERS)})")
+        if after is not None and order not in ("newest", "oldest"):
+            raise ValueError("Keyset paging (after) needs the newest or oldest order")
+        self.text = text or None
+        self.moods = tuple(sorted({m for m in moods or () if m}))
+        self.tags_any = tuple(sorted({metadata_crypto.normalize_tag(t) for t in tags_any or () if t.strip()}))
+        self.tags_all = tuple(sorted({metadata_crypto.normalize_tag(t) for t in tags_all or () if t.strip()}))
+        self.favorite = favorite
+        self.date_from = _timestamp(date_from)
+        self.date_to = _timestamp(date_to)
+        self.min_words = min_words
+        self.max_words = max_words
+        self.order = order
+        self.limit = limit
+        self.offset = offset
+        self.after = after
+
+    @classmethod
+    def from_filters(cls, search_query=None, filter_mood=None, filter_favorite=False, filter_tag=None, **kwargs):
+        """The query behind fetch_entries' classic filter arguments"""
+        return cls(text=search_query, moods=[filter_mood] if filter_mood else None,
+                   tags_all=[filter_tag] if filter_tag else None,
+                   favorite=True if filter_favorite else None, **kwargs)
+
+    def replace(self, **changes):
+        """A copy with some fields changed, e.g. q.replace(after=(last["created_at"], last["id"]))"""
+        fields = {name: getattr(self, name) for name in (
+            "text", "moods", "tags_any", "tags_all", "favorite", "date_from", "date_to",
+            "min_words", "max_words", "order", "limit", "offset", "after")}
+        fields.update(changes)
+        return EntryQuery(**fields)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in vars(self).items()
+                           if value not in (None, (), 0) or name == "favorite" and value is False)
+        return f"EntryQuery({fields})"
+
+    # ------------------------------------------------------------ compiling
+
+    def _filters(self, keys, with_after=True):
+        """(name, values) of every filter that is set, in a fixed order"""
+        found = []
+        if self.text:
+            found.append(("text", keys.query_terms(self.text) if keys else [f"%{self.text}%"]))
+        if self.moods:
+            found.append(("moods", [keys.mood_index(m) for m in self.moods] if keys else list(self.moods)))
+        for name, tags in (("tags_any", self.tags_any), ("tags_all", self.tags_all)):
+            if tags:
+                found.append((name, [keys.tag_term(t) for t in tags] if keys else [f"%,{t},%" for t in tags]))
+        if self.favorite is not None:
+            found.append(("favorite", [1 if self.favorite else 0]))
+        if self.date_from is not None:
+            found.append(("date_from", [str(self.date_from)]))
+        if isinstance(self.date_to, datetime):
+            found.append(("date_to", [str(self.date_to)]))
+        elif self.date_to is not None:
+            found.append(("date_before", [str(self.date_to + timedelta(days=1))]))
+        if self.min_words is not None:
+            found.append(("min_words", [self.min_words]))
+        if self.max_words is not None:
+            found.append(("max_words", [self.max_words]))
+        if self.after is not None and with_after:
+            found.append((f"after_{self.order}", [self.after[0], self.after[0], self.after[1]]))
+        return found
+
+    def _shape(self, key=None, paged=False, with_after=True):
+        """(cache key, parameters) of the WHERE clause"""
+        encrypted = database.metadata_encrypted() and bool(self.text or self.moods or self.tags_any or self.tags_all)
+        keys = database._metadata_keys(key) if encrypted else None
+        filters = self._filters(keys, with_after)
+        shape = (encrypted, paged, tuple((name, len(values)) for name, values in filters))
+        return shape, [value for _, values in filters for value in values]
+
+    def where(self, key=None, paged=False):
+        """(" WHERE ..." clause, parameters), ignoring order and paging"""
+        shape, params = self._shape(key, paged, with_after=False)
+        return _compile_where(shape), params
+
+    def _year_range(self):
+        """(oldest, newest) shard years that can hold matches; None = unbounded"""
+        oldest = self.date_from.year if self.date_from is not None else None
+        newest = self.date_to.year if self.date_to is not None else None
+        if self.after is not None:
+            year = shards.year_of_timestamp(self.after[0])
+            if self.order == "newest":
+                newest = year if newest is None else min(newest, year)
+            else:
+                oldest = year if oldest is None else max(oldest, year)
+        return oldest, newest
+
+    def _tables(self, conn):
+        oldest, newest = self._year_range()
+        return database._entry_tables(conn, newest, oldest, oldest_first=self.order == "oldest")
+
+    # ------------------------------------------------------------ running
+
+    def _rows(self, conn, key=None):
+        """Encrypted rows (database.ENTRY_COLUMNS) in the query's order"""
+        paged = self.limit is not None
+        shape, params = self._shape(key, paged)
+        sql = _statement("rows", shape, self.order, paged)
+        if not shards.years():
+            if paged:
+                params += [self.limit, self.offset]
+            return conn.execute(sql.format(table="entries"), params).fetchall()
+
+        # Sharded: diary.db may hold any year (imports), each shard exactly one.
+        # In date order, years are visited in that order and stop once the page is full.
+        wanted = None if self.limit is None else self.offset + self.limit
+        if paged:
+            params += [wanted, 0]
+        sort_key, descending = ORDERS[self.order][1:]
+        rows = []
+        for table in self._tables(conn):
+            if wanted is not None and len(rows) >= wanted and table != "entries" and self.order in ("newest", "oldest"):
+                rows.sort(key=sort_key, reverse=descending)
+                boundary = str(rows[wanted - 1][5])[:4]
+                year = table[1:5]
+                if (boundary > year) if descending else (boundary < year):
+                    break
+            rows.extend(conn.execute(sql.format(table=table), params).fetchall())
+        rows.sort(key=sort_key, reverse=descending)
+        return rows[self.offset:wanted]
+
+    def _count(self, conn, key=None):
+        shape, params = self._shape(key, with_after=False)
+        sql = _statement("count", shape)
+        return sum(conn.execute(sql.format(table=table), params).fetchone()[0] for table in self._tables(conn))
+
+    @metrics.timed("entry_query.fetch")
+    def fetch(self, key):
+        """Decrypted entries (database.fetch_entries format)"""
+        conn = database._connect()
+        rows = self._rows(conn, key)
+        conn.close()
+        database._count_decrypted(rows)
+        return database._rows_to_entries(rows, key)
+
+    @metrics.timed("entry_query.count")
+    def count(self, key=None):
+        """Number of matching entries, ignoring limit / offset / after (no decryption)"""
+        conn = database._connect()
+        total = self._count(conn, key)
+        conn.close()
+        return total
+
+    def explain(self, key=None, count=False):
+        """
+        SQLite's query plan (EXPLAIN QUERY PLAN) for each entry table as text lines,
+        for fetch() or, with count=True, for count().
+        """
+        paged = self.limit is not None and not count
+        shape, params = self._shape(key, paged, with_after=not count)
+        sql = _statement("count", shape) if count else _statement("rows", shape, self.order, paged)
+        if paged:
+            params += [self.limit, self.offset]
+        conn = database._connect()
+        lines = [sql.format(table="<table>")]
+        try:
+            for table in self._tables(conn):
+                lines.append(f"{table}:")
+                depth = {0: 0}
+                for node, parent, _, detail in conn.execute("EXPLAIN QUERY PLAN " + sql.format(table=table), params):
+                    depth[node] = depth.get(parent, 0) + 1
+                    lines.append("  " * depth[node] + detail)
+        finally:
+            conn.close()
+        return lines
@@ -0,0 +1,129 @@
+# maintenance.py
+"""
+Trash expiry and space reclamation in small steps.
+
+Deleted entries wait in the trash (database.py) for trash_days() days, 30 by
+default and kept in the settings table, before purge_expired() deletes them
+for good.
+
+Purges, edits, archiving (archive.py) and rotations (shards.py) leave free
+pages inside diary.db and the year shards. With auto_vacuum = INCREMENTAL,
+set by migration, SQLite keeps track of those pages. `PRAGMA
+incremental_vacuum(N)` moves up to N of them to the end of the file and
+truncates it. reclaim() does that VACUUM_STEP_PAGES at a time until nothing
+is free, its time budget runs out or the caller asks it to stop. The write
+lock is only held for one step, so it can run while the app is idle
+(ui/scrub_task.py). A full VACUUM (`securediary shards compact`) is never
+needed for the file to shrink.
+
+    maintenance.run_slice(max_seconds=2.0)   # {"purged": 3, "reclaimed_bytes": 1048576, "free_bytes": 0}
+"""
+import time
+
+import database
+import metrics
+import shards
+
+DEFAULT_TRASH_DAYS = 30
+VACUUM_STEP_PAGES = 256   # pages per incremental_vacuum step (1 MB with 4 KB pages)
+
+
+# ---------------------------------------------------------------- trash
+
+def trash_days(conn=None):
+    """Trashed entries are purged this many days after they were deleted"""
+    own_conn = conn is None
+    if own_conn:
+        conn = database._connect()
+    row = conn.execute("SELECT value FROM settings WHERE name='trash_days'").fetchone()
+    if own_conn:
+        conn.close()
+    return int(row[0]) if row else DEFAULT_TRASH_DAYS
+
+
+def set_trash_days(days):
+    if days < 1:
+        raise ValueError("Trashed entries must be kept for at least one day")
+    conn = database._connect()
+    conn.execute("INSERT OR REPLACE INTO settings (name, value) VALUES ('trash_days', ?)", (str(days),))
+    database._commit(conn)
+    conn.close()
+
+
+@metrics.timed("maintenance.purge_expired")
+def purge_expired(days=None):
+    """Purge the entries trashed more than `days` (default: trash_days()) ago; returns how many"""
+    purged = database.purge_trash(older_than_days=days if days is not None else trash_days())
+    metrics.incr("maintenance.trash_purged", purged)
+    return purged
+
+
+# ---------------------------------------------------------------- free pages
+
+def _files(conn):
+    """(name, schema) of diary.db, then of each year shard, attached while it is iterated"""
+    yield "diary.db", "main"
+    for year in shards.years():
+        with shards.attached(conn, year) as schema:
+            yield str(year), schema
+
+
+def _pragma(conn, schema, name):
+    return conn.execute(f"PRAGMA {schema}.{name}").fetchone()[0]
+
+
+@metrics.timed("maintenance.reclaim")
+def reclaim(max_seconds=None, step_pages=VACUUM_STEP_PAGES, should_stop=None):
+    """
+    Return free pages to the file system, `step_pages` at a time, until none are
+    left, `max_seconds` have passed or should_stop() returns True.
+    Returns {"reclaimed_bytes", "free_bytes"} (free_bytes: what is left).
+    """
+    deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+
+    def out_of_budget():
+        return ((deadline is not None and time.monotonic() >= deadline)
+                or (should_stop is not None and should_stop()))
+
+    reclaimed = left = 0
+    conn = database._connect()
+    try:
+        for _, schema in _files(conn):
+            page_size = _pragma(conn, schema, "page_size")
+            free = _pragma(conn, schema, "freelist_count")
+            while free and not out_of_budget():
+                conn.execute(f"PRAGMA {schema}.incremental_vacuum({step_pages})").fetchall()
+                now_free = _pragma(conn, schema, "freelist_count")
+                if now_free >= free:
+                    break  # auto_vacuum is off for this file (init_db has not migrated it yet)
+                reclaimed += (free - now_free) * page_size
+                free = now_free
+            left += free * page_size
+    finally:
+        conn.close()
+    metrics.incr("maintenance.bytes_reclaimed", reclaimed)
+    return {"reclaimed_bytes": reclaimed, "free_bytes": left}
+
+
+def run_slice(max_seconds=None, should_stop=None):
+    """One maintenance round: purge expired trash, then reclaim free pages within the budget"""
+    purged = purge_expired()
+    return {"purged": purged, **reclaim(max_seconds, should_stop=should_stop)}
+
+
+def status():
+    """Trash contents and free space per file; needs no key"""
+    conn = database._connect()
+    entries, oldest = conn.execute("SELECT COUNT(*), MIN(deleted_at) FROM main.trash").fetchone()
+    files = []
+    for name, schema in _files(conn):
+        page_size = _pragma(conn, schema, "page_size")
+        files.append({
+            "file": name,
+            "bytes": _pragma(conn, schema, "page_count") * page_size,
+            "free_bytes": _pragma(conn, schema, "freelist_count") * page_size,
+            "incremental_vacuum": _pragma(conn, schema, "auto_vacuum") == database.INCREMENTAL_VACUUM,
+        })
+    result = {"trash_days": trash_days(conn), "trash_entries": entries, "oldest_deleted_at": oldest, "files": files}
+    conn.close()
+    return result
@@ -0,0 +1,133 @@
+# metadata_crypto.py
+"""
+Optional encryption of entry titles, moods and tags.
+
+By default only the entry text is encrypted. After
+`securediary metadata encrypt` (database.encrypt_metadata) each row stores
+its title, mood and tags as one Fernet token in `meta`, and the plaintext
+columns are blanked. Filters keep working on blind indexes, keyed HMACs of
+the values under a key derived from the diary key:
+
+- entries.mood_index: the mood's HMAC, indexed together with created_at
+- entry_terms (diary.db): one (term, entry id) row per tag and per prefix
+  of every title word, so title search matches the start of title words
+
+The database file then reveals which entries share a mood, a tag or a title
+word, but not what they are. Favorites stay a plain 0/1 column: a blind index
+over two values would hide nothing. Rows are only decrypted when fetched.
+
+Every row also stores a fingerprint (content_mac, meta_mac): keyed HMACs of
+its plaintext text and of its title, mood and tags, under another derived
+key. Saves compare them to skip writing what did not change, and exports
+and sync use them to tell unchanged entries apart without decrypting them.
+They reveal which entries are identical, nothing more.
+
+    keys = keys_for(key)
+    sealed = keys.seal(title, mood, tags)   # Sealed(meta, mood_index, terms)
+    keys.open(sealed.meta)                  # (title, mood, tags)
+    keys.fingerprint(title, text, mood, tags)   # Fingerprint(content, meta)
+"""
+import base64
+import hashlib
+import hmac
+import json
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+TERM_BYTES = 8          # truncated HMAC-SHA256; collisions are negligible at diary sizes
+MIN_PREFIX = 2          # title word prefixes indexed: 2..MAX_PREFIX characters (and whole short words)
+MAX_PREFIX = 16
+FINGERPRINT_BYTES = 16  # truncated HMAC-SHA256 per fingerprint half
+_INDEX_LABEL = b"securediary blind index v1"
+_FINGERPRINT_LABEL = b"securediary content fingerprint v1"
+_WORD_RE = re.compile(r"\w+")
+
+Sealed = namedtuple("Sealed", "meta mood_index terms")
+Fingerprint = namedtuple("Fingerprint", "content meta")
+
+
+def normalize_tag(tag):
+    """Tags compare case- and whitespace-insensitively ("Road Trip" == "roadtrip")"""
+    return "".join(tag.lower().split())
+
+
+def split_tags(tags):
+    """Normalized tags of a comma separated tag string"""
+    return [normalize_tag(tag) for tag in (tags or "").split(",") if tag.strip()]
+
+
+def title_words(text):
+    return [word[:MAX_PREFIX] for word in _WORD_RE.findall((text or "").lower())]
+
+
+def fingerprint_hex(fingerprint):
+    """Printable form of a Fingerprint, as carried in entry dicts and exports"""
+    return (fingerprint.content + fingerprint.meta).hex()
+
+
+def parse_fingerprint(text):
+    raw = bytes.fromhex(text)
+    return Fingerprint(raw[:FINGERPRINT_BYTES], raw[FINGERPRINT_BYTES:])
+
+
+class MetadataKeys:
+    """Sealing, blind-index and fingerprint keys derived from one diary key"""
+
+    def __init__(self, key):
+        from cryptography.fernet import Fernet
+        self.fernet = Fernet(key)
+        raw = base64.urlsafe_b64decode(key)
+        self.index_key = hmac.new(raw, _INDEX_LABEL, hashlib.sha256).digest()
+        self.fingerprint_key = hmac.new(raw, _FINGERPRINT_LABEL, hashlib.sha256).digest()
+        self.mood_names = {}  # mood_index -> mood, filled as moods are sealed or opened
+
+    def _term(self, kind, value):
+        return hmac.new(self.index_key, f"{kind}\0{value}".encode(), hashlib.sha256).digest()[:TERM_BYTES]
+
+    def mood_index(self, mood):
+        if not mood:
+            return None
+        token = self._term("mood", mood)
+        self.mood_names[token] = mood
+        return token
+
+    def tag_term(self, tag):
+        return self._term("tag", normalize_tag(tag))
+
+    def title_terms(self, title):
+        """Terms for every indexed prefix of every title word"""
+        terms = set()
+        for word in title_words(title):
+            for length in range(min(MIN_PREFIX, len(word)), len(word) + 1):
+                terms.add(self._term("title", word[:length]))
+        return terms
+
+    def query_terms(self, query):
+        """One term per word of a title search; an entry matches if it has all of them"""
+        return [self._term("title", word) for word in title_words(query)]
+
+    def seal(self, title, mood, tags):
+        meta = self.fernet.encrypt(json.dumps({"title": title, "mood": mood, "tags": tags}).encode())
+        terms = self.title_terms(title) | {self._term("tag", tag) for tag in split_tags(tags)}
+        return Sealed(meta, self.mood_index(mood), sorted(terms))
+
+    def fingerprint(self, title, content, mood, tags):
+        """Fingerprint of an entry's plaintext: equal fingerprints mean equal text / metadata"""
+        def mac(kind, value):
+            return hmac.new(self.fingerprint_key, kind + b"\0" + value.encode(),
+                            hashlib.sha256).digest()[:FINGERPRINT_BYTES]
+        return Fingerprint(mac(b"content", content or ""),
+                           mac(b"meta", json.dumps([title, mood or None, tags or None])))
+
+    def open(self, meta):
+        """(title, mood, tags) of a sealed row; raises if it cannot be decrypted"""
+        fields = json.loads(self.fernet.decrypt(meta))
+        if fields["mood"]:
+            self.mood_names.setdefault(self._term("mood", fields["mood"]), fields["mood"])
+        return fields["title"], fields["mood"], fields["tags"]
+
+
+@lru_cache(maxsize=2)
+def keys_for(key):
+    return MetadataKeys(key)
@@ -0,0 +1,207 @@
+# metrics.py
+"""
+Lightweight instrumentation for SecureDiary.
+
+Disabled by default. Set SECUREDIARY_METRICS=1 to record timing spans and
+counters; they are appended to a rotating JSON-lines file
+(SECUREDIARY_METRICS_FILE, default diary_data/metrics.jsonl).
+
+When disabled, @timed returns the original function untouched and incr() is
+an empty call, so instrumented code pays essentially nothing.
+
+Summary of a metrics file:
+    python metrics.py [diary_data/metrics.jsonl]
+"""
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+ENV_VAR = "SECUREDIARY_METRICS"
+FILE_ENV_VAR = "SECUREDIARY_METRICS_FILE"
+METRICS_FILE = "diary_data/metrics.jsonl"
+MAX_FILE_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+SAMPLES_PER_SPAN = 10_000  # in-memory samples kept for percentile summaries
+
+ENABLED = os.environ.get(ENV_VAR, "").strip().lower() not in ("", "0", "false", "no", "off")
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=SAMPLES_PER_SPAN))
+_counters = defaultdict(int)
+_logger = None
+
+
+def _get_logger():
+    """Create the rotating JSON-lines writer on first use"""
+    global _logger
+    if _logger is None:
+        # logging is only imported when metrics are actually written
+        import logging
+        from logging.handlers import RotatingFileHandler
+
+        path = os.environ.get(FILE_ENV_VAR, METRICS_FILE)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=MAX_FILE_BYTES,
+                                      backupCount=BACKUP_COUNT, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger("securediary.metrics")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def _write(record):
+    _get_logger().info(json.dumps(record, separators=(",", ":")))
+
+
+def record_span(name, duration_ms):
+    """Record one timing sample"""
+    if not ENABLED:
+        return
+    with _lock:
+        _samples[name].append(duration_ms)
+    _write({"ts": round(time.time(), 3), "type": "span", "name": name, "ms": round(duration_ms, 4)})
+
+
+def _incr(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def _noop(name, value=1):
+    pass
+
+
+# Counters: rows/bytes decrypted, connections, transactions...
+incr = _incr if ENABLED else _noop
+
+
+def timed(name):
+    """Decorator recording a timing span for every call of the wrapped function"""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_span(name, (time.perf_counter() - start) * 1000)
+        return wrapper
+    return decorator
+
+
+class span:
+    """Context manager version of @timed for code blocks"""
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if ENABLED:
+            record_span(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _summarize(samples_by_name, counters):
+    spans = {}
+    for name, samples in sorted(samples_by_name.items()):
+        values = sorted(samples)
+        if not values:
+            continue
+        spans[name] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50), 4),
+            "p95_ms": round(percentile(values, 95), 4),
+            "p99_ms": round(percentile(values, 99), 4),
+            "max_ms": round(values[-1], 4),
+            "total_ms": round(sum(values), 4),
+        }
+    return {"spans": spans, "counters": dict(sorted(counters.items()))}
+
+
+def snapshot_counters():
+    """Current counter values"""
+    with _lock:
+        return dict(_counters)
+
+
+def summary():
+    """p50/p95/p99 per span plus counters for this process"""
+    with _lock:
+        samples = {name: list(values) for name, values in _samples.items()}
+        counters = dict(_counters)
+    return _summarize(samples, counters)
+
+
+def flush():
+    """Write the current counter totals to the metrics file"""
+    if not ENABLED:
+        return
+    counters = snapshot_counters()
+    if counters:
+        _write({"ts": round(time.time(), 3), "type": "counters", "pid": os.getpid(), "values": counters})
+
+
+def summarize_file(path=None):
+    """Summarize a metrics file and its rotated backups"""
+    path = path or os.environ.get(FILE_ENV_VAR, METRICS_FILE)
+    files = [f"{path}.{i}" for i in range(BACKUP_COUNT, 0, -1)] + [path]
+    samples = defaultdict(list)
+    counters = defaultdict(int)
+    for file_path in files:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("type") == "span":
+                    samples[record["name"]].append(record["ms"])
+                elif record.get("type") == "counters":
+                    for name, value in record["values"].items():
+                        counters[name] += value
+    return _summarize(samples, counters)
+
+
+def format_summary(data):
+    """Human readable table for summary()/summarize_file() output"""
+    lines = [f"{'span':<36} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}"]
+    for name, s in data["spans"].items():
+        lines.append(f"{name:<36} {s['count']:>7} {s['p50_ms']:>10.3f} {s['p95_ms']:>10.3f} "
+                     f"{s['p99_ms']:>10.3f} {s['max_ms']:>10.3f}")
+    if data["counters"]:
+        lines.append("")
+        for name, value in data["counters"].items():
+            lines.append(f"{name:<36} {value:>12}")
+    return "\n".join(lines)
+
+
+if ENABLED:
+    atexit.register(flush)
+
+
+if __name__ == "__main__":
+    print(format_summary(summarize_file(sys.argv[1] if len(sys.argv) > 1 else None)))
@@ -0,0 +1,332 @@
+# related.py
+"""
+Opt-in "related entries": TF-IDF cosine similarity over decrypted text.
+
+Disabled by default, and needs NumPy (`pip install numpy`). With
+SECUREDIARY_RELATED=1 the diary window builds a RelatedIndex on a background
+thread after unlock (RelatedIndexer), keeps it current from the database
+change notifications (decrypting changed entries on that thread, not the
+writer's) and wipes it on lock. Like the search index (search_index.py) it
+only lives in memory: nothing is written to disk.
+
+Index layout:
+- every indexed entry owns a slot holding its distinct terms and their
+  log-scaled counts (title words count TITLE_WEIGHT times); editing an entry
+  moves it to a new slot and the old one is dropped
+- common terms (in at least 1/DENSE_RATIO of the entries, at most
+  DENSE_TERMS of them) go into a dense slot x term tf matrix: their postings
+  would be the longest, and one matrix-vector product scores them all
+- the other terms keep postings: the (slot, tf) pairs of every term, in flat
+  term-sorted arrays
+- entries indexed since the last rebuild (the tail) are scored one by one;
+  the first query after the tail outgrows REBUILD_TAIL rebuilds the matrix and
+  postings, so writes never wait for a rebuild
+
+A query scores every entry sharing a term with the given one by cosine
+similarity of their TF-IDF vectors. idf comes from the current document
+frequencies, the other entries' vector lengths from the last rebuild (or from
+when they were indexed).
+"""
+import os
+import queue
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # optional: the feature stays off without it
+    np = None
+
+from search_index import tokenize
+
+ENV_VAR = "SECUREDIARY_RELATED"
+REQUESTED = os.environ.get(ENV_VAR, "").strip().lower() not in ("", "0", "false", "no", "off")
+ENABLED = REQUESTED and np is not None
+
+TOP_K = 5
+MIN_SCORE = 0.05       # weaker matches are not worth showing
+MIN_TERM_LENGTH = 3
+TITLE_WEIGHT = 2
+REBUILD_TAIL = 512     # entries indexed since the last build before postings are rebuilt
+DENSE_RATIO = 32       # terms in at least 1/DENSE_RATIO of the entries are kept in the dense matrix
+DENSE_TERMS = 256      # ... up to this many (about 50 MB at 50k entries)
+BUILD_PAGE = 500
+
+STOP_WORDS = frozenset("""
+    about after again all also and any are because been before being but can could did does doing down during
+    each few for from had has have having her here hers him his how into its just more most myself not now off
+    once only other our ours out over own same she should some such than that the their theirs them then there
+    these they this those through too under until very was were what when where which while who whom why will
+    with would you your yours yourself
+""".split())
+
+
+def entry_terms(title, content):
+    """{term: count} of an entry; title words count TITLE_WEIGHT times"""
+    counts = {}
+    for weight, text in ((TITLE_WEIGHT, title), (1, content)):
+        for token in tokenize(text):
+            if len(token) >= MIN_TERM_LENGTH and token not in STOP_WORDS and not token.isdigit():
+                counts[token] = counts.get(token, 0) + weight
+    return counts
+
+
+def _grown(array, size):
+    """`array` zero-padded to at least `size` elements (capacity doubles)"""
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class RelatedIndex:
+    """TF-IDF vectors of (entry id, title, content) documents, queried for the most similar entries"""
+
+    def __init__(self):
+        if np is None:
+            raise RuntimeError("Related entries need NumPy: pip install numpy")
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.term_id = {}                           # term -> term id
+            self.df = np.zeros(1024, dtype=np.int32)    # term id -> indexed entries containing it
+            self.slot_of = {}                           # entry id -> slot
+            self.id_of = []                             # slot -> entry id (None once dropped)
+            self.vectors = []                           # slot -> (term ids, tf), None once dropped
+            self.alive = np.zeros(1024, dtype=bool)
+            self.norms = np.zeros(1024, dtype=np.float32)
+            self.tail = {}                              # slot -> {term id: tf}, indexed since the last build
+            self.indptr = np.zeros(1, dtype=np.int64)   # term id -> its range of the postings
+            self.post_slots = np.zeros(0, dtype=np.int32)
+            self.post_tf = np.zeros(0, dtype=np.float32)
+            self.dense_col = np.zeros(0, dtype=np.int32)                # term id -> dense column, or -1
+            self.dense = np.zeros((0, 0), dtype=np.float32)             # slot x dense column -> tf
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def _idf(self, term_ids):
+        return np.log((len(self.slot_of) + 1) / (self.df[term_ids] + 1.0)).astype(np.float32)
+
+    def add(self, entry_id, title, content):
+        """Index (or re-index) an entry"""
+        self.add_many([(entry_id, title, content)])
+
+    def add_many(self, documents):
+        """Index (entry id, title, content) tuples; a bulk load calls rebuild() at the end"""
+        parsed = [(entry_id, entry_terms(title, content)) for entry_id, title, content in documents]
+        with self.lock:
+            for entry_id, counts in parsed:
+                self._remove(entry_id)
+                if not counts:
+                    continue  # nothing to compare it by
+                ids = np.fromiter((self.term_id.setdefault(term, len(self.term_id)) for term in counts),
+                                  dtype=np.int32, count=len(counts))
+                tf = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+                slot = len(self.id_of)
+                self.id_of.append(entry_id)
+                self.vectors.append((ids, tf))
+                self.slot_of[entry_id] = slot
+                self.df = _grown(self.df, len(self.term_id))
+                self.df[ids] += 1
+                self.alive = _grown(self.alive, slot + 1)
+                self.norms = _grown(self.norms, slot + 1)
+                self.alive[slot] = True
+                self.norms[slot] = np.linalg.norm(tf * self._idf(ids))
+                self.tail[slot] = dict(zip(ids.tolist(), tf.tolist()))
+
+    def remove(self, entry_id):
+        with self.lock:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id):
+        # The postings keep the slot; it is masked out through `alive` until the next rebuild
+        slot = self.slot_of.pop(entry_id, None)
+        if slot is None:
+            return
+        ids, _ = self.vectors[slot]
+        self.df[ids] -= 1
+        self.id_of[slot] = None
+        self.vectors[slot] = None
+        self.alive[slot] = False
+        self.tail.pop(slot, None)
+
+    def rebuild(self):
+        """Rebuild the postings of every indexed entry and refresh their vector lengths"""
+        with self.lock:
+            slots = np.flatnonzero(self.alive[:len(self.vectors)]).astype(np.int32)
+            if not len(slots):
+                self.clear()
+                return
+            vectors = [self.vectors[slot] for slot in slots.tolist()]
+            terms = np.concatenate([ids for ids, _ in vectors])
+            tf = np.concatenate([tf for _, tf in vectors])
+            owners = np.repeat(slots, [len(ids) for ids, _ in vectors])
+            vocabulary = len(self.term_id)
+
+            df = self.df[:vocabulary]
+            common = np.flatnonzero(df * DENSE_RATIO >= len(slots))
+            common = common[np.argsort(-df[common], kind="stable")[:DENSE_TERMS]]
+            self.dense_col = np.full(vocabulary, -1, dtype=np.int32)
+            self.dense_col[common] = np.arange(len(common), dtype=np.int32)
+            columns = self.dense_col[terms]
+            in_dense = columns >= 0
+            self.dense = np.zeros((len(self.vectors), len(common)), dtype=np.float32)
+            self.dense[owners[in_dense], columns[in_dense]] = tf[in_dense]
+
+            sparse = ~in_dense
+            order = np.argsort(terms[sparse], kind="stable")
+            self.post_slots = owners[sparse][order]
+            self.post_tf = tf[sparse][order]
+            self.indptr = np.zeros(vocabulary + 1, dtype=np.int64)
+            np.cumsum(np.bincount(terms[sparse], minlength=vocabulary), out=self.indptr[1:])
+            weights = tf * self._idf(terms)
+            self.norms[:] = 0
+            self.norms[:len(self.vectors)] = np.sqrt(np.bincount(owners, weights * weights,
+                                                                 minlength=len(self.vectors)))
+            self.tail.clear()
+
+    def related(self, entry_id, k=TOP_K):
+        """[(entry id, similarity)] of the `k` entries most similar to `entry_id`, best first"""
+        with self.lock:
+            if len(self.tail) > REBUILD_TAIL:
+                self.rebuild()
+            slot = self.slot_of.get(entry_id)
+            if slot is None:
+                return []
+            ids, tf = self.vectors[slot]
+            idf = self._idf(ids)
+            weights = tf * idf
+            length = float(np.linalg.norm(weights))
+            if length == 0:
+                return []  # only words every entry has
+            # An entry's tf times this (the query's tf-idf times idf) is its share of the dot product
+            factors = weights * idf
+            scores = np.zeros(len(self.vectors), dtype=np.float32)
+
+            built = ids < len(self.dense_col)
+            columns = np.full(len(ids), -1, dtype=np.int32)
+            columns[built] = self.dense_col[ids[built]]
+            in_dense = columns >= 0
+            if in_dense.any():
+                query = np.zeros(self.dense.shape[1], dtype=np.float32)
+                query[columns[in_dense]] = factors[in_dense]
+                scores[:len(self.dense)] += self.dense @ query
+            sparse = built & ~in_dense
+            ranges = list(zip(self.indptr[ids[sparse]].tolist(), self.indptr[ids[sparse] + 1].tolist(),
+                              factors[sparse].tolist()))
+            if ranges:
+                owners = np.concatenate([self.post_slots[start:end] for start, end, _ in ranges])
+                shares = np.concatenate([self.post_tf[start:end] * factor for start, end, factor in ranges])
+                scores += np.bincount(owners, shares, minlength=len(scores))
+            if self.tail:
+                query = dict(zip(ids.tolist(), factors.tolist()))
+                for tail_slot, vector in self.tail.items():
+                    scores[tail_slot] = sum(factor * vector[term] for term, factor in query.items()
+                                            if term in vector)
+
+            scores[~self.alive[:len(scores)]] = 0
+            scores[slot] = 0
+            norms = self.norms[:len(scores)]
+            np.divide(scores, norms * length, out=scores, where=norms > 0)
+            k = min(k, int(np.count_nonzero(scores >= MIN_SCORE)))
+            if k == 0:
+                return []
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best], kind="stable")]
+            return [(self.id_of[i], round(min(float(scores[i]), 1.0), 3)) for i in best.tolist()]
+
+
+class RelatedIndexer:
+    """
+    Owns the related-entries index of an unlocked diary: builds it in the
+    background and follows database writes until wipe(). Writes only queue
+    the change; the indexer's own thread reads and decrypts the entry, so the
+    writer thread never waits for it.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.index = RelatedIndex()
+        self.ready = threading.Event()
+        self.cancelled = False
+        self._lock = threading.Lock()  # cancelled is checked under it before anything is indexed
+        self._changes = queue.Queue()  # (change, entry id), applied in order once the build is done
+        self._thread = None
+
+    def start(self):
+        import database
+        database.add_change_listener(self.on_change)
+        self._thread = threading.Thread(target=self._run, name="related-index", daemon=True)
+        self._thread.start()
+        return self
+
+    def related(self, entry_id, k=TOP_K):
+        """[(entry id, similarity)], or None while the index is still being built"""
+        if not self.ready.is_set():
+            return None
+        return self.index.related(entry_id, k)
+
+    def on_change(self, change, entry_id):
+        self._changes.put((change, entry_id))
+
+    def _run(self):
+        self._build()
+        while not self.cancelled:
+            change, entry_id = self._changes.get()
+            if change is None:
+                break  # wipe()
+            self._apply(change, entry_id)
+
+    def _build(self):
+        import database
+        import metrics
+
+        with metrics.span("related.build"):
+            after = None
+            while not self.cancelled:
+                entries = database.fetch_entries(self.key, limit=BUILD_PAGE, after=after)
+                if not entries:
+                    break
+                documents = [(e["id"], e["title"], e["content"]) for e in entries if e["decryptable"]]
+                with self._lock:
+                    if self.cancelled:
+                        return
+                    # Writes made meanwhile are queued and applied after the build, so they win
+                    self.index.add_many(documents)
+                last = entries[-1]
+                after = (last["created_at"], last["id"])
+            if not self.cancelled:
+                self.index.rebuild()
+        if not self.cancelled:
+            self.ready.set()
+
+    def _apply(self, change, entry_id):
+        import database
+        entry = None
+        if change == database.ENTRY_FAVORITED:
+            return  # text unchanged
+        if change != database.ENTRY_DELETED:
+            entry = database.get_entry_by_id(entry_id, self.key)
+        with self._lock:
+            if self.cancelled:
+                return
+            if entry is None or not entry["decryptable"]:
+                self.index.remove(entry_id)
+            else:
+                self.index.add(entry_id, entry["title"], entry["content"])
+
+    def wipe(self):
+        """Stop building, stop following writes and drop every vector (diary locked)"""
+        import database
+        with self._lock:
+            self.cancelled = True
+        database.remove_change_listener(self.on_change)
+        self._changes.put((None, None))
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.ready.clear()
+        self.index.clear()
+        self.key = None
@@ -0,0 +1,251 @@
+# scrub.py
+"""
+Resumable integrity scrubber for the encrypted entries.
+
+Every entry blob is checked on a worker pool for:
+- envelope: a Fernet token (url-safe base64, version byte 0x80, whole AES blocks)
+- mac: the HMAC-SHA256 of the token under the diary key's signing half
+- decrypt: the token decrypts and the plaintext is valid UTF-8
+Encrypted titles / moods / tags (metadata_crypto.py) get the same checks, and
+so do the entries in the trash and the archive packs holding old entries' text (archive.py), whose
+plaintext must also decompress. Once every blob has been checked, PRAGMA
+integrity_check runs on diary.db and each year shard (shards.py).
+
+Progress is checkpointed to diary_data/scrub.json after every batch, so a
+pass can run in short slices (the GUI runs one while the user is idle, the
+CLI bounds a run with --max-seconds) and resumes where the last slice
+stopped. Entries changed behind the scrubber's position are checked on the
+next pass.
+
+    scrubber = Scrubber(key)
+    state = scrubber.run(max_seconds=2)     # one slice
+    state["done"], state["bad"]             # bad: [{id, created_at, shard, problem}]
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import archive
+import database
+import maintenance
+import metrics
+import shards
+
+STATE_FILE = "diary_data/scrub.json"
+BATCH_SIZE = 256
+FERNET_VERSION = 0x80
+FERNET_OVERHEAD = 1 + 8 + 16 + 32   # version, timestamp, IV, HMAC
+MAIN_SOURCE = "diary.db"
+TRASH_SOURCE = "trash"
+PACKS_SOURCE = "packs"
+
+
+def check_blob(blob, signing_key, fernet, compressed=False):
+    """Problem found in one encrypted blob ('envelope', 'mac' or 'decrypt'), or None"""
+    try:
+        token = base64.urlsafe_b64decode(blob)
+    except (ValueError, TypeError):
+        return "envelope"
+    if (len(token) < FERNET_OVERHEAD + 16 or token[0] != FERNET_VERSION
+            or (len(token) - FERNET_OVERHEAD) % 16):
+        return "envelope"
+    expected = hmac.new(signing_key, token[:-32], hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, token[-32:]):
+        return "mac"
+    try:
+        plaintext = fernet.decrypt(blob)
+        (zlib.decompress(plaintext) if compressed else plaintext).decode("utf-8")
+    except Exception:
+        return "decrypt"
+    return None
+
+
+def _sources():
+    """diary.db, then each year shard, newest first, then the trash and the archive packs"""
+    return [MAIN_SOURCE] + [str(year) for year in shards.years()] + [TRASH_SOURCE, PACKS_SOURCE]
+
+
+def _source_rank(source):
+    """Where `source` comes in the order of _sources(), even for a year shard that is gone"""
+    if source == MAIN_SOURCE:
+        return (0, 0)
+    if source == TRASH_SOURCE:
+        return (2, 0)
+    if source == PACKS_SOURCE:
+        return (3, 0)
+    return (1, -int(source))
+
+
+def _new_state():
+    return {
+        "pass_started_at": datetime.now().isoformat(timespec="seconds"),
+        "completed_at": None,
+        "done": False,
+        "source": MAIN_SOURCE,  # where the scrub is: a source name, or "integrity" at the end
+        "last_id": 0,
+        "checked": 0,
+        "total": database.count_entries() + maintenance.status()["trash_entries"] + archive.status()["packs"],
+        "bad": [],
+        "integrity": {},
+    }
+
+
+class Scrubber:
+    """Checks entry blobs in resumable slices; see the module docstring"""
+
+    def __init__(self, key, workers=None, state_file=STATE_FILE):
+        from cryptography.fernet import Fernet
+        self.fernet = Fernet(key)
+        self.signing_key = base64.urlsafe_b64decode(key)[:16]
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.state_file = state_file
+        self.state = self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self):
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_file)
+
+    def pass_due(self, every_days):
+        """True unless a pass completed less than `every_days` ago"""
+        if self.state is None or not self.state.get("done"):
+            return True
+        completed = datetime.fromisoformat(self.state["completed_at"])
+        return (datetime.now() - completed).total_seconds() >= every_days * 86400
+
+    def restart(self):
+        """Forget the checkpoint; the next run starts a fresh pass"""
+        self.state = None
+
+    @metrics.timed("scrub.run")
+    def run(self, max_seconds=None, max_rows=None, pause=0.0, should_stop=None):
+        """
+        Scrub until the pass is complete, `max_seconds` / `max_rows` are used up or
+        should_stop() returns True. `pause` sleeps between batches to leave the disk
+        and CPU to the user. A finished pass is kept until the next run starts a new one.
+        Returns the state (also written to the checkpoint file).
+        """
+        if self.state is None or self.state.get("done"):
+            self.state = _new_state()
+        deadline = None if max_seconds is None else time.monotonic() + max_seconds
+        rows_left = max_rows
+
+        def out_of_budget():
+            return ((deadline is not None and time.monotonic() >= deadline)
+                    or (rows_left is not None and rows_left <= 0)
+                    or (should_stop is not None and should_stop()))
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scrub") as pool:
+            while not self.state["done"] and not out_of_budget():
+                if self.state["source"] == "integrity":
+                    self._check_integrity()
+                    continue
+                limit = BATCH_SIZE if rows_left is None else min(BATCH_SIZE, rows_left)
+                checked = self._scrub_batch(pool, limit)
+                if rows_left is not None:
+                    rows_left -= checked
+                self._save()
+                if pause and checked:
+                    time.sleep(pause)
+        self._save()
+        return self.state
+
+    def _scrub_batch(self, pool, limit):
+        """Check the next `limit` rows of the current source; returns how many were checked"""
+        state = self.state
+        source = state["source"]
+        conn = database._connect()
+        if source == MAIN_SOURCE:
+            rows = self._select(conn, "entries", state["last_id"], limit)
+        elif source == TRASH_SOURCE:
+            rows = self._select(conn, "main.trash", state["last_id"], limit)
+        elif source == PACKS_SOURCE:
+            rows = conn.execute("SELECT id, month, payload FROM entry_packs WHERE id > ? ORDER BY id LIMIT ?",
+                                (state["last_id"], limit)).fetchall()
+        elif os.path.exists(shards.shard_path(int(source))):
+            with shards.attached(conn, int(source)) as schema:
+                rows = self._select(conn, f"{schema}.entries", state["last_id"], limit)
+        else:
+            rows = []  # the shard disappeared since the pass started
+        conn.close()
+
+        if not rows:
+            self._next_source()
+            return 0
+
+        check = self._check_pack if source == PACKS_SOURCE else self._check_row
+        problems = pool.map(check, rows, chunksize=max(1, len(rows) // (self.workers * 4)))
+        for (entry_id, created_at, *_), problem in zip(rows, problems):
+            if problem is not None:
+                state["bad"].append({"id": entry_id, "created_at": created_at, "shard": source,
+                                     "problem": problem})
+        state["last_id"] = rows[-1][0]
+        state["checked"] += len(rows)
+        metrics.incr("scrub.rows_checked", len(rows))
+        return len(rows)
+
+    def _check_row(self, row):
+        # Archived rows keep their text in a pack, checked with the packs
+        problem = check_blob(row[2], self.signing_key, self.fernet) if row[4] is None else None
+        if problem is None and row[3] is not None:
+            problem = check_blob(row[3], self.signing_key, self.fernet)
+            return problem and f"metadata {problem}"
+        return problem
+
+    def _check_pack(self, row):
+        problem = check_blob(row[2], self.signing_key, self.fernet, compressed=True)
+        return problem and f"pack {problem}"
+
+    @staticmethod
+    def _select(conn, table, after_id, limit):
+        return conn.execute(f"SELECT id, created_at, content, meta, pack_id FROM {table} WHERE id > ? "
+                            "ORDER BY id LIMIT ?", (after_id, limit)).fetchall()
+
+    def _next_source(self):
+        # By rank, not list position: the current shard may have been compacted away meanwhile
+        rank = _source_rank(self.state["source"])
+        later = [source for source in _sources() if _source_rank(source) > rank]
+        self.state["source"] = later[0] if later else "integrity"
+        self.state["last_id"] = 0
+
+    def _check_integrity(self):
+        conn = database._connect()
+        problems = [row[0] for row in conn.execute("PRAGMA main.integrity_check").fetchall()]
+        conn.close()
+        results = {MAIN_SOURCE: [] if problems == ["ok"] else problems}
+        for year in shards.years():
+            results[str(year)] = shards.check(year)
+        self.state["integrity"] = {name: found for name, found in results.items() if found}
+        self.state["done"] = True
+        self.state["completed_at"] = datetime.now().isoformat(timespec="seconds")
+        self._save()
+
+
+def summary(state):
+    """Short JSON-friendly view of a scrub state"""
+    if state is None:
+        return {"started": False}
+    return {
+        "done": state["done"],
+        "pass_started_at": state["pass_started_at"],
+        "completed_at": state["completed_at"],
+        "checked": state["checked"],
+        "total": state["total"],
+        "bad": state["bad"],
+        "integrity_problems": state["integrity"],
+        "healthy": not state["bad"] and not state["integrity"],
+    }
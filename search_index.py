@@ -0,0 +1,425 @@
+# search_index.py
+"""
+Opt-in in-memory fuzzy search over decrypted titles and content.
+
+Disabled by default. Set SECUREDIARY_SEARCH_INDEX=1 and the diary window
+builds a TrigramIndex on a background thread after unlock (DiaryIndexer),
+keeps it current from the database change notifications and wipes it on
+lock. Nothing is ever written to disk. Writes only queue their change; the
+indexer's thread decrypts and indexes the entry, and a search first waits
+(briefly) for the writes made before it.
+
+Index layout:
+- every indexed entry owns a slot; higher slots are newer and rank first
+  among equally good matches. An edited entry keeps its slot (the slot's
+  terms are remembered so its old postings can be dropped); deleted slots
+  are compacted away once there are COMPACT_MIN_DEAD of them and they are
+  1/COMPACT_RATIO of all slots
+- per term, the slots whose title / content contain it: a set while the term
+  is rare, an int bitmap once it is common, so a query is a handful of
+  big-int ANDs and ORs however many entries match
+- a trigram map over the vocabulary finds terms within typo distance of
+  each query word
+
+Ranking: each query word scores 3 for a title match, 2 for a content match
+and 1 for a fuzzy (typo) match; every word has to match somehow.
+"""
+import heapq
+import os
+import queue
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+
+ENV_VAR = "SECUREDIARY_SEARCH_INDEX"
+ENABLED = os.environ.get(ENV_VAR, "").strip().lower() not in ("", "0", "false", "no", "off")
+
+MAX_RESULTS = 500
+MAX_QUERY_WORDS = 6
+MIN_PREFIX_LENGTH = 2      # the last query word also matches as a prefix (search as you type)
+MIN_FUZZY_LENGTH = 4       # shorter words are too ambiguous for typo matching
+FUZZY_THRESHOLD = 0.5      # Dice similarity between trigram sets
+MAX_EXPANSIONS = 24        # vocabulary terms per query word
+DENSE_MIN_SLOTS = 64       # a term's slot set becomes a bitmap once it is this common...
+DENSE_RATIO = 64           # ...and covers at least 1/DENSE_RATIO of all slots
+COMPACT_MIN_DEAD = 256     # deleted slots before the index is renumbered...
+COMPACT_RATIO = 8          # ...if they are also at least 1/COMPACT_RATIO of all slots
+BUILD_PAGE = 500
+CATCH_UP_TIMEOUT = 1.0     # seconds a search waits for earlier writes to be indexed
+
+TITLE_MATCH, CONTENT_MATCH, FUZZY_MATCH = 3, 2, 1
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return [token.lower() for token in TOKEN_RE.findall(text or "")]
+
+
+def _trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _bitmap(slots):
+    """int with the given bit positions set"""
+    if not slots:
+        return 0
+    buf = bytearray(max(slots) // 8 + 1)
+    for slot in slots:
+        buf[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(buf, "little")
+
+
+def highlight_spans(text, terms):
+    """(start, end) spans of the words in `text` that are among the matched terms"""
+    if not text or not terms:
+        return []
+    return [m.span() for m in TOKEN_RE.finditer(text) if m.group().lower() in terms]
+
+
+def snippet(text, terms, length=200):
+    """About `length` characters of `text`, starting a little before the first matched word"""
+    if not text:
+        return text
+    start = 0
+    for m in TOKEN_RE.finditer(text):
+        if m.group().lower() in terms:
+            start = max(0, m.start() - length // 4)
+            break
+    if start == 0:
+        return text if len(text) <= length else text[:length] + "..."
+    # Begin on a word boundary
+    space = text.find(" ", start)
+    if 0 <= space < start + 20:
+        start = space + 1
+    end = start + length
+    return "..." + text[start:end] + ("..." if end < len(text) else "")
+
+
+class TrigramIndex:
+    """Fuzzy, ranked word search over (entry id, title, content) documents"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.slot_of = {}            # entry id -> slot
+            self.id_of = []              # slot -> entry id (None if unused)
+            self.terms_of = []           # slot -> (title terms, content terms), None if unused
+            self.dead = 0                # slots freed by deletes since the last compaction
+            self.live = 0                # bitmap of slots holding a current entry
+            self.title_postings = {}     # term -> set of slots | bitmap
+            self.content_postings = {}
+            self.vocabulary = []         # sorted, for prefix matches
+            self.known = set()
+            self.term_grams = {}         # trigram -> set of terms
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def reserve(self, count):
+        """Pre-allocate `count` slots so a newest-first build can fill them from the top"""
+        with self.lock:
+            if count > len(self.id_of):
+                self.id_of.extend([None] * (count - len(self.id_of)))
+                self.terms_of.extend([None] * (count - len(self.terms_of)))
+
+    def add(self, entry_id, title, content, slot=None):
+        """Index (or re-index, in place) an entry; a new one without `slot` becomes the newest"""
+        self.add_many([(entry_id, title, content, slot)])
+
+    def add_many(self, documents):
+        """
+        Index (entry_id, title, content, slot) tuples. Postings are merged once per
+        batch, so bulk loading does not rewrite every common term's bitmap per entry.
+        """
+        tokenized = [(entry_id, set(tokenize(title)), set(tokenize(content)), slot)
+                     for entry_id, title, content, slot in documents]
+        title_slots, content_slots, live_slots = {}, {}, []
+        with self.lock:
+            for entry_id, title_terms, content_terms, slot in tokenized:
+                if entry_id in self.slot_of:
+                    slot = self.slot_of[entry_id]  # edited: same rank, new terms
+                    self._unpost(slot)
+                elif slot is None or slot >= len(self.id_of) or self.id_of[slot] is not None:
+                    slot = len(self.id_of)
+                    self.id_of.append(None)
+                    self.terms_of.append(None)
+                self.id_of[slot] = entry_id
+                self.terms_of[slot] = (tuple(title_terms), tuple(content_terms))
+                self.slot_of[entry_id] = slot
+                live_slots.append(slot)
+                for term in title_terms:
+                    title_slots.setdefault(term, []).append(slot)
+                for term in content_terms:
+                    content_slots.setdefault(term, []).append(slot)
+            self.live |= _bitmap(live_slots)
+            for term, slots in title_slots.items():
+                self._post(self.title_postings, term, slots)
+            for term, slots in content_slots.items():
+                self._post(self.content_postings, term, slots)
+
+    def remove(self, entry_id):
+        with self.lock:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id):
+        slot = self.slot_of.pop(entry_id, None)
+        if slot is not None:
+            self._unpost(slot)
+            self.id_of[slot] = None
+            self.terms_of[slot] = None
+            self.live &= ~(1 << slot)
+            self.dead += 1
+
+    def _unpost(self, slot):
+        """Drop `slot` from the postings of the terms it was indexed with"""
+        title_terms, content_terms = self.terms_of[slot]
+        bit = 1 << slot
+        for postings, terms in ((self.title_postings, title_terms), (self.content_postings, content_terms)):
+            for term in terms:
+                slots = postings.get(term)
+                if isinstance(slots, int):
+                    postings[term] = slots & ~bit
+                elif slots is not None:
+                    slots.discard(slot)
+
+    def compact(self, force=False):
+        """
+        Renumber the slots without the deleted ones (keeping their order) once
+        enough have piled up. Only for a fully built index: reserved slots that
+        are still empty would be dropped too.
+        """
+        with self.lock:
+            if not force and (self.dead < COMPACT_MIN_DEAD or self.dead * COMPACT_RATIO < len(self.id_of)):
+                return
+            kept = [slot for slot, entry_id in enumerate(self.id_of) if entry_id is not None]
+            self.id_of = [self.id_of[slot] for slot in kept]
+            self.terms_of = [self.terms_of[slot] for slot in kept]
+            self.slot_of = {entry_id: slot for slot, entry_id in enumerate(self.id_of)}
+            self.live = (1 << len(kept)) - 1
+            self.dead = 0
+            title_slots, content_slots = {}, {}
+            for slot, (title_terms, content_terms) in enumerate(self.terms_of):
+                for term in title_terms:
+                    title_slots.setdefault(term, []).append(slot)
+                for term in content_terms:
+                    content_slots.setdefault(term, []).append(slot)
+            self.title_postings, self.content_postings = {}, {}
+            for term, slots in title_slots.items():
+                self._post(self.title_postings, term, slots)
+            for term, slots in content_slots.items():
+                self._post(self.content_postings, term, slots)
+
+    def _post(self, postings, term, new_slots):
+        if term not in self.known:
+            self.known.add(term)
+            insort(self.vocabulary, term)
+            for gram in _trigrams(term):
+                self.term_grams.setdefault(gram, set()).add(term)
+        slots = postings.get(term)
+        if isinstance(slots, int):
+            postings[term] = slots | _bitmap(new_slots)
+            return
+        if slots is None:
+            slots = postings[term] = set()
+        slots.update(new_slots)
+        if len(slots) >= DENSE_MIN_SLOTS and len(slots) * DENSE_RATIO >= len(self.id_of):
+            postings[term] = _bitmap(slots)
+
+    def _union(self, postings, terms):
+        bitmap, sparse = 0, set()
+        for term in terms:
+            slots = postings.get(term)
+            if slots is None:
+                continue
+            if isinstance(slots, set):
+                sparse |= slots
+            else:
+                bitmap |= slots
+        return bitmap | _bitmap(sparse) if sparse else bitmap
+
+    def _expand(self, word, prefix):
+        """Vocabulary terms matching `word` exactly (or by prefix) and by similarity"""
+        exact = {word} if word in self.known else set()
+        if prefix and len(word) >= MIN_PREFIX_LENGTH:
+            i = bisect_left(self.vocabulary, word)
+            while (i < len(self.vocabulary) and len(exact) < MAX_EXPANSIONS
+                   and self.vocabulary[i].startswith(word)):
+                exact.add(self.vocabulary[i])
+                i += 1
+
+        fuzzy = set()
+        if len(word) >= MIN_FUZZY_LENGTH:
+            grams = _trigrams(word)
+            common = Counter()
+            for gram in grams:
+                common.update(self.term_grams.get(gram, ()))
+            candidates = []
+            for term, shared in common.items():
+                if term in exact:
+                    continue
+                similarity = 2 * shared / (len(grams) + len(term) + 1)
+                if similarity >= FUZZY_THRESHOLD:
+                    candidates.append((similarity, term))
+            fuzzy = {term for _, term in heapq.nlargest(MAX_EXPANSIONS, candidates)}
+        return exact, fuzzy
+
+    def search(self, query, limit=MAX_RESULTS):
+        """
+        Ranked entry ids matching every word of `query` (best first, newest first
+        among equals) and the set of vocabulary terms that matched, for highlighting.
+        """
+        words = tokenize(query)[:MAX_QUERY_WORDS]
+        matched = set()
+        if not words:
+            return [], matched
+        with self.lock:
+            scores = {0: self.live}  # score -> bitmap of slots with that score so far
+            for i, word in enumerate(words):
+                exact, fuzzy = self._expand(word, prefix=i == len(words) - 1)
+                matched |= exact | fuzzy
+                title = self._union(self.title_postings, exact)
+                content = self._union(self.content_postings, exact) & ~title
+                typo = (self._union(self.title_postings, fuzzy) |
+                        self._union(self.content_postings, fuzzy)) & ~(title | content)
+
+                next_scores = {}
+                for score, slots in scores.items():
+                    for weight, hits in ((TITLE_MATCH, title), (CONTENT_MATCH, content), (FUZZY_MATCH, typo)):
+                        both = slots & hits
+                        if both:
+                            next_scores[score + weight] = next_scores.get(score + weight, 0) | both
+                scores = next_scores
+                if not scores:
+                    return [], matched
+
+            ids = []
+            for score in sorted(scores, reverse=True):
+                bitmap = scores[score]
+                while bitmap and len(ids) < limit:
+                    slot = bitmap.bit_length() - 1
+                    bitmap ^= 1 << slot
+                    ids.append(self.id_of[slot])
+                if len(ids) >= limit:
+                    break
+            return ids, matched
+
+
+class DiaryIndexer:
+    """
+    Owns the index for an unlocked diary: builds it in the background and
+    follows database writes until wipe().
+    """
+
+    def __init__(self, key, on_ready=None):
+        self.key = key
+        self.index = TrigramIndex()
+        self.on_ready = on_ready
+        self.ready = threading.Event()
+        self.cancelled = False
+        self._lock = threading.Lock()  # cancelled is checked under it before anything is indexed
+        self._changes = queue.Queue()  # (change, entry id), applied in order once the build is done
+        self._applied = threading.Condition()
+        self._queued_count = self._applied_count = 0
+        self._thread = None
+
+    def start(self):
+        import database
+        database.add_change_listener(self.on_change)
+        self._thread = threading.Thread(target=self._run, name="search-index", daemon=True)
+        self._thread.start()
+        return self
+
+    def search(self, query, limit=MAX_RESULTS):
+        """(ids, matched terms), or None while the index is still being built"""
+        if not self.ready.is_set():
+            return None
+        with self._applied:
+            queued = self._queued_count
+            self._applied.wait_for(lambda: self._applied_count >= queued or self.cancelled, CATCH_UP_TIMEOUT)
+        return self.index.search(query, limit)
+
+    def on_change(self, change, entry_id):
+        with self._applied:
+            self._queued_count += 1
+        self._changes.put((change, entry_id))
+
+    def _run(self):
+        self._build()
+        while not self.cancelled:
+            change, entry_id = self._changes.get()
+            if change is None:
+                break  # wipe()
+            try:
+                self._apply(change, entry_id)
+            finally:
+                with self._applied:
+                    self._applied_count += 1
+                    self._applied.notify_all()
+
+    def _build(self):
+        import database
+        import metrics
+
+        with metrics.span("search_index.build"):
+            total = database.count_entries()
+            self.index.reserve(total)
+            position, after = 0, None
+            while not self.cancelled:
+                entries = database.fetch_entries(self.key, limit=BUILD_PAGE, after=after)
+                if not entries:
+                    break
+                documents = []
+                for entry in entries:
+                    # Newest first: fill the reserved slots from the top down
+                    slot = total - 1 - position if position < total else None
+                    position += 1
+                    if entry["decryptable"]:
+                        documents.append((entry["id"], entry["title"], entry["content"], slot))
+                with self._lock:
+                    if self.cancelled:
+                        return
+                    # Writes made meanwhile are queued and applied after the build, so they win
+                    self.index.add_many(documents)
+                last = entries[-1]
+                after = (last["created_at"], last["id"])
+        if not self.cancelled:
+            self.ready.set()
+            if self.on_ready is not None:
+                self.on_ready()
+
+    def _apply(self, change, entry_id):
+        import database
+        entry = None
+        if change == database.ENTRY_FAVORITED:
+            return  # text unchanged
+        if change != database.ENTRY_DELETED:
+            entry = database.get_entry_by_id(entry_id, self.key)
+        with self._lock:
+            if self.cancelled:
+                return
+            if entry is None or not entry["decryptable"]:
+                self.index.remove(entry_id)
+                self.index.compact()
+            else:
+                self.index.add(entry_id, entry["title"], entry["content"])
+
+    def wipe(self):
+        """Stop building, stop following writes and drop everything indexed (diary locked)"""
+        import database
+        with self._lock:
+            self.cancelled = True
+        database.remove_change_listener(self.on_change)
+        self._changes.put((None, None))
+        with self._applied:
+            self._applied.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.ready.clear()
+        self.index.clear()
+        self.key = None
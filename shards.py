@@ -0,0 +1,230 @@
+# shards.py
+"""
+Optional year-sharded storage for very large diaries.
+
+By default every entry lives in diary.db. `securediary shards rotate` (or
+rotate() below) moves the entries of past years into one SQLite file per year,
+diary_data/shards/entries-<year>.db. After that:
+
+- diary.db keeps the current year (the hot shard, where new entries go), the
+  id sequence, and entry_shards, which maps each moved entry id to its year
+- database.py ATTACHes a year shard only while a query needs it: newest-first
+  pages stop at the first year older than the page, id lookups go straight
+  to the entry's year, counts and stats visit each year in turn
+- past years are read-mostly, so each file can be compacted, checked and
+  backed up on its own
+
+A diary without shard files behaves exactly as before. Rotating again (e.g.
+in January, or after importing old entries) moves whatever past-year entries
+have collected in diary.db since.
+"""
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date
+
+SHARD_DIR = "diary_data/shards"
+SHARD_FILE = "entries-{year}.db"
+MAX_ATTACHED = 8   # SQLite allows 10 attached databases; keep a margin
+
+_FILE_RE = re.compile(r"^entries-(\d{4})\.db$")
+_years_cache = None  # ((device, inode, mtime) of SHARD_DIR, years) from the last listing
+_held = {}  # id(connection) -> {schema: open attached() blocks}; attach() never detaches these
+_held_lock = threading.Lock()
+
+
+def shard_path(year):
+    return os.path.join(SHARD_DIR, SHARD_FILE.format(year=year))
+
+
+def years():
+    """
+    Years that have a shard file, newest first. The listing is cached until the
+    directory changes (a stat per call instead of a listdir, so id lookups stay
+    cheap) or this process rotates or compacts.
+    """
+    global _years_cache
+    try:
+        info = os.stat(SHARD_DIR)
+    except FileNotFoundError:
+        return []
+    stamp = (info.st_dev, info.st_ino, info.st_mtime_ns)
+    cached = _years_cache
+    if cached is not None and cached[0] == stamp:
+        return list(cached[1])
+    found = (_FILE_RE.match(name) for name in os.listdir(SHARD_DIR))
+    listed = sorted((int(m.group(1)) for m in found if m), reverse=True)
+    _years_cache = (stamp, listed)
+    return list(listed)
+
+
+def forget_years():
+    """Drop the cached year list (after creating or removing shard files)"""
+    global _years_cache
+    _years_cache = None
+
+
+def year_of_timestamp(created_at):
+    return int(str(created_at)[:4])
+
+
+def _schema(year):
+    return f"y{year}"
+
+
+def attach(conn, year):
+    """Attach a year shard to `conn` (if it is not already) and return its schema name"""
+    name = _schema(year)
+    attached = [row[1] for row in conn.execute("PRAGMA database_list")]
+    if name in attached:
+        return name
+    shard_schemas = [n for n in attached if n not in ("main", "temp")]
+    if len(shard_schemas) >= MAX_ATTACHED and not conn.in_transaction:
+        # Long-lived connections (async_db.py) would otherwise run into SQLite's limit.
+        # Shards an enclosing attached() block (or a row iteration) still reads stay.
+        with _held_lock:
+            held = set(_held.get(id(conn), ()))
+        for old in shard_schemas:
+            if old not in held:
+                conn.execute(f"DETACH DATABASE {old}")
+    conn.execute(f"ATTACH DATABASE ? AS {name}", (shard_path(year),))
+    return name
+
+
+@contextmanager
+def attached(conn, year):
+    """
+    Year shard attached for the duration of the block.
+    Detached afterwards unless it was attached before or a write is still uncommitted
+    (SQLite cannot detach inside a transaction; closing the connection does it).
+    """
+    name = _schema(year)
+    was_attached = name in {row[1] for row in conn.execute("PRAGMA database_list")}
+    attach(conn, year)
+    with _held_lock:
+        holds = _held.setdefault(id(conn), {})
+        holds[name] = holds.get(name, 0) + 1
+    try:
+        yield name
+    finally:
+        with _held_lock:
+            holds[name] -= 1
+            if not holds[name]:
+                del holds[name]
+            if not holds:
+                _held.pop(id(conn), None)
+        if not was_attached and not conn.in_transaction:
+            conn.execute(f"DETACH DATABASE {name}")
+
+
+def year_of(conn, entry_id):
+    """Year shard holding `entry_id`, or None if it is in diary.db"""
+    if not years():
+        return None
+    row = conn.execute("SELECT year FROM entry_shards WHERE id=?", (entry_id,)).fetchone()
+    return row[0] if row else None
+
+
+def group_ids(conn, entry_ids):
+    """{year or None (diary.db): [ids]} for a list of entry ids"""
+    if not years():
+        return {None: list(entry_ids)}
+    import database
+    located = {}
+    for i in range(0, len(entry_ids), database.ID_CHUNK):
+        chunk = entry_ids[i:i + database.ID_CHUNK]
+        located.update(conn.execute(
+            f"SELECT id, year FROM entry_shards WHERE id IN ({','.join('?' * len(chunk))})", chunk
+        ).fetchall())
+    groups = {}
+    for entry_id in entry_ids:
+        groups.setdefault(located.get(entry_id), []).append(entry_id)
+    return groups
+
+
+# ---------------------------------------------------------------- maintenance
+
+def _create_shard_table(cur, schema):
+    import database
+    cur.execute(f"PRAGMA {schema}.auto_vacuum = INCREMENTAL")  # no-op once the shard has tables
+    cur.execute(database.ENTRIES_TABLE_SQL.format(table=f"{schema}.entries", id_column="id INTEGER PRIMARY KEY"))
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_entries_created ON entries(created_at, id)")
+    database._migrate(cur, schema)  # the table is current; this adds the migrations' indexes
+
+
+def rotate(before_year=None):
+    """
+    Move entries dated before `before_year` (default: the current year) out of
+    diary.db into their year shards. Each year moves in one transaction.
+    Returns {year: entries moved}.
+    """
+    import database
+    before_year = before_year or date.today().year
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    conn = database._connect()
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE IF NOT EXISTS entry_shards (id INTEGER PRIMARY KEY, year INTEGER NOT NULL)")
+    past = [int(r[0]) for r in cur.execute(
+        "SELECT DISTINCT substr(created_at, 1, 4) FROM entries WHERE substr(created_at, 1, 4) < ?",
+        (str(before_year),)
+    ).fetchall()]
+    moved = {}
+    for year in sorted(past):
+        with attached(conn, year) as schema:
+            _create_shard_table(cur, schema)
+            in_year = "FROM main.entries WHERE substr(created_at, 1, 4) = ?"
+            cur.execute(f"INSERT INTO {schema}.entries ({database.ENTRY_COLUMNS}) "
+                        f"SELECT {database.ENTRY_COLUMNS} {in_year}", (str(year),))
+            moved[year] = cur.rowcount
+            cur.execute(f"INSERT OR REPLACE INTO entry_shards (id, year) SELECT id, ? {in_year}", (year, str(year)))
+            cur.execute(f"DELETE {in_year}", (str(year),))
+            database._commit(conn)
+    conn.close()
+    forget_years()
+    return moved
+
+
+def compact(year=None):
+    """VACUUM one year shard (or diary.db, e.g. after a rotate); returns (bytes before, bytes after)"""
+    import database
+    path = shard_path(year) if year is not None else database.DB_PATH
+    before = os.path.getsize(path)
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    conn.close()
+    forget_years()
+    return before, os.path.getsize(path)
+
+
+def check(year):
+    """PRAGMA integrity_check of one year shard; returns the problems found (empty if healthy)"""
+    conn = sqlite3.connect(shard_path(year))
+    problems = [row[0] for row in conn.execute("PRAGMA integrity_check").fetchall()]
+    conn.close()
+    return [] if problems == ["ok"] else problems
+
+
+def backup(year, destination):
+    """Consistent copy of one year shard (SQLite online backup)"""
+    source = sqlite3.connect(shard_path(year))
+    target = sqlite3.connect(destination)
+    source.backup(target)
+    target.close()
+    source.close()
+    return destination
+
+
+def status():
+    """[{year, entries, bytes}] for diary.db (year None) and each shard"""
+    import database
+    conn = database._connect()
+    rows = [{"year": None, "entries": conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0],
+             "bytes": os.path.getsize(database.DB_PATH)}]
+    for year in years():
+        with attached(conn, year) as schema:
+            count = conn.execute(f"SELECT COUNT(*) FROM {schema}.entries").fetchone()[0]
+        rows.append({"year": year, "entries": count, "bytes": os.path.getsize(shard_path(year))})
+    conn.close()
+    return rows
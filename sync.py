@@ -0,0 +1,431 @@
+# sync.py
+"""
+Multi-device sync through a shared folder.
+
+Each device keeps its own diary_data (its own master.key, salt and device
+lock) and exchanges encrypted change sets through a folder all of them can
+reach: a mounted drive, a network share or a directory synced by another tool.
+
+    <folder>/keyring.json                    the diary key, wrapped with the master password
+    <folder>/<device>/<first>-<last>.changes one change set per sync (zlib + Fernet, diary key)
+
+Every write queues its entry in sync_pending (database.py). A sync:
+
+1. folds the queue into sync_entries: each changed entry gets the device's
+   next change sequence number, recorded in its version vector {device: seq}
+   (a deleted entry keeps its row as a tombstone)
+2. collects the entries changed since the last export, latest state only
+3. applies the change sets the other devices wrote since the last ones read
+4. writes the collected changes as this device's next change set
+
+An incoming version whose vector contains the local one replaces it; one the
+local vector already contains is skipped. Concurrent versions are resolved the
+same way on every device: an edit beats a delete, otherwise the later
+updated_at wins, ties going to the higher device id. The entry keeps both
+vectors' maximum and the losing edit is stored in sync_revisions, so all
+devices end up with the same entries and the same revisions.
+
+Deletes move the entry to each device's trash. Restoring it from the trash
+sends it again as an edit of the same entry, which beats the delete.
+
+    key = setup("/mnt/share/diary-sync", password, key)   # once per device
+    Sync(key).run()                                       # {"sent": ..., "received": ..., ...}
+"""
+import base64
+import json
+import os
+import re
+import uuid
+import zlib
+from datetime import datetime
+
+import auth
+import database
+import metrics
+
+SYNC_FORMAT = "securediary-sync"
+SYNC_VERSION = 1
+KEYRING_FILE = "keyring.json"
+CHANGES_SUFFIX = ".changes"
+CHANGE_SET_SIZE = 1000   # changes per file, so a first sync of a large diary is written in bounded pieces
+COMPRESS_LEVEL = 1       # diary text compresses well at any level; higher ones cost 3x the time
+
+_CHANGES_RE = re.compile(r"^(\d+)-(\d+)\.changes$")
+
+
+def _setting(conn, name, default=None):
+    row = conn.execute("SELECT value FROM settings WHERE name=?", (name,)).fetchone()
+    return row[0] if row else default
+
+
+def _set(conn, name, value):
+    conn.execute("INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)", (name, str(value)))
+
+
+# ---------------------------------------------------------------- setup
+
+def _read_keyring(folder, password):
+    """The folder's diary key, or None if no device has set the folder up yet"""
+    from cryptography.fernet import Fernet, InvalidToken
+    path = os.path.join(folder, KEYRING_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        ring = json.load(f)
+    kek = auth.get_key_from_password(password, base64.b64decode(ring["salt"]))
+    try:
+        return Fernet(kek).decrypt(ring["key"].encode())
+    except InvalidToken:
+        raise ValueError("🔒 Wrong master password for this sync folder")
+
+
+def _write_keyring(folder, password, key):
+    from cryptography.fernet import Fernet
+    salt = auth.generate_salt()
+    ring = {
+        "format": SYNC_FORMAT,
+        "salt": base64.b64encode(salt).decode(),
+        "key": Fernet(auth.get_key_from_password(password, salt)).encrypt(key).decode(),
+    }
+    tmp = os.path.join(folder, KEYRING_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(ring, f, indent=2)
+    os.replace(tmp, os.path.join(folder, KEYRING_FILE))
+
+
+@metrics.timed("sync.setup")
+def setup(folder, password, key):
+    """
+    Connect this diary to a sync folder and return the diary key to use from now on.
+    The first device leaves its diary key in the folder. The others adopt it, which
+    needs the same master password and, if their own key differs, a diary without
+    entries (they would no longer decrypt).
+    """
+    from cryptography.fernet import Fernet
+    folder = os.path.abspath(folder)
+    os.makedirs(folder, exist_ok=True)
+    shared = _read_keyring(folder, password)
+    if shared is None:
+        _write_keyring(folder, password, key)
+    elif shared != key:
+        if database.count_entries():
+            raise ValueError("❌ This diary already has entries under its own key: "
+                             "set up sync from an empty diary to join this folder")
+        with open(database.DIARY_KEY_FILE, "wb") as f:
+            f.write(Fernet(auth.get_kek(password)).encrypt(shared))
+        key = shared
+
+    conn = database._connect()
+    device = _setting(conn, "sync_device") or uuid.uuid4().hex[:16]
+    if _setting(conn, "sync_folder") != folder:
+        # A new folder starts from nothing: send every entry, read every change set
+        for table in database._entry_tables(conn):
+            conn.execute(f"INSERT OR IGNORE INTO main.sync_pending (entry_id) SELECT id FROM {table}")
+        conn.execute("DELETE FROM sync_peers")
+        _set(conn, "sync_exported", 0)
+    _set(conn, "sync_device", device)
+    _set(conn, "sync_folder", folder)
+    database._commit(conn)
+    conn.close()
+    os.makedirs(os.path.join(folder, device), exist_ok=True)
+    return key
+
+
+@metrics.timed("sync.status")
+def status():
+    """Sync settings and queue sizes; needs no key"""
+    conn = database._connect()
+    result = {
+        "device": _setting(conn, "sync_device"),
+        "folder": _setting(conn, "sync_folder"),
+        "pending": conn.execute("SELECT COUNT(*) FROM sync_pending").fetchone()[0],
+        "last_seq": int(_setting(conn, "sync_seq", 0)),
+        "exported_seq": int(_setting(conn, "sync_exported", 0)),
+        "peers": dict(conn.execute("SELECT device, imported_seq FROM sync_peers ORDER BY device").fetchall()),
+        "revisions": conn.execute("SELECT COUNT(*) FROM sync_revisions").fetchone()[0],
+    }
+    conn.close()
+    return result
+
+
+# ---------------------------------------------------------------- versions
+
+def _contains(vv, other):
+    """True if version vector `vv` includes every change recorded in `other`"""
+    return all(vv.get(device, 0) >= seq for device, seq in other.items())
+
+
+def _merged(vv, other):
+    return {device: max(vv.get(device, 0), other.get(device, 0)) for device in set(vv) | set(other)}
+
+
+def _winner(a, b):
+    """(winner, loser) of two concurrent versions, the same on every device"""
+    def rank(version):
+        entry = version["entry"]
+        return entry is not None, str(entry["updated_at"]) if entry else "", version["writer"]
+    return (a, b) if rank(a) > rank(b) else (b, a)
+
+
+def _entry_fields(entry):
+    return {name: entry[name] for name in
+            ("title", "content", "mood", "tags", "created_at", "updated_at", "is_favorite")}
+
+
+class Sync:
+    """This device's side of the sync folder; see the module docstring"""
+
+    def __init__(self, key):
+        from cryptography.fernet import Fernet
+        self.key = key
+        self.fernet = Fernet(key)
+        conn = database._connect()
+        self.device = _setting(conn, "sync_device")
+        self.folder = _setting(conn, "sync_folder")
+        conn.close()
+        if self.device is None:
+            raise ValueError("❌ Sync is not set up: run `securediary sync setup <folder>` first")
+
+    @metrics.timed("sync.run")
+    def run(self):
+        """One sync round; returns what was sent, received and merged"""
+        report = {"device": self.device, "sent": 0, "received": 0, "conflicts": 0,
+                  "change_sets_read": 0, "skipped_undecryptable": 0}
+        changed = {}  # entry_id -> database change, notified once committed
+        written = []
+        conn = database._connect()
+        try:
+            # One write transaction, so no app write can slip between folding and merging
+            conn.execute("BEGIN IMMEDIATE")
+            self._fold_pending(conn)
+            last_seq = self._export(conn, report, written)
+            self._import(conn, report, changed)
+            database._commit(conn)
+            # Change sets are staged as .tmp files and only published once the round is committed
+            for tmp in written:
+                os.replace(tmp, tmp[:-len(".tmp")])
+            _set(conn, "sync_exported", last_seq)
+            database._commit(conn)
+        except BaseException:
+            for tmp in written:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            raise
+        finally:
+            conn.close()
+        for entry_id, change in changed.items():
+            database._notify(change, entry_id)
+        return report
+
+    # ------------------------------------------------------------ local changes
+
+    def _fold_pending(self, conn):
+        """Turn queued writes into versions: the next sequence number, this device as writer"""
+        pending = [row[0] for row in conn.execute("SELECT entry_id FROM sync_pending ORDER BY entry_id")]
+        if not pending:
+            return
+        present = set()
+        for table, ids in database._entry_id_groups(conn, pending):
+            for i in range(0, len(ids), database.ID_CHUNK):
+                chunk = ids[i:i + database.ID_CHUNK]
+                present.update(row[0] for row in conn.execute(
+                    f"SELECT id FROM {table} WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        known = {}
+        for i in range(0, len(pending), database.ID_CHUNK):
+            chunk = pending[i:i + database.ID_CHUNK]
+            known.update((row[0], row[1:]) for row in conn.execute(
+                f"SELECT entry_id, uid, vv FROM sync_entries WHERE entry_id IN ({','.join('?' * len(chunk))})",
+                chunk))
+
+        seq = int(_setting(conn, "sync_seq", 0))
+        for entry_id in pending:
+            if entry_id not in present and entry_id not in known:
+                continue  # added and deleted between two syncs
+            seq += 1
+            uid, vv = known.get(entry_id, (uuid.uuid4().hex, "{}"))
+            vv = json.loads(vv)
+            vv[self.device] = seq
+            deleted = entry_id not in present
+            # A tombstone keeps the entry id while the entry is in the trash: restoring it is an edit
+            conn.execute("INSERT OR REPLACE INTO sync_entries (uid, entry_id, vv, writer, seq, deleted) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (uid, entry_id, json.dumps(vv, sort_keys=True), self.device, seq, 1 if deleted else 0))
+        conn.execute("DELETE FROM sync_pending")
+        _set(conn, "sync_seq", seq)
+        metrics.incr("sync.changes_folded", len(pending))
+
+    def _export(self, conn, report, written):
+        """
+        Stage the changes since the last export (each entry's latest state, or its
+        tombstone) as change set files, appending their paths to `written`.
+        Returns the last sequence number exported.
+        """
+        exported = int(_setting(conn, "sync_exported", 0))
+        rows = conn.execute("SELECT uid, entry_id, vv, writer, seq, deleted FROM sync_entries "
+                            "WHERE seq > ? ORDER BY seq", (exported,)).fetchall()
+        for i in range(0, len(rows), CHANGE_SET_SIZE):
+            batch = rows[i:i + CHANGE_SET_SIZE]
+            # Read on this connection: the fold above holds the write lock
+            found = database._select_entry_rows_by_ids(conn, [row[1] for row in batch if not row[5]])
+            entries = dict(zip(found, database._rows_to_entries(list(found.values()), self.key, conn=conn)))
+            changes = []
+            for uid, entry_id, vv, writer, seq, deleted in batch:
+                entry = None
+                if not deleted:
+                    entry = entries.get(entry_id)
+                    if entry is None or not entry["decryptable"]:
+                        report["skipped_undecryptable"] += 1
+                        continue
+                changes.append({"uid": uid, "seq": seq, "vv": json.loads(vv), "writer": writer,
+                                "entry": None if deleted else _entry_fields(entry)})
+            if changes:
+                written.append(self._stage_change_set(changes))
+                report["sent"] += len(changes)
+        return rows[-1][4] if rows else exported
+
+    def _stage_change_set(self, changes):
+        directory = os.path.join(self.folder, self.device)
+        os.makedirs(directory, exist_ok=True)
+        payload = {"format": SYNC_FORMAT, "version": SYNC_VERSION, "device": self.device, "changes": changes}
+        blob = self.fernet.encrypt(zlib.compress(json.dumps(payload, ensure_ascii=False, default=str).encode(), COMPRESS_LEVEL))
+        tmp = os.path.join(directory, f"{changes[0]['seq']:012d}-{changes[-1]['seq']:012d}{CHANGES_SUFFIX}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        metrics.incr("sync.bytes_sent", len(blob))
+        return tmp
+
+    # ------------------------------------------------------------ remote changes
+
+    def _import(self, conn, report, changed):
+        peers = dict(conn.execute("SELECT device, imported_seq FROM sync_peers").fetchall())
+        for device in sorted(os.listdir(self.folder)):
+            directory = os.path.join(self.folder, device)
+            if device == self.device or not os.path.isdir(directory):
+                continue
+            imported = peers.get(device, 0)
+            for last, name in self._change_sets(directory):
+                if last <= imported:
+                    continue
+                with open(os.path.join(directory, name), "rb") as f:
+                    blob = f.read()
+                try:
+                    payload = json.loads(zlib.decompress(self.fernet.decrypt(blob)))
+                except Exception:
+                    raise ValueError(f"❌ Change set {device}/{name} cannot be read with this diary's key")
+                for change in payload["changes"]:
+                    if change["seq"] > imported:
+                        self._apply(conn, change, report, changed)
+                imported = last
+                report["change_sets_read"] += 1
+                metrics.incr("sync.bytes_received", len(blob))
+            if imported != peers.get(device, 0):
+                conn.execute("INSERT OR REPLACE INTO sync_peers (device, imported_seq) VALUES (?, ?)",
+                             (device, imported))
+
+    @staticmethod
+    def _change_sets(directory):
+        """[(last seq, file name)] of a device's change sets, oldest first"""
+        found = (_CHANGES_RE.match(name) for name in os.listdir(directory))
+        return sorted((int(m.group(2)), m.group(0)) for m in found if m)
+
+    def _apply(self, conn, change, report, changed):
+        uid, incoming = change["uid"], change["vv"]
+        row = conn.execute("SELECT entry_id, vv, writer, seq, deleted FROM sync_entries WHERE uid=?",
+                           (uid,)).fetchone()
+        local_vv = json.loads(row[1]) if row else {}
+        if _contains(local_vv, incoming):
+            return  # this version, or a newer one, is already here
+        entry_id = row[0] if row else None
+        winner, loser = change, None
+        if row is not None and not _contains(incoming, local_vv):
+            local = {"writer": row[2], "vv": local_vv, "entry": None}
+            if not row[4]:
+                # Read on this connection: earlier change sets of this round are not committed yet
+                entry_row = database._select_entry_row(conn, entry_id)
+                local["entry"] = _entry_fields(database._rows_to_entries([entry_row], self.key, conn=conn)[0])
+            winner, loser = _winner(local, change)
+            report["conflicts"] += 1
+            metrics.incr("sync.conflicts")
+        if winner is change:
+            entry_id = self._write(conn.cursor(), entry_id, change["entry"], changed, trashed=bool(row and row[4]))
+        if loser is not None and loser["entry"] is not None:
+            self._save_revision(conn, uid, entry_id, loser)
+        conn.execute("INSERT OR REPLACE INTO sync_entries (uid, entry_id, vv, writer, seq, deleted) "
+                     "VALUES (?, ?, ?, ?, ?, ?)",
+                     (uid, entry_id, json.dumps(_merged(local_vv, incoming), sort_keys=True), winner["writer"],
+                      row[3] if row else 0, 1 if winner["entry"] is None else 0))
+        report["received"] += 1
+
+    def _write(self, cur, entry_id, entry, changed, trashed=False):
+        """
+        Store an incoming version locally; returns the entry id (None once purged).
+        `trashed`: the local version is a tombstone, its entry (if any) in the trash.
+        """
+        if trashed and entry_id is not None and entry is not None:
+            if database._restore_entry(cur, entry_id):
+                changed[entry_id] = database.ENTRY_ADDED
+            else:
+                entry_id = None  # purged meanwhile
+        if entry is None:
+            if entry_id is not None and not trashed:
+                database._delete_entry(cur, entry_id)
+                cur.execute("DELETE FROM sync_pending WHERE entry_id=?", (entry_id,))
+                changed[entry_id] = database.ENTRY_DELETED
+            return entry_id
+        fingerprint = database.entry_fingerprint(entry["title"], entry["content"], entry["mood"], entry["tags"],
+                                                 self.key)
+        sealed = database.seal_metadata(entry["title"], entry["mood"], entry["tags"], self.key)
+        counts = database.text_counts(entry["content"])
+        if entry_id is None:
+            enc_content = database.encrypt_content(entry["content"], self.key)
+            entry_id = database._insert_entry(cur, entry["title"], enc_content, entry["mood"], entry["tags"],
+                                              entry["created_at"], entry["updated_at"], entry["is_favorite"],
+                                              *counts, sealed, fingerprint)
+            changed[entry_id] = database.ENTRY_ADDED
+        else:
+            # Text the local copy already has (e.g. only the title or favorite changed) is not rewritten
+            stored = database._stored_fingerprint(cur.connection, entry_id)
+            enc_content = None
+            if stored is None or stored.content != fingerprint.content:
+                enc_content = database.encrypt_content(entry["content"], self.key)
+            database._update_entry(cur, entry_id, entry["title"], enc_content, entry["mood"], entry["tags"],
+                                   entry["updated_at"], *counts, sealed, fingerprint)
+            # Also when nothing else changed: every device keeps the winner's updated_at
+            cur.execute(f"UPDATE {database._entry_table(cur.connection, entry_id)} "
+                        "SET is_favorite=?, updated_at=? WHERE id=?",
+                        (1 if entry["is_favorite"] else 0, entry["updated_at"], entry_id))
+            changed.setdefault(entry_id, database.ENTRY_UPDATED)
+        # Written by sync, not by the user: nothing to send back
+        cur.execute("DELETE FROM sync_pending WHERE entry_id=?", (entry_id,))
+        return entry_id
+
+    def _save_revision(self, conn, uid, entry_id, version):
+        payload = self.fernet.encrypt(json.dumps(version["entry"], ensure_ascii=False, default=str).encode())
+        conn.execute("INSERT INTO sync_revisions (uid, entry_id, writer, vv, updated_at, saved_at, payload) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (uid, entry_id, version["writer"], json.dumps(version["vv"], sort_keys=True),
+                      version["entry"]["updated_at"], datetime.now(), payload))
+
+    # ------------------------------------------------------------ conflicts
+
+    def revisions(self, entry_id=None):
+        """Versions that lost a conflict, newest first (optionally of one entry)"""
+        conn = database._connect()
+        query = "SELECT id, entry_id, writer, saved_at, payload FROM sync_revisions"
+        params = ()
+        if entry_id is not None:
+            query += " WHERE entry_id=?"
+            params = (entry_id,)
+        rows = conn.execute(query + " ORDER BY id DESC", params).fetchall()
+        conn.close()
+        result = []
+        for revision_id, revision_entry_id, writer, saved_at, payload in rows:
+            try:
+                entry = json.loads(self.fernet.decrypt(payload))
+            except Exception:
+                entry = {"title": "🔒 Undecryptable", "content": None}
+            result.append({"revision": revision_id, "entry_id": revision_entry_id, "writer": writer,
+                           "saved_at": saved_at, **entry})
+        return result
@@ -0,0 +1,47 @@
+import threading
+import time
+
+from agent import AgentClient, DiaryAgent
+
+
+class SlowAgent(DiaryAgent):
+    OPERATIONS = DiaryAgent.OPERATIONS + ("slow",)
+
+    def slow(self, seconds):
+        time.sleep(seconds)
+        return "done"
+
+
+def serve(agent, path):
+    thread = threading.Thread(target=agent.serve, args=(path,), daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not AgentClient(path).is_running():
+        assert time.monotonic() < deadline, "agent did not start"
+        time.sleep(0.05)
+    return thread
+
+
+def test_slow_operation_outlives_connect_timeout(tmp_path):
+    path = str(tmp_path / "agent.sock")
+    agent = SlowAgent(b"key", idle_timeout=60)
+    thread = serve(agent, path)
+    try:
+        with AgentClient(path, timeout=0.2) as client:
+            assert client.request("slow", seconds=1.0) == "done"
+            assert client.request("ping")["idle_timeout"] == 60
+    finally:
+        agent.shutdown()
+        thread.join(5)
+
+
+def test_idle_lock_waits_for_running_request(tmp_path):
+    path = str(tmp_path / "agent.sock")
+    agent = SlowAgent(b"key", idle_timeout=0.3)
+    thread = serve(agent, path)
+    try:
+        with AgentClient(path, timeout=0.2) as client:
+            assert client.request("slow", seconds=1.5) == "done"
+    finally:
+        agent.shutdown()
+        thread.join(5)
@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "Password123!"
+
+# Runs the CLI in a fresh interpreter and reports whether Qt got imported
+RUN_CLI = (
+    f"import sys; sys.path.insert(0, {ROOT!r})\n"  # --directory changes the working directory
+    "import cli\n"
+    "code = cli.main(sys.argv[1:])\n"
+    "sys.stderr.write('qt-imported=%s\\n' % ('PyQt6' in sys.modules))\n"
+    "sys.exit(code)\n"
+)
+
+
+@pytest.fixture
+def diary(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("diary_data")
+    import auth
+    auth.create_master_password(PASSWORD)
+    return tmp_path
+
+
+def run_cli(directory, *args):
+    result = subprocess.run([sys.executable, "-c", RUN_CLI, "--directory", str(directory), "--no-agent", *args],
+                            cwd=ROOT, input=PASSWORD + "\n", capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout), result.stderr
+
+
+@pytest.mark.parametrize("args", [
+    ("add", "--title", "Quiet day", "--content", "Nothing happened"),
+    ("stats",),
+    ("search", "quiet"),
+])
+def test_cli_never_imports_qt(diary, args):
+    out, err = run_cli(diary, *args)
+    assert out["ok"]
+    assert "qt-imported=False" in err
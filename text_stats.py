@@ -0,0 +1,83 @@
+# text_stats.py
+"""
+Incremental text statistics for the entry editor.
+
+TextStats keeps word and character counts per line (a QTextDocument block in
+the editor) plus running totals, so an edit only recounts the lines it
+touched. It has no Qt dependency; ui/entry_ui.py feeds it from
+QTextDocument.contentsChange.
+
+    stats = TextStats(text)
+    stats.replace_lines(first, removed, new_lines)   # after an edit
+    stats.words, stats.characters, stats.paragraphs, stats.reading_minutes
+"""
+import math
+
+WORDS_PER_MINUTE = 200
+
+
+def _line_counts(line):
+    return len(line.split()), len(line)
+
+
+def reading_minutes(words):
+    """Estimated reading time, at least one minute for any non-empty text"""
+    return math.ceil(words / WORDS_PER_MINUTE) if words else 0
+
+
+class TextStats:
+    """Word / character / paragraph counts maintained line by line"""
+
+    def __init__(self, text=""):
+        self.reset(text)
+
+    def reset(self, text):
+        """Recount everything (used for the initial text and as a fallback)"""
+        self.lines = [_line_counts(line) for line in text.split("\n")]
+        self.words = sum(w for w, _ in self.lines)
+        self._line_chars = sum(c for _, c in self.lines)
+        self.paragraphs = sum(1 for w, _ in self.lines if w)
+
+    def replace_lines(self, first, removed, new_lines):
+        """Replace `removed` lines starting at index `first` with `new_lines` (list of str)"""
+        if first < 0 or removed < 0 or first + removed > len(self.lines):
+            raise ValueError("line range outside the text")
+        old = self.lines[first:first + removed]
+        new = [_line_counts(line) for line in new_lines]
+        self.lines[first:first + removed] = new
+        self.words += sum(w for w, _ in new) - sum(w for w, _ in old)
+        self._line_chars += sum(c for _, c in new) - sum(c for _, c in old)
+        self.paragraphs += sum(1 for w, _ in new if w) - sum(1 for w, _ in old if w)
+
+    @property
+    def line_count(self):
+        return len(self.lines)
+
+    @property
+    def characters(self):
+        """Length of the full text, newlines included"""
+        return self._line_chars + len(self.lines) - 1
+
+    @property
+    def reading_minutes(self):
+        return reading_minutes(self.words)
+
+    def as_dict(self):
+        return {
+            "words": self.words,
+            "characters": self.characters,
+            "paragraphs": self.paragraphs,
+            "reading_minutes": self.reading_minutes,
+        }
+
+
+def format_stats(words, characters=None, paragraphs=None, reading=None):
+    """'120 words · 3 paragraphs · 640 characters · 1 min read' (None parts are left out)"""
+    parts = [f"{words} words"]
+    if paragraphs is not None:
+        parts.append(f"{paragraphs} paragraphs")
+    if characters is not None:
+        parts.append(f"{characters} characters")
+    if reading:
+        parts.append(f"{reading} min read")
+    return " · ".join(parts)
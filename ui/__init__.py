@@ -4,7 +4,19 @@ SecureDiary UI Package
 Encrypted personal journal with modern dark theme
 """
 
-from .diary_ui import DiaryWindow
-from .entry_ui import AddEntryWindow, ViewEntryWindow
+import importlib
 
 __all__ = ['DiaryWindow', 'AddEntryWindow', 'ViewEntryWindow']
+
+# Windows are imported on first access so `import ui.<module>` stays cheap
+_LAZY = {
+    'DiaryWindow': '.diary_ui',
+    'AddEntryWindow': '.entry_ui',
+    'ViewEntryWindow': '.entry_ui',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,77 +1,51 @@
 # ui/diary_ui.py
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-    QMessageBox, QApplication, QLineEdit, QScrollArea, QFrame, QComboBox
+    QMessageBox, QLineEdit, QComboBox
 )
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
 from PyQt6.QtGui import QFont
-from database import fetch_entries, delete_entry, toggle_favorite, get_stats
+from database import get_stats
 from ui.entry_ui import AddEntryWindow, ViewEntryWindow
-from utils import format_date_only, get_preview, get_mood_emoji
-import os
-import sys
-
-AUTO_LOCK_TIME = 10 * 60 * 1000  # 10 minutes auto-lock
+from ui.entry_list import EntryListModel, EntryCardDelegate, EntryListView, DiaryChanges
+from ui.entry_search import EntrySearch, FILTER_DEBOUNCE_MS
+from ui.scrub_task import IdleScrubber
+from ui.theme import apply_theme
+from ui.write_status import WriteCompletion
+from auth import AUTO_LOCK_TIME
+import archive
+import maintenance
+import metadata_crypto
+import metrics
+import related
+import search_index
+from write_queue import WriteQueue, IMMEDIATE
 
 
 class DiaryWindow(QWidget):
+    index_ready = pyqtSignal()  # the search index finished building (emitted from its thread)
+    locked = pyqtSignal(str)    # the key and decrypted text are gone; the reason is shown on the login screen
+
+    # Windows opened from the diary; they hold decrypted text and the key
+    SECONDARY_WINDOWS = ("view_window", "edit_window", "new_window", "stats_window", "trash_window")
+
     def __init__(self, key):
         super().__init__()
         self.key = key
+        # Writes are encrypted here and committed in groups on a writer thread
+        self.writes = WriteQueue(key)
+        self.write_done = WriteCompletion(self)
+        # Opt-in fuzzy search over titles and content, kept in memory until lock
+        self.indexer = search_index.DiaryIndexer(key, on_ready=self.index_ready.emit) if search_index.ENABLED else None
+        self.index_ready.connect(self.on_index_ready)
+        if self.indexer is not None:
+            self.indexer.start()  # before the list listens for changes, so searches see them first
+        # Opt-in related entries for the entry viewer, also in memory only
+        self.related_index = related.RelatedIndexer(key).start() if related.ENABLED else None
         self.setWindowTitle("📔 SecureDiary - My Journal")
         self.setGeometry(350, 100, 1200, 700)
-        self.setStyleSheet("""
-            QWidget { 
-                background-color: #0a0a0a; 
-                color: #EEEEEE; 
-                font-family: 'Segoe UI';
-            }
-            QPushButton { 
-                background-color: #2a2a2a; 
-                border-radius: 6px; 
-                padding: 8px 15px;
-                color: #EEEEEE;
-                font-weight: bold;
-                min-width: 80px;
-            }
-            QPushButton:hover { 
-                background-color: #3a3a3a; 
-            }
-            QPushButton#add {
-                background-color: #8b7355;
-            }
-            QPushButton#add:hover {
-                background-color: #a0866f;
-            }
-            QPushButton#lock {
-                background-color: #8b4513;
-            }
-            QPushButton#lock:hover {
-                background-color: #a0522d;
-            }
-            QLineEdit, QComboBox {
-                background-color: #1a1a1a;
-                border: 2px solid #2a2a2a;
-                border-radius: 6px;
-                padding: 8px;
-                color: #EEEEEE;
-            }
-            QLineEdit:focus, QComboBox:focus {
-                border: 2px solid #8b7355;
-            }
-            QComboBox::drop-down {
-                border: none;
-            }
-            QComboBox::down-arrow {
-                image: none;
-                border-left: 5px solid transparent;
-                border-right: 5px solid transparent;
-                border-top: 5px solid #EEEEEE;
-            }
-            QScrollArea {
-                border: none;
-            }
-        """)
+        self.setObjectName("DiaryWindow")
+        apply_theme()
 
         self.setup_ui()
         self.load_entries()
@@ -92,29 +66,45 @@ class DiaryWindow(QWidget):
         title = QLabel("📔 My Encrypted Diary")
         title_font = QFont("Segoe UI", 20, QFont.Weight.Bold)
         title.setFont(title_font)
-        title.setStyleSheet("color: #FFFFFF;")
+        title.setProperty("role", "title")
         title_section.addWidget(title)
         
         self.stats_label = QLabel("Loading...")
-        self.stats_label.setStyleSheet("color: #888888; font-size: 12px;")
+        self.stats_label.setProperty("role", "muted")
         title_section.addWidget(self.stats_label)
+
+        self.scrub_label = QLabel()
+        self.scrub_label.setProperty("role", "warning")
+        self.scrub_label.hide()
+        title_section.addWidget(self.scrub_label)
+
+        self.maintenance_label = QLabel()
+        self.maintenance_label.setProperty("role", "caption")
+        self.maintenance_label.hide()
+        title_section.addWidget(self.maintenance_label)
         
         top_row.addLayout(title_section)
         top_row.addStretch()
 
         # Action buttons
         self.add_btn = QPushButton("✍️ New Entry")
-        self.add_btn.setObjectName("add")
+        self.add_btn.setProperty("variant", "primary")
         self.add_btn.clicked.connect(self.open_new_entry)
 
         self.refresh_btn = QPushButton("🔄 Refresh")
-        self.refresh_btn.clicked.connect(self.load_entries)
+        self.refresh_btn.clicked.connect(lambda: self.load_entries())
+
+        self.stats_btn = QPushButton("📈 Stats")
+        self.stats_btn.clicked.connect(self.open_stats)
+
+        self.trash_btn = QPushButton("🗑️ Trash")
+        self.trash_btn.clicked.connect(self.open_trash)
 
         self.lock_btn = QPushButton("🔒 Lock Diary")
-        self.lock_btn.setObjectName("lock")
-        self.lock_btn.clicked.connect(self.lock_diary)
+        self.lock_btn.setProperty("variant", "caution")
+        self.lock_btn.clicked.connect(lambda: self.lock_diary("🔒 Diary locked."))
 
-        for b in [self.add_btn, self.refresh_btn, self.lock_btn]:
+        for b in [self.add_btn, self.refresh_btn, self.stats_btn, self.trash_btn, self.lock_btn]:
             top_row.addWidget(b)
         
         header_container.addLayout(top_row)
@@ -125,7 +115,9 @@ class DiaryWindow(QWidget):
         # Search
         filters_layout.addWidget(QLabel("🔍"))
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("Search entries by title...")
+        self.search_input.setPlaceholderText(
+            "Search titles and content..." if self.indexer is not None else "Search entries by title..."
+        )
         self.search_input.textChanged.connect(self.on_search)
         filters_layout.addWidget(self.search_input, stretch=3)
         
@@ -149,22 +141,29 @@ class DiaryWindow(QWidget):
         
         layout.addLayout(header_container)
 
-        # Scrollable entries area
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        
-        self.entries_widget = QWidget()
-        self.entries_layout = QVBoxLayout(self.entries_widget)
-        self.entries_layout.setSpacing(15)
-        self.entries_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        
-        scroll.setWidget(self.entries_widget)
-        layout.addWidget(scroll)
+        # Entries list: only visible cards are painted, pages load as you scroll
+        self.entry_search = EntrySearch(self.key, self, self.indexer)
+        self.entry_search.resultsReady.connect(self.show_results)
+        self.entry_search.failed.connect(self.on_load_failed)
+        self.entries_model = EntryListModel(self.key, self)
+        self.diary_changes = DiaryChanges(self)
+        self.diary_changes.changed.connect(self.on_diary_changed)
+        self.entries_delegate = EntryCardDelegate(self)
+        self.entries_delegate.actionTriggered.connect(self.on_entry_action)
+        self.entries_view = EntryListView()
+        self.entries_view.setModel(self.entries_model)
+        self.entries_view.setItemDelegate(self.entries_delegate)
+        layout.addWidget(self.entries_view, stretch=1)
+
+        self.empty_label = QLabel("📝 No entries found.\n\nStart writing your first diary entry!")
+        self.empty_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.empty_label.setProperty("role", "empty")
+        self.empty_label.hide()
+        layout.addWidget(self.empty_label, stretch=1)
 
         # Footer
         footer = QLabel("💭 Your thoughts are safe here, encrypted with AES-256")
-        footer.setStyleSheet("color: #666666; font-size: 11px; font-style: italic;")
+        footer.setProperty("role", "footer")
         footer.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(footer)
 
@@ -173,7 +172,7 @@ class DiaryWindow(QWidget):
     def update_stats(self):
         """Update statistics display"""
         try:
-            stats = get_stats()
+            stats = get_stats(self.key)
             total = stats["total_entries"]
             favorites = stats["favorites"]
             diary_ok = "✅ Encrypted" if stats["diary_encrypted"] else "❌ Not Encrypted"
@@ -181,142 +180,73 @@ class DiaryWindow(QWidget):
         except Exception as e:
             self.stats_label.setText(f"⚠️ Error loading stats: {str(e)}")
 
+    def current_filters(self):
+        """(search query, mood, favorites only) from the filter widgets"""
+        search_query = self.search_input.text().strip() or None
+        mood_filter = self.mood_filter.currentText() if self.mood_filter.currentText() != "All Moods" else None
+        return (search_query, mood_filter, self.favorites_btn.isChecked())
+
     def on_search(self):
-        """Handle search"""
-        self.load_entries()
+        """Handle search (debounced, runs in the background)"""
+        self.entry_search.schedule(self.current_filters())
 
     def on_filter_change(self):
         """Handle filter changes"""
-        self.load_entries()
+        self.entry_search.schedule(self.current_filters(), FILTER_DEBOUNCE_MS)
 
+    @metrics.timed("ui.DiaryWindow.load_entries")
     def load_entries(self):
-        """Load and display entries"""
-        # Clear existing entries
-        for i in reversed(range(self.entries_layout.count())): 
-            widget = self.entries_layout.itemAt(i).widget()
-            if widget:
-                widget.deleteLater()
-        
-        # Get filter values
-        search_query = self.search_input.text().strip() or None
-        mood_filter = self.mood_filter.currentText() if self.mood_filter.currentText() != "All Moods" else None
-        show_favorites = self.favorites_btn.isChecked()
-        
-        try:
-            entries = fetch_entries(self.key, search_query, mood_filter, show_favorites)
-            self.update_stats()
-        except Exception as e:
-            QMessageBox.critical(self, "❌ Error", f"Failed to load entries:\n{str(e)}")
-            return
+        """Reload entries from the database (cached results are discarded)"""
+        self.update_stats()
+        self.entry_search.refresh(self.current_filters())
 
-        if not entries:
-            empty_label = QLabel("📝 No entries found.\n\nStart writing your first diary entry!")
-            empty_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            empty_label.setStyleSheet("color: #666666; font-size: 16px; padding: 100px;")
-            self.entries_layout.addWidget(empty_label)
-            return
+    def on_load_failed(self, message):
+        QMessageBox.critical(self, "❌ Error", f"Failed to load entries:\n{message}")
 
-        # Create entry cards
-        for entry in entries:
-            self.create_entry_card(entry)
-
-    def create_entry_card(self, entry):
-        """Create a card widget for each entry"""
-        card = QFrame()
-        card.setFrameShape(QFrame.Shape.StyledPanel)
-        card.setStyleSheet("""
-            QFrame {
-                background-color: #1a1a1a;
-                border: 2px solid #2a2a2a;
-                border-radius: 10px;
-                padding: 15px;
-            }
-            QFrame:hover {
-                border: 2px solid #8b7355;
-            }
-        """)
-        
-        card_layout = QVBoxLayout(card)
-        card_layout.setSpacing(10)
-        
-        # Header row: Title, mood, favorite
-        header_row = QHBoxLayout()
-        
-        # Title
-        title_label = QLabel(entry["title"])
-        title_label.setFont(QFont("Segoe UI", 14, QFont.Weight.Bold))
-        title_label.setStyleSheet("color: #FFFFFF;")
-        header_row.addWidget(title_label)
-        
-        header_row.addStretch()
-        
-        # Mood emoji
-        if entry["mood"]:
-            mood_label = QLabel(f"{get_mood_emoji(entry['mood'])} {entry['mood']}")
-            mood_label.setStyleSheet("color: #AAAAAA; font-size: 12px;")
-            header_row.addWidget(mood_label)
-        
-        # Favorite star
-        favorite_icon = "⭐" if entry["is_favorite"] else "☆"
-        favorite_label = QLabel(favorite_icon)
-        favorite_label.setStyleSheet("font-size: 18px;")
-        header_row.addWidget(favorite_label)
-        
-        card_layout.addLayout(header_row)
-        
-        # Date
-        date_label = QLabel(format_date_only(entry["created_at"]))
-        date_label.setStyleSheet("color: #888888; font-size: 11px;")
-        card_layout.addWidget(date_label)
-        
-        # Preview content
-        if entry["decryptable"]:
-            preview = get_preview(entry["content"], 200)
+    def on_index_ready(self):
+        """Rerun a text search that was answered by SQL while the index was building"""
+        if self.current_filters()[0]:
+            self.entry_search.refresh(self.current_filters())
         else:
-            preview = entry["content"]
-        
-        content_label = QLabel(preview)
-        content_label.setWordWrap(True)
-        content_label.setStyleSheet(
-            "color: #CCCCCC; font-size: 12px; line-height: 1.5;" if entry["decryptable"]
-            else "color: #FF6666; font-size: 12px;"
-        )
-        card_layout.addWidget(content_label)
-        
-        # Tags
-        if entry["tags"]:
-            tags_label = QLabel(f"🏷️ {entry['tags']}")
-            tags_label.setStyleSheet("color: #8b7355; font-size: 11px;")
-            card_layout.addWidget(tags_label)
-        
-        # Action buttons
-        btn_layout = QHBoxLayout()
-        btn_layout.addStretch()
-        
-        view_btn = QPushButton("👁 Read")
-        view_btn.setMaximumWidth(80)
-        view_btn.clicked.connect(lambda checked, eid=entry["id"]: self.view_entry(eid))
-        
-        edit_btn = QPushButton("✏ Edit")
-        edit_btn.setMaximumWidth(80)
-        edit_btn.clicked.connect(lambda checked, eid=entry["id"]: self.edit_entry(eid))
-        
-        fav_btn = QPushButton("⭐" if not entry["is_favorite"] else "☆")
-        fav_btn.setMaximumWidth(50)
-        fav_btn.setToolTip("Toggle favorite")
-        fav_btn.clicked.connect(lambda checked, eid=entry["id"]: self.toggle_favorite_entry(eid))
-        
-        delete_btn = QPushButton("🗑")
-        delete_btn.setMaximumWidth(50)
-        delete_btn.setStyleSheet("QPushButton { background-color: #8b0000; }")
-        delete_btn.clicked.connect(lambda checked, eid=entry["id"], title=entry["title"]: self.delete_entry_confirm(eid, title))
-        
-        for btn in [view_btn, edit_btn, fav_btn, delete_btn]:
-            btn_layout.addWidget(btn)
-        
-        card_layout.addLayout(btn_layout)
-        
-        self.entries_layout.addWidget(card)
+            self.entry_search.cache.clear()
+
+    def show_results(self, filters, total, items, ranked=None):
+        """Show the first page of a finished query"""
+        if filters != self.current_filters():
+            return  # the filters changed again while this query was running
+        self.entries_model.apply_page(filters, total, items, ranked)
+        if self.update_empty_state():
+            self.entries_view.scrollToTop()
+
+    def update_empty_state(self):
+        """Show the list or the 'no entries' label; returns True if there are entries"""
+        has_entries = self.entries_model.rowCount() > 0
+        self.entries_view.setVisible(has_entries)
+        self.empty_label.setVisible(not has_entries)
+        return has_entries
+
+    @metrics.timed("ui.DiaryWindow.on_diary_changed")
+    def on_diary_changed(self, change, entry_id):
+        """Patch only the affected row and the stats after a write"""
+        self.entry_search.invalidate()
+        try:
+            self.entries_model.apply_change(change, entry_id)
+        except Exception:
+            self.load_entries()  # fallback: rebuild from scratch
+            return
+        self.update_stats()
+        self.update_empty_state()
+
+    def on_entry_action(self, action, item):
+        """Handle a button click on an entry card"""
+        if action == "view":
+            self.view_entry(item["id"])
+        elif action == "edit":
+            self.edit_entry(item["id"])
+        elif action == "favorite":
+            self.toggle_favorite_entry(item["id"])
+        elif action == "delete":
+            self.delete_entry_confirm(item["id"], item["title"])
 
     def view_entry(self, entry_id):
         """View full entry"""
@@ -335,7 +265,7 @@ class DiaryWindow(QWidget):
             )
             return
         
-        self.view_window = ViewEntryWindow(entry, self.key, parent=self)
+        self.view_window = ViewEntryWindow(entry, self.key, parent=self, related=self.related_index)
         self.view_window.show()
 
     def edit_entry(self, entry_id):
@@ -355,59 +285,125 @@ class DiaryWindow(QWidget):
             )
             return
         
-        self.edit_window = AddEntryWindow(self.key, entry, parent=self)
+        self.edit_window = AddEntryWindow(self.key, self.writes, entry, parent=self)
         self.edit_window.show()
 
     def toggle_favorite_entry(self, entry_id):
         """Toggle favorite status"""
-        try:
-            toggle_favorite(entry_id)
-            self.load_entries()
-        except Exception as ex:
-            QMessageBox.critical(self, "❌ Error", f"Failed to toggle favorite:\n{str(ex)}")
+        # Quick repeated toggles share a transaction; the star updates from the change notification
+        self.write_done.watch(self.writes.toggle_favorite(entry_id), self.on_favorite_written)
+
+    def on_favorite_written(self, entry_id, error):
+        if error is not None:
+            QMessageBox.critical(self, "❌ Error", f"Failed to toggle favorite:\n{str(error)}")
 
     def delete_entry_confirm(self, entry_id, title):
-        """Delete entry with confirmation"""
+        """Move entry to the trash with confirmation"""
+        days = maintenance.trash_days()
         reply = QMessageBox.question(
             self,
             "🗑️ Delete Entry?",
-            f"Are you sure you want to delete:\n\n📝 {title}\n\n⚠️ This action cannot be undone!",
+            f"Move this entry to the trash?\n\n📝 {title}\n\n"
+            f"♻️ You can restore it from 🗑️ Trash for {days} day{'' if days == 1 else 's'}.",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             QMessageBox.StandardButton.No
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            try:
-                delete_entry(entry_id)
-                QMessageBox.information(self, "✅ Deleted", "Entry deleted successfully.")
-                self.load_entries()
-            except Exception as ex:
-                QMessageBox.critical(self, "❌ Error", f"Failed to delete:\n{str(ex)}")
+            self.write_done.watch(self.writes.delete_entry(entry_id, durability=IMMEDIATE), self.on_delete_written)
+
+    def on_delete_written(self, entry_id, error):
+        if error is not None:
+            QMessageBox.critical(self, "❌ Error", f"Failed to delete:\n{str(error)}")
+        else:
+            QMessageBox.information(self, "✅ Moved to Trash", "Entry moved to the trash.")
 
     def open_new_entry(self):
         """Open new entry window"""
-        self.new_window = AddEntryWindow(self.key, parent=self)
+        self.new_window = AddEntryWindow(self.key, self.writes, parent=self)
         self.new_window.show()
 
+    def open_stats(self):
+        """Open the writing stats window"""
+        from ui.stats_ui import StatsWindow
+        self.stats_window = StatsWindow(self.key, parent=self)
+        self.stats_window.show()
+
+    def open_trash(self):
+        """Open the trash window"""
+        from ui.trash_ui import TrashWindow
+        self.trash_window = TrashWindow(self.key, self.writes, parent=self)
+        self.trash_window.show()
+
     def setup_autolock(self):
         """Setup auto-lock timer for inactivity"""
-        self.inactivity_timer = QTimer()
-        self.inactivity_timer.timeout.connect(self.lock_diary)
+        self.inactivity_timer = QTimer(self)
+        self.inactivity_timer.timeout.connect(
+            lambda: self.lock_diary("🔒 Diary locked due to inactivity. Please login again.")
+        )
+        # Integrity checks of the encrypted entries run while the user is idle
+        self.idle_scrubber = IdleScrubber(self.key, self)
+        self.idle_scrubber.problemsFound.connect(self.on_scrub_problems)
+        self.idle_scrubber.maintenanceDone.connect(self.on_maintenance_done)
+
         self.inactivity_timer.start(AUTO_LOCK_TIME)
         self.installEventFilter(self)
 
     def eventFilter(self, obj, event):
         """Reset inactivity timer on user interaction"""
         self.inactivity_timer.start(AUTO_LOCK_TIME)
+        self.idle_scrubber.user_active(event)
         return super().eventFilter(obj, event)
 
-    def lock_diary(self):
-        """Lock the diary and return to login"""
-        QMessageBox.information(
-            self,
-            "🔒 Auto-Lock",
-            "Diary locked due to inactivity.\n\nPlease login again to access your entries."
-        )
-        self.close()
-        QApplication.quit()
-        os.system(f"python {sys.argv[0]}")
+    def on_scrub_problems(self, summary):
+        """Surface damaged entries found by the background integrity check, or why it could not run"""
+        if "error" in summary:
+            self.scrub_label.setText(f"⚠️ Integrity check failed: {summary['error']} — it is retried while you are idle")
+            self.scrub_label.show()
+            return
+        damaged = len(summary["bad"])
+        parts = [f"⚠️ Integrity check: {damaged} damaged entr{'y' if damaged == 1 else 'ies'}"] if damaged else []
+        if summary["integrity_problems"]:
+            parts.append("⚠️ database file damage (" + ", ".join(summary["integrity_problems"]) + ")")
+        self.scrub_label.setText(" | ".join(parts) + " — run `securediary scrub` for the report")
+        self.scrub_label.show()
+
+    def on_maintenance_done(self, result):
+        """Show what idle maintenance purged and reclaimed"""
+        purged = result["purged"]
+        parts = [f"emptied {purged} expired trash entr{'y' if purged == 1 else 'ies'}"] if purged else []
+        if result["reclaimed_bytes"]:
+            parts.append(f"freed {result['reclaimed_bytes'] / 1e6:.1f} MB of disk space")
+        self.maintenance_label.setText("🧹 Maintenance " + " and ".join(parts))
+        self.maintenance_label.show()
+
+    @metrics.timed("ui.DiaryWindow.lock_diary")
+    def lock_diary(self, reason):
+        """Lock in place: close everything showing decrypted text, forget the key, hand over to the login window"""
+        self.inactivity_timer.stop()
+        for name in self.SECONDARY_WINDOWS:
+            window = getattr(self, name, None)
+            if window is not None:
+                window.close()
+                window.deleteLater()
+                setattr(self, name, None)
+        # The login window shows itself before this one closes, so the application keeps running
+        self.locked.emit(reason)
+        self.close()  # closeEvent stops background work and wipes the list, search cache and index
+        self.key = None
+        metadata_crypto.keys_for.cache_clear()
+        archive.clear_cache()
+        self.deleteLater()
+
+    def closeEvent(self, event):
+        """Commit queued writes, stop background searches and forget decrypted text before the window goes away"""
+        self.writes.close()  # pending writes are flushed, never dropped
+        self.entry_search.shutdown()
+        self.entries_model.shutdown()
+        self.diary_changes.disconnect_database()
+        self.idle_scrubber.shutdown()
+        if self.indexer is not None:
+            self.indexer.wipe()
+        if self.related_index is not None:
+            self.related_index.wipe()
+        super().closeEvent(event)
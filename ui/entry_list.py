@@ -0,0 +1,629 @@
+# ui/entry_list.py
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyle, QListView, QAbstractItemView
+from PyQt6.QtCore import (
+    Qt, QObject, QAbstractListModel, QModelIndex, QRect, QRectF, QSize, QEvent, QRunnable, QThreadPool, pyqtSignal
+)
+from PyQt6.QtGui import QFont, QColor, QPen, QFontMetrics, QTextDocument
+import html
+import database
+from database import fetch_entries, count_entries, entry_matches, get_entry_by_id, get_entries_by_ids
+from search_index import highlight_spans, snippet
+from utils import format_date_only, get_preview, get_mood_emoji
+from ui import theme
+import metrics
+
+PAGE_SIZE = 100
+PREVIEW_LENGTH = 200
+RESIDENT_PAGES = 2               # decrypted pages kept on each side of the visible ones
+PREFETCH_ROWS = PAGE_SIZE // 2   # append the next page once the viewport is this close to the end
+
+EntryRole = Qt.ItemDataRole.UserRole + 1
+
+
+def to_list_item(entry, terms=None):
+    """
+    Keep only what a card shows: the preview replaces the full decrypted content.
+    With search `terms` the preview starts near the first match.
+    """
+    if not entry["decryptable"]:
+        preview = entry["content"]
+    elif terms:
+        preview = snippet(entry["content"], terms, PREVIEW_LENGTH)
+    else:
+        preview = get_preview(entry["content"], PREVIEW_LENGTH)
+    return {
+        "id": entry["id"],
+        "title": entry["title"],
+        "mood": entry["mood"],
+        "tags": entry["tags"],
+        "created_at": entry["created_at"],
+        "is_favorite": entry["is_favorite"],
+        "decryptable": entry["decryptable"],
+        "preview": preview,
+    }
+
+
+def stub_item(item):
+    """What a row far from the viewport keeps: just enough to page and sort"""
+    return {"id": item["id"], "created_at": item["created_at"]}
+
+
+def is_stub(item):
+    return "title" not in item
+
+
+class _PageSignals(QObject):
+    done = pyqtSignal(int, str, object, object)  # generation, kind, tag, items (None on error)
+
+
+class PageTask(QRunnable):
+    """Fetches and decrypts one page of list items on the model's pool thread"""
+
+    def __init__(self, generation, kind, tag, key, filters, after, limit, signals, ids=None, terms=None):
+        super().__init__()
+        self.generation = generation
+        self.kind = kind
+        self.tag = tag
+        self.key = key
+        self.filters = filters
+        self.after = after
+        self.limit = limit
+        self.signals = signals
+        self.ids = ids          # ranked search results: fetch these ids instead of a keyset page
+        self.terms = terms
+
+    def run(self):
+        try:
+            if self.ids is not None:
+                entries = get_entries_by_ids(self.ids, self.key)
+            else:
+                entries = fetch_entries(self.key, *self.filters, limit=self.limit, after=self.after)
+            items = [to_list_item(e, self.terms) for e in entries]
+        except Exception:
+            items = None
+        self.signals.done.emit(self.generation, self.kind, self.tag, items)
+
+
+class EntryListModel(QAbstractListModel):
+    """
+    Entries matching the current filters, loaded a page at a time as the view scrolls.
+    The next page is prefetched in the background, and rows more than RESIDENT_PAGES
+    pages away from the viewport drop their decrypted preview until they come back.
+
+    Ranked search results (search_index.py) are paged the same way, but through
+    their list of ids in rank order instead of a (created_at, id) cursor.
+    """
+
+    def __init__(self, key, parent=None):
+        super().__init__(parent)
+        self.key = key
+        self.filters = (None, None, False)
+        self.items = []
+        self.total = 0
+        self.ranked_ids = None       # ranked search: every matching id, best first
+        self.highlight_terms = frozenset()
+
+        self.generation = 0          # bumped on every reset; older page tasks are ignored
+        self.resident = set()        # pages whose rows hold full items
+        self.row_by_id = None        # entry id -> row, built on demand and dropped when rows shift
+        self.loading = set()         # (kind, tag) of page tasks in flight
+        self.next_page = None        # (cursor, items) prefetched for fetchMore
+        self.append_when_ready = False
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.signals = _PageSignals(self)
+        self.signals.done.connect(self._on_page_loaded)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.items):
+            return None
+        item = self.items[index.row()]
+        if role == EntryRole:
+            return item
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return item.get("title")
+        return None
+
+    def set_filters(self, search_query=None, filter_mood=None, filter_favorite=False):
+        """Reset to the first page of a new query (runs the query on the calling thread)"""
+        filters = (search_query, filter_mood, filter_favorite)
+        total = count_entries(*filters, key=self.key)
+        entries = fetch_entries(self.key, *filters, limit=PAGE_SIZE)
+        self.apply_page(filters, total, [to_list_item(e) for e in entries])
+
+    def apply_page(self, filters, total, items, ranked=None):
+        """
+        Reset to a first page that was queried elsewhere (see ui/entry_search.py).
+        `ranked` is (ids, matched terms) for results from the search index.
+        """
+        self.beginResetModel()
+        self.generation += 1
+        self.pool.clear()
+        self.loading.clear()
+        self.next_page = None
+        self.append_when_ready = False
+        self.filters = filters
+        self.total = total
+        self.items = list(items)
+        self.ranked_ids = list(ranked[0]) if ranked is not None else None
+        self.highlight_terms = frozenset(ranked[1]) if ranked is not None else frozenset()
+        self.resident = {0} if self.items else set()
+        self.row_by_id = None
+        self.endResetModel()
+        self._prefetch_next()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and len(self.items) < self.total
+
+    def fetchMore(self, parent=QModelIndex()):
+        """Append the prefetched page, or ask for it to be appended as soon as it arrives"""
+        if parent.isValid() or not self.items:
+            return
+        if self.next_page is not None and self.next_page[0] == self._cursor():
+            self._append(self.next_page[1])
+        else:
+            self.append_when_ready = True
+            self._prefetch_next()
+
+    def set_visible_rows(self, first, last):
+        """Called by the view as it scrolls: release far pages, reload visible ones, prefetch"""
+        if not self.items:
+            return
+        first_page, last_page = first // PAGE_SIZE, last // PAGE_SIZE
+        keep = range(first_page - RESIDENT_PAGES, last_page + RESIDENT_PAGES + 1)
+        for page in [p for p in self.resident if p not in keep]:
+            self._release(page)
+        last_loaded_page = (len(self.items) - 1) // PAGE_SIZE
+        # Visible pages plus one on each side, so scrolling rarely shows empty cards
+        for page in range(max(first_page - 1, 0), min(last_page + 1, last_loaded_page) + 1):
+            if page not in self.resident and ("page", page) not in self.loading:
+                rows = self._page_rows(page)
+                ids = [self.items[row]["id"] for row in rows] if self.ranked_ids is not None else None
+                self._start_page_task("page", page, self._cursor_before(page * PAGE_SIZE), len(rows), ids)
+        if len(self.items) - last <= PREFETCH_ROWS and self.canFetchMore():
+            self.fetchMore()
+
+    def shutdown(self):
+        """Drop pending page tasks and forget decrypted items (window closing or locking)"""
+        self.generation += 1
+        self.pool.clear()
+        self.pool.waitForDone(1000)
+        self.beginResetModel()
+        self.items = []
+        self.total = 0
+        self.ranked_ids = None
+        self.highlight_terms = frozenset()
+        self.resident = set()
+        self.row_by_id = None
+        self.next_page = None
+        self.endResetModel()
+
+    # ------------------------------------------------------------ paging internals
+
+    def _cursor(self):
+        last = self.items[-1]
+        return (last["created_at"], last["id"])
+
+    def _cursor_before(self, row):
+        if row == 0:
+            return None
+        previous = self.items[row - 1]
+        return (previous["created_at"], previous["id"])
+
+    def _page_rows(self, page):
+        return range(page * PAGE_SIZE, min((page + 1) * PAGE_SIZE, len(self.items)))
+
+    def _start_page_task(self, kind, tag, after, limit, ids=None):
+        self.loading.add((kind, tag))
+        self.pool.start(PageTask(self.generation, kind, tag, self.key, self.filters,
+                                 after, limit, self.signals, ids, self.highlight_terms))
+
+    def _prefetch_next(self):
+        if not self.items or not self.canFetchMore():
+            return
+        cursor = self._cursor()
+        if (self.next_page is not None and self.next_page[0] == cursor) or ("next", cursor) in self.loading:
+            return
+        ids = None
+        if self.ranked_ids is not None:
+            start = self.ranked_ids.index(cursor[1]) + 1
+            ids = self.ranked_ids[start:start + PAGE_SIZE]
+        self._start_page_task("next", cursor, cursor, PAGE_SIZE, ids)
+
+    def _append(self, page):
+        self.next_page = None
+        self.append_when_ready = False
+        if not page:
+            self.total = len(self.items)
+            return
+        first = len(self.items)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self.items.extend(page)
+        self.endInsertRows()
+        if self.row_by_id is not None:
+            self.row_by_id.update((item["id"], row) for row, item in enumerate(page, first))
+        self.resident.update(range(first // PAGE_SIZE, (len(self.items) - 1) // PAGE_SIZE + 1))
+        self._prefetch_next()
+
+    def _release(self, page):
+        self.resident.discard(page)
+        for row in self._page_rows(page):
+            self.items[row] = stub_item(self.items[row])
+        metrics.incr("ui.entry_pages_released")
+
+    def _on_page_loaded(self, generation, kind, tag, items):
+        if generation != self.generation:
+            return  # queried for an earlier reset
+        self.loading.discard((kind, tag))
+        if items is None:
+            self.append_when_ready = False
+            return
+        if kind == "next":
+            if not self.items or tag != self._cursor():
+                return  # the end of the list changed while loading
+            self.next_page = (tag, items)
+            if self.append_when_ready:
+                self._append(items)
+        else:
+            self._fill_page(tag, items)
+
+    def _fill_page(self, page, items):
+        """Put reloaded items back into a released page (matched by id)"""
+        rows = self._page_rows(page)
+        by_id = {item["id"]: item for item in items}
+        for row in rows:
+            item = by_id.get(self.items[row]["id"])
+            if item is not None:
+                self.items[row] = item
+        if all(not is_stub(self.items[row]) for row in rows):
+            self.resident.add(page)
+        if rows:
+            self.dataChanged.emit(self.index(rows.start), self.index(rows.stop - 1))
+        metrics.incr("ui.entry_pages_reloaded")
+
+    def row_of(self, entry_id):
+        if self.row_by_id is None:
+            self.row_by_id = {item["id"]: row for row, item in enumerate(self.items)}
+        return self.row_by_id.get(entry_id, -1)
+
+    def _rows_shifted(self, row):
+        """
+        Rows from `row` on moved by one: pages there now hold other rows, so
+        which of them are fully loaded is worked out again (a stub that moved
+        into a resident page would otherwise never be reloaded)
+        """
+        self.row_by_id = None
+        for page in range(row // PAGE_SIZE, (len(self.items) - 1) // PAGE_SIZE + 1):
+            if any(is_stub(self.items[r]) for r in self._page_rows(page)):
+                self.resident.discard(page)
+            else:
+                self.resident.add(page)
+
+    def apply_change(self, change, entry_id):
+        """Patch the rows touched by one database change instead of reloading the list"""
+        self.next_page = None  # the prefetched page may hold the changed entry
+        if self.ranked_ids is not None:
+            self._patch_ranked_row(change, entry_id)
+        else:
+            self._patch_row(change, entry_id)
+        self._prefetch_next()
+
+    def _patch_ranked_row(self, change, entry_id):
+        """Ranked results: refresh or drop listed entries (new matches show up on the next search)"""
+        if entry_id not in self.ranked_ids:
+            return
+        row = self.row_of(entry_id)
+        entry = None if change == database.ENTRY_DELETED else get_entry_by_id(entry_id, self.key)
+        if entry is None or not entry_matches(entry_id, None, *self.filters[1:], key=self.key):
+            self.ranked_ids.remove(entry_id)
+            if row >= 0:
+                self._remove_row(row)
+            else:
+                self.total -= 1
+            return
+        if row >= 0 and not is_stub(self.items[row]):
+            self.items[row] = to_list_item(entry, self.highlight_terms)
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def _patch_row(self, change, entry_id):
+        row = self.row_of(entry_id)
+        if change == database.ENTRY_DELETED:
+            if row >= 0:
+                self._remove_row(row)
+            elif self.canFetchMore():
+                # It may be further down than the loaded pages
+                self.total = count_entries(*self.filters, key=self.key)
+            return
+
+        if not entry_matches(entry_id, *self.filters, key=self.key):
+            if row >= 0:
+                self._remove_row(row)  # e.g. unstarred while showing favorites only
+            return
+
+        entry = get_entry_by_id(entry_id, self.key)
+        if entry is None:
+            return
+        item = to_list_item(entry)
+        if row >= 0:
+            self.items[row] = item
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+            return
+
+        # Newly matching: insert at its sort position if that is inside the loaded pages,
+        # otherwise fetchMore will reach it later
+        position = self._sort_position(item)
+        self.total += 1
+        if position < len(self.items) or len(self.items) == self.total - 1:
+            self.beginInsertRows(QModelIndex(), position, position)
+            self.items.insert(position, item)
+            self._rows_shifted(position)
+            self.endInsertRows()
+
+    def _remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.items[row]
+        self._rows_shifted(row)
+        self.total -= 1
+        self.endRemoveRows()
+
+    def _sort_position(self, item):
+        """Index keeping items ordered by (created_at, id) descending"""
+        key = (item["created_at"], item["id"])
+        for row, other in enumerate(self.items):
+            if (other["created_at"], other["id"]) < key:
+                return row
+        return len(self.items)
+
+
+class DiaryChanges(QObject):
+    """
+    Forwards database change notifications as a Qt signal.
+    Queued to the GUI thread when the write happened on another thread.
+    """
+
+    changed = pyqtSignal(str, int)  # change, entry id
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        database.add_change_listener(self._on_change)
+
+    def _on_change(self, change, entry_id):
+        self.changed.emit(change, entry_id)
+
+    def disconnect_database(self):
+        database.remove_change_listener(self._on_change)
+
+
+class EntryCardDelegate(QStyledItemDelegate):
+    """Paints an entry card and its Read / Edit / Favorite / Delete buttons"""
+
+    actionTriggered = pyqtSignal(str, object)  # action name, list item
+
+    CARD_HEIGHT = 196
+    CARD_GAP = 8
+    PADDING = 16
+    BUTTON_HEIGHT = 30
+    BUTTON_SPACING = 6
+    BUTTONS = [("view", 80), ("edit", 80), ("favorite", 50), ("delete", 50)]
+
+    # Same palette as the application stylesheet (ui/theme.py)
+    BACKGROUND = QColor(theme.SURFACE)
+    BORDER = QColor(theme.BORDER)
+    BORDER_FAVORITE = QColor(theme.ACCENT_DIM)
+    BORDER_HOVER = QColor(theme.ACCENT)
+    BUTTON = QColor(theme.BORDER)
+    BUTTON_DANGER = QColor(theme.DANGER)
+    TEXT = QColor(theme.TEXT)
+    TITLE = QColor(theme.TEXT_STRONG)
+    MOOD = QColor(theme.TEXT_SECONDARY)
+    DATE = QColor(theme.TEXT_MUTED)
+    PREVIEW = QColor(theme.TEXT_BODY)
+    PREVIEW_UNDECRYPTABLE = QColor(theme.ERROR)
+    TAGS = QColor(theme.ACCENT)
+    HIGHLIGHT = QColor(theme.HIGHLIGHT)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.title_font = QFont("Segoe UI", 14, QFont.Weight.Bold)
+        self.small_font = QFont("Segoe UI")
+        self.small_font.setPixelSize(11)
+        self.text_font = QFont("Segoe UI")
+        self.text_font.setPixelSize(12)
+        self.star_font = QFont("Segoe UI")
+        self.star_font.setPixelSize(18)
+        self.button_font = QFont("Segoe UI")
+        self.button_font.setBold(True)
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.CARD_HEIGHT)
+
+    def card_rect(self, rect):
+        return rect.adjusted(0, self.CARD_GAP // 2, -4, -self.CARD_GAP // 2)
+
+    def button_rects(self, rect):
+        """Action name -> QRect, right-aligned along the bottom of the card"""
+        card = self.card_rect(rect)
+        y = card.bottom() - self.PADDING - self.BUTTON_HEIGHT
+        x = card.right() - self.PADDING
+        rects = {}
+        for name, width in reversed(self.BUTTONS):
+            x -= width
+            rects[name] = QRect(x, y, width, self.BUTTON_HEIGHT)
+            x -= self.BUTTON_SPACING
+        return rects
+
+    @staticmethod
+    def button_label(name, item):
+        if name == "view":
+            return "👁 Read"
+        if name == "edit":
+            return "✏ Edit"
+        if name == "favorite":
+            return "⭐" if not item["is_favorite"] else "☆"
+        return "🗑"
+
+    def draw_highlighted(self, painter, rect, text, font, color, terms):
+        """
+        Draw `text` in `rect` with the words among `terms` highlighted.
+        Returns False (nothing drawn) when no word matches, so the caller draws plain text.
+        """
+        spans = highlight_spans(text, terms)
+        if not spans:
+            return False
+        parts, position = [], 0
+        for start, end in spans:
+            parts.append(html.escape(text[position:start]))
+            parts.append(f'<span style="background-color: {self.HIGHLIGHT.name()}; color: {theme.TEXT_STRONG};">'
+                         f'{html.escape(text[start:end])}</span>')
+            position = end
+        parts.append(html.escape(text[position:]))
+
+        document = QTextDocument()
+        document.setDocumentMargin(0)
+        document.setDefaultFont(font)
+        document.setTextWidth(rect.width())
+        document.setHtml(f'<div style="color: {color.name()}; white-space: pre-wrap;">{"".join(parts)}</div>')
+        painter.save()
+        painter.translate(rect.topLeft())
+        document.drawContents(painter, QRectF(0, 0, rect.width(), rect.height()))
+        painter.restore()
+        return True
+
+    @metrics.timed("ui.EntryCardDelegate.paint")
+    def paint(self, painter, option, index):
+        item = index.data(EntryRole)
+        if item is None:
+            return
+        painter.save()
+        painter.setRenderHint(painter.RenderHint.Antialiasing)
+
+        card = self.card_rect(option.rect)
+        hovered = bool(option.state & QStyle.StateFlag.State_MouseOver)
+        if hovered:
+            border = self.BORDER_HOVER
+        elif item.get("is_favorite"):
+            border = self.BORDER_FAVORITE
+        else:
+            border = self.BORDER
+        painter.setPen(QPen(border, 2))
+        painter.setBrush(self.BACKGROUND)
+        painter.drawRoundedRect(QRectF(card).adjusted(1, 1, -1, -1), 10, 10)
+        if is_stub(item):
+            # Released page that is being reloaded: empty card until it arrives
+            painter.restore()
+            return
+
+        inner = card.adjusted(self.PADDING, self.PADDING, -self.PADDING, -self.PADDING)
+        y = inner.top()
+        terms = getattr(index.model(), "highlight_terms", None)
+
+        # Header row: title, mood, favorite star
+        painter.setFont(self.star_font)
+        star_rect = QRect(inner.right() - 24, y, 24, 26)
+        painter.setPen(self.TEXT)
+        painter.drawText(star_rect, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter,
+                         "⭐" if item["is_favorite"] else "☆")
+
+        mood_width = 0
+        if item["mood"]:
+            painter.setFont(self.text_font)
+            mood_text = f"{get_mood_emoji(item['mood'])} {item['mood']}"
+            mood_width = QFontMetrics(self.text_font).horizontalAdvance(mood_text) + 12
+            painter.setPen(self.MOOD)
+            painter.drawText(QRect(star_rect.left() - mood_width, y, mood_width, 26),
+                             Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, mood_text)
+
+        painter.setFont(self.title_font)
+        painter.setPen(self.TITLE)
+        title_width = inner.width() - 24 - mood_width - 12
+        title = QFontMetrics(self.title_font).elidedText(item["title"], Qt.TextElideMode.ElideRight, title_width)
+        title_rect = QRect(inner.left(), y, title_width, 26)
+        if not (terms and self.draw_highlighted(painter, title_rect, title, self.title_font, self.TITLE, terms)):
+            painter.drawText(title_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, title)
+        y += 30
+
+        # Date
+        painter.setFont(self.small_font)
+        painter.setPen(self.DATE)
+        painter.drawText(QRect(inner.left(), y, inner.width(), 16),
+                         Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                         format_date_only(item["created_at"]))
+        y += 22
+
+        # Preview (up to three wrapped lines)
+        painter.setFont(self.text_font)
+        preview_color = self.PREVIEW if item["decryptable"] else self.PREVIEW_UNDECRYPTABLE
+        painter.setPen(preview_color)
+        preview_rect = QRect(inner.left(), y, inner.width(), 52)
+        if not (terms and item["decryptable"] and
+                self.draw_highlighted(painter, preview_rect, item["preview"], self.text_font, preview_color, terms)):
+            painter.drawText(preview_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop |
+                             Qt.TextFlag.TextWordWrap, item["preview"] or "")
+        y += 56
+
+        # Tags
+        if item["tags"]:
+            painter.setFont(self.small_font)
+            painter.setPen(self.TAGS)
+            painter.drawText(QRect(inner.left(), y, inner.width() - 300, 16),
+                             Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                             f"🏷️ {item['tags']}")
+
+        # Action buttons
+        painter.setFont(self.button_font)
+        for name, rect in self.button_rects(option.rect).items():
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(self.BUTTON_DANGER if name == "delete" else self.BUTTON)
+            painter.drawRoundedRect(QRectF(rect), 6, 6)
+            painter.setPen(self.TEXT)
+            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, self.button_label(name, item))
+
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.Type.MouseButtonRelease and event.button() == Qt.MouseButton.LeftButton:
+            item = index.data(EntryRole)
+            if item is None or is_stub(item):
+                return True
+            pos = event.position().toPoint()
+            for name, rect in self.button_rects(option.rect).items():
+                if rect.contains(pos):
+                    self.actionTriggered.emit(name, item)
+                    return True
+        return super().editorEvent(event, model, option, index)
+
+
+class EntryListView(QListView):
+    """QListView configured for large, uniformly sized card lists"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setUniformItemSizes(True)
+        self.setMouseTracking(True)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.verticalScrollBar().setSingleStep(24)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.verticalScrollBar().valueChanged.connect(self.report_visible_rows)
+
+    def report_visible_rows(self):
+        """Tell the model which rows are on screen (paging and memory window)"""
+        model = self.model()
+        if model is None or not hasattr(model, "set_visible_rows") or model.rowCount() == 0:
+            return
+        viewport = self.viewport().rect()
+        first = self.indexAt(viewport.topLeft()).row()
+        last = self.indexAt(viewport.bottomLeft()).row()
+        model.set_visible_rows(max(first, 0), last if last >= 0 else model.rowCount() - 1)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.report_visible_rows()
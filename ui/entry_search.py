@@ -0,0 +1,184 @@
+# ui/entry_search.py
+import time
+from collections import OrderedDict
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+from database import fetch_entries, count_entries, filter_entry_ids, get_entries_by_ids
+from ui.entry_list import PAGE_SIZE, to_list_item
+
+SEARCH_DEBOUNCE_MS = 250     # wait for typing to pause before querying
+FILTER_DEBOUNCE_MS = 100     # mood / favorites changes (e.g. scrolling through the combo box)
+CACHE_TTL_SECONDS = 30       # recent results stay valid this long
+CACHE_MAX_QUERIES = 32
+
+
+class QueryCache:
+    """Short-lived LRU of first-page results keyed by filters, so backspacing is instant"""
+
+    def __init__(self, ttl=CACHE_TTL_SECONDS, max_queries=CACHE_MAX_QUERIES):
+        self.ttl = ttl
+        self.max_queries = max_queries
+        self.results = OrderedDict()
+
+    def get(self, filters):
+        hit = self.results.get(filters)
+        if hit is None:
+            return None
+        stored_at, total, items, ranked = hit
+        if time.monotonic() - stored_at > self.ttl:
+            del self.results[filters]
+            return None
+        self.results.move_to_end(filters)
+        return total, items, ranked
+
+    def put(self, filters, total, items, ranked=None):
+        self.results[filters] = (time.monotonic(), total, items, ranked)
+        self.results.move_to_end(filters)
+        while len(self.results) > self.max_queries:
+            self.results.popitem(last=False)
+
+    def clear(self):
+        self.results.clear()
+
+
+class _TaskSignals(QObject):
+    done = pyqtSignal(int, object, int, object, object)  # generation, filters, total, items, ranked
+    error = pyqtSignal(int, str)
+
+
+class QueryTask(QRunnable):
+    """
+    Counts and decrypts the first page of a query on a pool thread.
+    With a ready search index, text searches are answered by the index (ranked,
+    typo tolerant) and only the mood / favorite filters go to SQL.
+    """
+
+    def __init__(self, generation, key, filters, signals, indexer=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.generation = generation
+        self.key = key
+        self.filters = filters
+        self.signals = signals
+        self.indexer = indexer
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            if self.cancelled:
+                return
+            ranked = self.search_index()
+            if ranked is not None:
+                ids, terms = ranked
+                total = len(ids)
+                items = [to_list_item(e, terms) for e in get_entries_by_ids(ids[:PAGE_SIZE], self.key)]
+            else:
+                total = count_entries(*self.filters, key=self.key)
+                if self.cancelled:
+                    return
+                items = [to_list_item(e) for e in fetch_entries(self.key, *self.filters, limit=PAGE_SIZE)]
+            if not self.cancelled:
+                self.signals.done.emit(self.generation, self.filters, total, items, ranked)
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.error.emit(self.generation, str(e))
+
+    def search_index(self):
+        """(ranked ids, matched terms) from the index, or None to fall back to SQL"""
+        search_query, filter_mood, filter_favorite = self.filters
+        if not search_query or self.indexer is None:
+            return None
+        found = self.indexer.search(search_query)
+        if found is None:
+            return None  # still building
+        ids, terms = found
+        if filter_mood or filter_favorite:
+            ids = filter_entry_ids(ids, filter_mood, filter_favorite, key=self.key)
+        return ids, terms
+
+
+class EntrySearch(QObject):
+    """
+    Debounced background queries for the entry list.
+    Only the newest query's results are delivered; older ones are cancelled or dropped.
+    """
+
+    resultsReady = pyqtSignal(object, int, object, object)  # filters, total, first page items, ranked
+    failed = pyqtSignal(str)
+
+    def __init__(self, key, parent=None, indexer=None):
+        super().__init__(parent)
+        self.key = key
+        self.indexer = indexer  # optional search_index.DiaryIndexer
+        self.cache = QueryCache()
+        self.generation = 0
+        self.pending_filters = None
+        self.current_task = None
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._start_query)
+
+        self.signals = _TaskSignals(self)
+        self.signals.done.connect(self._on_done)
+        self.signals.error.connect(self._on_error)
+
+    def schedule(self, filters, delay=SEARCH_DEBOUNCE_MS):
+        """Query `filters` once input has been quiet for `delay` ms (cache hits apply at once)"""
+        self.pending_filters = filters
+        cached = self.cache.get(filters)
+        if cached is not None:
+            self.timer.stop()
+            self._cancel_current()
+            self.generation += 1
+            self.resultsReady.emit(filters, *cached)
+            return
+        self.timer.start(delay)
+
+    def refresh(self, filters):
+        """Drop cached results (the diary changed) and query immediately"""
+        self.cache.clear()
+        self.schedule(filters, 0)
+
+    def invalidate(self):
+        """The diary changed: forget cached results and rerun a query that may have missed it"""
+        self.cache.clear()
+        if self.current_task is not None:
+            self._start_query()
+
+    def _cancel_current(self):
+        if self.current_task is not None:
+            self.current_task.cancel()
+            self.pool.tryTake(self.current_task)
+            self.current_task = None
+
+    def _start_query(self):
+        self._cancel_current()
+        self.generation += 1
+        self.current_task = QueryTask(self.generation, self.key, self.pending_filters, self.signals, self.indexer)
+        self.pool.start(self.current_task)
+
+    def _on_done(self, generation, filters, total, items, ranked):
+        if generation != self.generation:
+            return  # stale: a newer query, a diary change or shutdown() came since, so it is not cached either
+        self.cache.put(filters, total, items, ranked)
+        self.current_task = None
+        self.resultsReady.emit(filters, total, items, ranked)
+
+    def _on_error(self, generation, message):
+        if generation == self.generation:
+            self.current_task = None
+            self.failed.emit(message)
+
+    def shutdown(self):
+        """Stop timers and pending work (used when the window closes or locks)"""
+        self.timer.stop()
+        self._cancel_current()
+        self.generation += 1
+        self.cache.clear()
+        self.pool.waitForDone(1000)
@@ -1,84 +1,34 @@
 # ui/entry_ui.py
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton,
-    QMessageBox, QLabel, QTextEdit, QComboBox
+    QMessageBox, QLabel, QTextEdit, QComboBox, QListWidget, QListWidgetItem
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
 from PyQt6.QtGui import QFont
-from database import add_entry, update_entry
-from utils import format_timestamp, count_words
+from database import get_entries_by_ids
+import related as related_entries
+from utils import format_timestamp, count_words, get_mood_emoji
+from text_stats import TextStats, format_stats, reading_minutes
+from ui.theme import apply_theme
+from ui.write_status import WriteCompletion
+from write_queue import IMMEDIATE
 
 
 class AddEntryWindow(QWidget):
     """Add or Edit diary entry"""
-    def __init__(self, key, entry=None, parent=None):
+    def __init__(self, key, writes, entry=None, parent=None):
         super().__init__()
         self.key = key
+        self.writes = writes  # the diary window's write_queue.WriteQueue
         self.entry = entry  # If editing, this contains entry data
         self.parent_window = parent
+        self.write_done = WriteCompletion(self)
         
         is_editing = entry is not None
         self.setWindowTitle("✏️ Edit Entry" if is_editing else "✍️ New Diary Entry")
         self.setGeometry(500, 200, 700, 700)
-        self.setStyleSheet("""
-            QWidget { 
-                background-color: #0a0a0a; 
-                color: #EEEEEE; 
-                font-family: 'Segoe UI';
-            }
-            QLineEdit { 
-                border: 2px solid #2a2a2a; 
-                border-radius: 6px; 
-                padding: 10px; 
-                background-color: #1a1a1a;
-                color: #EEEEEE;
-                font-size: 13px;
-            }
-            QLineEdit:focus {
-                border: 2px solid #8b7355;
-            }
-            QTextEdit {
-                border: 2px solid #2a2a2a; 
-                border-radius: 6px; 
-                padding: 10px; 
-                background-color: #1a1a1a;
-                color: #EEEEEE;
-                font-size: 13px;
-                line-height: 1.6;
-            }
-            QTextEdit:focus {
-                border: 2px solid #8b7355;
-            }
-            QComboBox {
-                border: 2px solid #2a2a2a; 
-                border-radius: 6px; 
-                padding: 8px; 
-                background-color: #1a1a1a;
-                color: #EEEEEE;
-            }
-            QComboBox:focus {
-                border: 2px solid #8b7355;
-            }
-            QPushButton { 
-                background-color: #2a2a2a; 
-                border-radius: 6px; 
-                padding: 10px; 
-                color: #EEEEEE;
-                font-weight: bold;
-            }
-            QPushButton:hover { 
-                background-color: #3a3a3a; 
-            }
-            QPushButton#primary {
-                background-color: #8b7355;
-            }
-            QPushButton#primary:hover {
-                background-color: #a0866f;
-            }
-            QLabel {
-                color: #CCCCCC;
-            }
-        """)
+        self.setObjectName("EntryEditor")
+        apply_theme()
 
         self.setup_ui()
 
@@ -92,17 +42,18 @@ class AddEntryWindow(QWidget):
         title = QLabel("✏️ Edit Your Entry" if is_editing else "✍️ Write a New Entry")
         title_font = QFont("Segoe UI", 16, QFont.Weight.Bold)
         title.setFont(title_font)
-        title.setStyleSheet("color: #FFFFFF;")
+        title.setProperty("role", "title")
         layout.addWidget(title)
 
         subtitle = QLabel("Express your thoughts freely - they're encrypted and safe")
-        subtitle.setStyleSheet("color: #888888; font-size: 11px;")
+        subtitle.setProperty("role", "caption")
         layout.addWidget(subtitle)
 
         layout.addSpacing(10)
 
         # Entry Title
         title_label = QLabel("Title *")
+        title_label.setProperty("role", "field")
         layout.addWidget(title_label)
         
         self.title_input = QLineEdit()
@@ -117,6 +68,7 @@ class AddEntryWindow(QWidget):
         # Mood selector
         mood_layout = QVBoxLayout()
         mood_label = QLabel("How are you feeling?")
+        mood_label.setProperty("role", "field")
         mood_layout.addWidget(mood_label)
         
         self.mood_combo = QComboBox()
@@ -137,6 +89,7 @@ class AddEntryWindow(QWidget):
         # Tags
         tags_layout = QVBoxLayout()
         tags_label = QLabel("Tags (comma separated)")
+        tags_label.setProperty("role", "field")
         tags_layout.addWidget(tags_label)
         
         self.tags_input = QLineEdit()
@@ -150,24 +103,24 @@ class AddEntryWindow(QWidget):
 
         # Content
         content_label = QLabel("Your Entry *")
+        content_label.setProperty("role", "field")
         layout.addWidget(content_label)
         
         self.content_input = QTextEdit()
         self.content_input.setPlaceholderText("Write your thoughts here...\n\nTip: Be honest and open - only you can read this.")
-        self.content_input.textChanged.connect(self.update_word_count)
         if self.entry:
             self.content_input.setPlainText(self.entry["content"])
         layout.addWidget(self.content_input, stretch=1)
 
-        # Word count
+        # Word count, updated per edit from the changed lines only
         self.word_count_label = QLabel("0 words")
-        self.word_count_label.setStyleSheet("color: #888888; font-size: 11px;")
+        self.word_count_label.setProperty("role", "caption")
         self.word_count_label.setAlignment(Qt.AlignmentFlag.AlignRight)
         layout.addWidget(self.word_count_label)
 
-        # Update word count initially if editing
-        if self.entry:
-            self.update_word_count()
+        self.text_stats = TextStats(self.content_input.toPlainText())
+        self.content_input.document().contentsChange.connect(self.on_contents_change)
+        self.update_word_count()
 
         # Buttons
         btn_layout = QHBoxLayout()
@@ -177,7 +130,7 @@ class AddEntryWindow(QWidget):
         
         save_text = "💾 Update Entry" if is_editing else "💾 Save Entry"
         self.save_btn = QPushButton(save_text)
-        self.save_btn.setObjectName("primary")
+        self.save_btn.setProperty("variant", "primary")
         self.save_btn.clicked.connect(self.save_entry)
         
         btn_layout.addWidget(self.cancel_btn)
@@ -186,11 +139,32 @@ class AddEntryWindow(QWidget):
 
         self.setLayout(layout)
 
+    def on_contents_change(self, position, removed, added):
+        """Recount only the blocks touched by an edit"""
+        document = self.content_input.document()
+        first = document.findBlock(position)
+        last = document.findBlock(min(position + added, document.characterCount() - 1))
+        changed_blocks = last.blockNumber() - first.blockNumber() + 1
+        # Blocks after the edit are unchanged, so the block count delta says how many were replaced
+        replaced = changed_blocks - (document.blockCount() - self.text_stats.line_count)
+
+        lines = []
+        block = first
+        while block.isValid() and block.blockNumber() <= last.blockNumber():
+            lines.append(block.text())
+            block = block.next()
+        try:
+            self.text_stats.replace_lines(first.blockNumber(), replaced, lines)
+        except ValueError:
+            self.text_stats.reset(self.content_input.toPlainText())
+        self.update_word_count()
+
     def update_word_count(self):
         """Update word count label"""
-        text = self.content_input.toPlainText()
-        words = count_words(text)
-        self.word_count_label.setText(f"{words} words")
+        stats = self.text_stats
+        self.word_count_label.setText(
+            format_stats(stats.words, stats.characters, stats.paragraphs, stats.reading_minutes)
+        )
 
     def save_entry(self):
         """Save or update entry"""
@@ -209,70 +183,80 @@ class AddEntryWindow(QWidget):
             return
         
         try:
+            # Encrypted here, committed on the writer thread; the window waits for the commit
             if self.entry:
-                # Update existing entry
-                update_entry(self.entry["id"], title, content, self.key, mood, tags)
-                QMessageBox.information(self, "✅ Updated", "Your entry has been updated successfully!")
+                # Saved unchanged, the text is not encrypted again and nothing is written
+                future = self.writes.update_entry(self.entry["id"], title, content, mood, tags, durability=IMMEDIATE,
+                                                  base_fingerprint=self.entry.get("fingerprint"))
             else:
-                # Add new entry
-                add_entry(title, content, self.key, mood, tags)
-                QMessageBox.information(self, "✅ Saved", "Your entry has been saved securely!")
-            
-            if self.parent_window:
-                self.parent_window.load_entries()
-            
-            self.close()
+                future = self.writes.add_entry(title, content, mood, tags, durability=IMMEDIATE)
         except Exception as ex:
             QMessageBox.critical(self, "❌ Error", f"Failed to save entry:\n{str(ex)}")
+            return
+        self.save_btn.setEnabled(False)
+        self.write_done.watch(future, self.on_saved)
+
+    def on_saved(self, entry_id, error):
+        if error is not None:
+            self.save_btn.setEnabled(True)
+            QMessageBox.critical(self, "❌ Error", f"Failed to save entry:\n{str(error)}")
+            return
+        if self.entry:
+            QMessageBox.information(self, "✅ Updated", "Your entry has been updated successfully!")
+        else:
+            QMessageBox.information(self, "✅ Saved", "Your entry has been saved securely!")
+        # The diary window updates itself from the database change notification
+        self.close()
+
+
+class _RelatedSignals(QObject):
+    done = pyqtSignal(object)  # [(entry, similarity)], or None while the index is being built
+
+
+class RelatedTask(QRunnable):
+    """Finds an entry's most similar entries in the related index and decrypts them on a pool thread"""
+
+    def __init__(self, entry_id, key, related):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.entry_id = entry_id
+        self.key = key
+        self.related = related  # related.RelatedIndexer
+        self.signals = _RelatedSignals()  # no parent: the viewer may be closed and deleted before run() ends
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            found = self.related.related(self.entry_id)
+            if found is not None:
+                entries = {e["id"]: e for e in get_entries_by_ids([i for i, _ in found], self.key)}
+                found = [(entries[i], score) for i, score in found if i in entries and entries[i]["decryptable"]]
+        except Exception:
+            found = []
+        if not self.cancelled:
+            self.signals.done.emit(found)
 
 
 class ViewEntryWindow(QWidget):
     """View entry in read-only mode"""
-    def __init__(self, entry, key, parent=None):
+    def __init__(self, entry, key, parent=None, related=None):
         super().__init__()
         self.entry = entry
         self.key = key
         self.parent_window = parent
+        self.related = related  # the diary window's related.RelatedIndexer, when enabled
+        self.related_task = None
         
         self.setWindowTitle(f"📖 {entry['title']}")
         self.setGeometry(500, 200, 700, 700)
-        self.setStyleSheet("""
-            QWidget { 
-                background-color: #0a0a0a; 
-                color: #EEEEEE; 
-                font-family: 'Segoe UI';
-            }
-            QTextEdit {
-                border: 2px solid #2a2a2a; 
-                border-radius: 6px; 
-                padding: 15px; 
-                background-color: #1a1a1a;
-                color: #EEEEEE;
-                font-size: 14px;
-                line-height: 1.8;
-            }
-            QPushButton { 
-                background-color: #2a2a2a; 
-                border-radius: 6px; 
-                padding: 10px; 
-                color: #EEEEEE;
-                font-weight: bold;
-            }
-            QPushButton:hover { 
-                background-color: #3a3a3a; 
-            }
-            QPushButton#primary {
-                background-color: #8b7355;
-            }
-            QPushButton#primary:hover {
-                background-color: #a0866f;
-            }
-            QLabel {
-                color: #CCCCCC;
-            }
-        """)
+        self.setObjectName("EntryViewer")
+        apply_theme()
 
         self.setup_ui()
+        self.load_related()
 
     def setup_ui(self):
         layout = QVBoxLayout()
@@ -283,7 +267,7 @@ class ViewEntryWindow(QWidget):
         title = QLabel(self.entry["title"])
         title_font = QFont("Segoe UI", 18, QFont.Weight.Bold)
         title.setFont(title_font)
-        title.setStyleSheet("color: #FFFFFF;")
+        title.setProperty("role", "title")
         title.setWordWrap(True)
         layout.addWidget(title)
 
@@ -293,22 +277,21 @@ class ViewEntryWindow(QWidget):
         # Date
         date_str = format_timestamp(self.entry["created_at"])
         date_label = QLabel(f"📅 {date_str}")
-        date_label.setStyleSheet("color: #888888; font-size: 12px;")
+        date_label.setProperty("role", "muted")
         meta_layout.addWidget(date_label)
         
         meta_layout.addStretch()
         
         # Mood
         if self.entry["mood"]:
-            from utils import get_mood_emoji
             mood_label = QLabel(f"{get_mood_emoji(self.entry['mood'])} {self.entry['mood']}")
-            mood_label.setStyleSheet("color: #AAAAAA; font-size: 12px;")
+            mood_label.setProperty("role", "mood")
             meta_layout.addWidget(mood_label)
         
         # Favorite
         if self.entry["is_favorite"]:
             fav_label = QLabel("⭐")
-            fav_label.setStyleSheet("font-size: 16px;")
+            fav_label.setProperty("role", "star")
             meta_layout.addWidget(fav_label)
         
         layout.addLayout(meta_layout)
@@ -316,7 +299,7 @@ class ViewEntryWindow(QWidget):
         # Tags
         if self.entry["tags"]:
             tags_label = QLabel(f"🏷️ {self.entry['tags']}")
-            tags_label.setStyleSheet("color: #8b7355; font-size: 11px;")
+            tags_label.setProperty("role", "tags")
             layout.addWidget(tags_label)
 
         layout.addSpacing(10)
@@ -327,13 +310,29 @@ class ViewEntryWindow(QWidget):
         self.content_display.setReadOnly(True)
         layout.addWidget(self.content_display, stretch=1)
 
-        # Word count
-        words = count_words(self.entry["content"])
-        word_count = QLabel(f"📊 {words} words")
-        word_count.setStyleSheet("color: #888888; font-size: 11px;")
+        # Word count (stored with the entry when available, counted otherwise)
+        words = self.entry.get("word_count")
+        if words is None:
+            words = count_words(self.entry["content"])
+        word_count = QLabel(f"📊 {format_stats(words, reading=reading_minutes(words))}")
+        word_count.setProperty("role", "caption")
         word_count.setAlignment(Qt.AlignmentFlag.AlignRight)
         layout.addWidget(word_count)
 
+        # Related entries (opt-in, see related.py)
+        self.related_label = QLabel("🔗 Related entries")
+        self.related_label.setProperty("role", "muted")
+        self.related_list = QListWidget()
+        self.related_list.setMaximumHeight(130)
+        self.related_list.itemClicked.connect(self.open_related)
+        for widget in (self.related_label, self.related_list):
+            widget.setVisible(self.related is not None)
+            layout.addWidget(widget)
+        if self.related is None and related_entries.REQUESTED:
+            # Asked for, but NumPy is missing
+            self.related_label.setText("🔗 Related entries need NumPy: pip install numpy")
+            self.related_label.show()
+
         # Buttons
         btn_layout = QHBoxLayout()
         
@@ -341,7 +340,7 @@ class ViewEntryWindow(QWidget):
         self.close_btn.clicked.connect(self.close)
         
         self.edit_btn = QPushButton("✏ Edit")
-        self.edit_btn.setObjectName("primary")
+        self.edit_btn.setProperty("variant", "primary")
         self.edit_btn.clicked.connect(self.open_edit)
         
         btn_layout.addStretch()
@@ -351,8 +350,44 @@ class ViewEntryWindow(QWidget):
 
         self.setLayout(layout)
 
+    def load_related(self):
+        """Look up similar entries in the background; the list fills in when they arrive"""
+        if self.related is None:
+            return
+        self.related_list.addItem("⏳ Finding related entries...")
+        self.related_task = RelatedTask(self.entry["id"], self.key, self.related)
+        self.related_task.signals.done.connect(self.show_related)
+        QThreadPool.globalInstance().start(self.related_task)
+
+    def show_related(self, found):
+        self.related_list.clear()
+        if found is None:
+            self.related_list.addItem("⏳ Still indexing your entries, reopen this entry in a moment")
+            return
+        if not found:
+            self.related_list.addItem("No similar entries yet")
+            return
+        for entry, score in found:
+            item = QListWidgetItem(f"{get_mood_emoji(entry['mood'])} {entry['title']}    "
+                                   f"📅 {format_timestamp(entry['created_at'])}    {score:.0%} similar")
+            item.setData(Qt.ItemDataRole.UserRole, entry["id"])
+            self.related_list.addItem(item)
+
+    def open_related(self, item):
+        entry_id = item.data(Qt.ItemDataRole.UserRole)
+        if entry_id is None or not self.parent_window:
+            return  # a status line
+        self.close()
+        self.parent_window.view_entry(entry_id)
+
     def open_edit(self):
         """Open edit window"""
         self.close()
         if self.parent_window:
             self.parent_window.edit_entry(self.entry["id"])
+
+    def closeEvent(self, event):
+        if self.related_task is not None:
+            self.related_task.cancel()
+        self.related_list.clear()  # decrypted titles
+        super().closeEvent(event)
@@ -0,0 +1,134 @@
+# ui/scrub_task.py
+import time
+from PyQt6.QtCore import QEvent, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+import database
+import maintenance
+import metrics
+import scrub
+
+SCRUB_IDLE_MS = 60_000          # the user has to be idle this long before a slice runs
+SCRUB_INTERVAL_MS = 30_000      # at most one slice per interval
+SCRUB_SLICE_SECONDS = 2.0
+SCRUB_PAUSE_SECONDS = 0.05      # between batches inside a slice
+SCRUB_EVERY_DAYS = 7            # start a new pass this long after the last one completed
+MAINTENANCE_EVERY_MS = 10 * 60_000  # fingerprints, trash expiry and incremental vacuum, when no scrub slice is due
+MAINTENANCE_SLICE_SECONDS = 1.0
+INPUT_EVENTS = {QEvent.Type.KeyPress, QEvent.Type.MouseButtonPress, QEvent.Type.MouseMove, QEvent.Type.Wheel}
+
+
+class _ScrubSignals(QObject):
+    finished = pyqtSignal(object)  # scrub.summary() of the state, or {"error": message}
+    maintained = pyqtSignal(object)  # maintenance.run_slice() result, or None on error
+
+
+class ScrubSlice(QRunnable):
+    """One bounded scrub run on a pool thread; stops early when the user comes back"""
+
+    def __init__(self, scrubber, should_stop, signals):
+        super().__init__()
+        self.scrubber = scrubber
+        self.should_stop = should_stop
+        self.signals = signals
+
+    def run(self):
+        try:
+            state = self.scrubber.run(max_seconds=SCRUB_SLICE_SECONDS, pause=SCRUB_PAUSE_SECONDS,
+                                      should_stop=self.should_stop)
+            self.signals.finished.emit(scrub.summary(state))
+        except Exception as e:
+            self.signals.finished.emit({"error": str(e)})
+
+
+class MaintenanceSlice(QRunnable):
+    """
+    Missing entry fingerprints, expired trash purge and a bounded incremental
+    vacuum (maintenance.py) on a pool thread
+    """
+
+    def __init__(self, key, fingerprints_passed, should_stop, signals):
+        super().__init__()
+        self.key = key
+        self.fingerprints_passed = fingerprints_passed
+        self.should_stop = should_stop
+        self.signals = signals
+
+    def run(self):
+        try:
+            # Entries saved before fingerprints were stored get one, so saving them unchanged writes nothing
+            database.backfill_fingerprints(self.key, max_seconds=MAINTENANCE_SLICE_SECONDS,
+                                           passed=self.fingerprints_passed)
+            self.signals.maintained.emit(maintenance.run_slice(MAINTENANCE_SLICE_SECONDS, self.should_stop))
+        except Exception:
+            metrics.incr("maintenance.failures")  # retried at the next idle slot
+            self.signals.maintained.emit(None)
+
+
+class IdleScrubber(QObject):
+    """
+    Runs the integrity scrubber (scrub.py) in short background slices while the
+    user is idle. Progress is checkpointed, so a pass spreads over many sessions.
+    Between passes the idle slices go to maintenance (maintenance.py) instead,
+    at most every MAINTENANCE_EVERY_MS.
+    """
+
+    problemsFound = pyqtSignal(object)  # scrub.summary() when the pass has found damage, or {"error": message}
+    maintenanceDone = pyqtSignal(object)  # maintenance.run_slice() result when it purged or reclaimed something
+
+    def __init__(self, key, parent=None):
+        super().__init__(parent)
+        self.key = key
+        self.scrubber = scrub.Scrubber(key, workers=2)
+        self.last_activity = time.monotonic()
+        self.running = False
+        self.stopping = False
+        self.last_maintenance = None
+        self.fingerprints_passed = {}  # backfill_fingerprints() progress, so undecryptable rows are tried once
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.signals = _ScrubSignals(self)
+        self.signals.finished.connect(self._on_finished)
+        self.signals.maintained.connect(self._on_maintained)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self._tick)
+        self.timer.start(SCRUB_INTERVAL_MS)
+        # Damage found by an earlier pass stays reported until a clean pass
+        QTimer.singleShot(0, lambda: self._on_finished(scrub.summary(self.scrubber.state)
+                                                       if self.scrubber.state else None))
+
+    def user_active(self, event):
+        """Called from the window's event filter: input stops a running slice at its next batch"""
+        if event.type() in INPUT_EVENTS:
+            self.last_activity = time.monotonic()
+
+    def _should_stop(self):
+        return self.stopping or (time.monotonic() - self.last_activity) * 1000 < SCRUB_IDLE_MS
+
+    def _tick(self):
+        if self.running or self._should_stop():
+            return
+        if self.scrubber.pass_due(SCRUB_EVERY_DAYS):
+            self.running = True
+            self.pool.start(ScrubSlice(self.scrubber, self._should_stop, self.signals))
+        elif (self.last_maintenance is None
+              or (time.monotonic() - self.last_maintenance) * 1000 >= MAINTENANCE_EVERY_MS):
+            self.running = True
+            self.last_maintenance = time.monotonic()
+            self.pool.start(MaintenanceSlice(self.key, self.fingerprints_passed, self._should_stop, self.signals))
+
+    def _on_finished(self, summary):
+        self.running = False
+        if summary is not None and ("error" in summary or not summary["healthy"]):
+            self.problemsFound.emit(summary)
+
+    def _on_maintained(self, result):
+        self.running = False
+        if result is not None and (result["purged"] or result["reclaimed_bytes"]):
+            self.maintenanceDone.emit(result)
+
+    def shutdown(self):
+        """Stop scrubbing and maintenance (window closing or locking); the checkpoint keeps the progress"""
+        self.timer.stop()
+        self.stopping = True
+        self.pool.waitForDone(5000)
@@ -0,0 +1,271 @@
+# ui/stats_ui.py
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QScrollArea
+from PyQt6.QtCore import Qt, QObject, QRect, QRectF, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QPainter
+from analytics import DiaryAnalytics, WEEKDAYS
+from database import backfill_text_counts, fetch_entry_metadata
+from ui.entry_list import DiaryChanges
+from ui import theme
+from ui.theme import apply_theme
+import metrics
+
+VOLUME_MONTHS = 24
+MOOD_MONTHS = 12
+
+
+class _LoadSignals(QObject):
+    done = pyqtSignal(object)   # metadata rows
+    error = pyqtSignal(str)
+
+
+class LoadTask(QRunnable):
+    """Counts words of entries saved before counts were stored, then reads all metadata"""
+
+    def __init__(self, key, signals):
+        super().__init__()
+        self.key = key
+        self.signals = signals
+
+    def run(self):
+        try:
+            backfill_text_counts(self.key)
+            self.signals.done.emit(fetch_entry_metadata(key=self.key))
+        except Exception as e:
+            self.signals.error.emit(str(e))
+
+
+class BarChart(QWidget):
+    """Vertical bars with a label under every few bars"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.series = []  # (label, value)
+        self.setMinimumHeight(160)
+
+    def set_series(self, series):
+        self.series = series
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        area = self.rect().adjusted(4, 4, -4, -20)
+        if not self.series:
+            painter.setPen(QColor(theme.TEXT_FAINT))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "No entries yet")
+            return
+        peak = max(value for _, value in self.series) or 1
+        slot = area.width() / len(self.series)
+        label_every = max(1, round(60 / slot))
+        font = QFont("Segoe UI")
+        font.setPixelSize(10)
+        painter.setFont(font)
+        for i, (label, value) in enumerate(self.series):
+            height = area.height() * value / peak
+            x = area.left() + i * slot
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor(theme.ACCENT))
+            painter.drawRoundedRect(QRectF(x + slot * 0.15, area.bottom() - height, slot * 0.7, height), 2, 2)
+            if i % label_every == 0:
+                painter.setPen(QColor(theme.TEXT_MUTED))
+                painter.drawText(QRect(int(x), area.bottom() + 4, int(slot * label_every), 14),
+                                 Qt.AlignmentFlag.AlignLeft, label)
+
+
+class MoodTrendChart(QWidget):
+    """One 100% stacked bar per month, colored by mood, with a legend"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.trend = []  # (month, {mood: entries})
+        self.setMinimumHeight(190)
+
+    def set_trend(self, trend):
+        self.trend = trend
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        font = QFont("Segoe UI")
+        font.setPixelSize(10)
+        painter.setFont(font)
+        area = self.rect().adjusted(4, 4, -4, -44)
+        if not self.trend:
+            painter.setPen(QColor(theme.TEXT_FAINT))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "No moods recorded yet")
+            return
+        slot = area.width() / len(self.trend)
+        for i, (month, moods) in enumerate(self.trend):
+            total = sum(moods.values())
+            x = area.left() + i * slot
+            y = float(area.bottom())
+            for mood in theme.MOOD_COLORS:
+                share = moods.get(mood, 0) / total
+                if share:
+                    height = area.height() * share
+                    y -= height
+                    painter.fillRect(QRectF(x + slot * 0.1, y, slot * 0.8, height), QColor(theme.MOOD_COLORS[mood]))
+            painter.setPen(QColor(theme.TEXT_MUTED))
+            painter.drawText(QRect(int(x), area.bottom() + 4, int(slot), 14), Qt.AlignmentFlag.AlignCenter,
+                             month[2:])
+
+        # Legend
+        x, y = area.left(), area.bottom() + 24
+        for mood, color in theme.MOOD_COLORS.items():
+            painter.fillRect(QRect(x, y + 3, 10, 10), QColor(color))
+            painter.setPen(QColor(theme.TEXT_SECONDARY))
+            width = painter.fontMetrics().horizontalAdvance(mood)
+            painter.drawText(QRect(x + 14, y, width + 4, 16), Qt.AlignmentFlag.AlignVCenter, mood)
+            x += width + 28
+
+
+class ActivityHeatmap(QWidget):
+    """Entries per weekday and hour of day"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.grid = [[0] * 24 for _ in range(7)]
+        self.setMinimumHeight(7 * 18 + 22)
+
+    def set_grid(self, grid):
+        self.grid = grid
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        font = QFont("Segoe UI")
+        font.setPixelSize(10)
+        painter.setFont(font)
+        left, top = 36, 4
+        cell_w = (self.width() - left - 4) / 24
+        cell_h = 18
+        peak = max(max(row) for row in self.grid) or 1
+        low, high = QColor(theme.SURFACE), QColor(theme.ACCENT)
+        for weekday, row in enumerate(self.grid):
+            y = top + weekday * cell_h
+            painter.setPen(QColor(theme.TEXT_MUTED))
+            painter.drawText(QRect(0, int(y), left - 6, cell_h), Qt.AlignmentFlag.AlignRight |
+                             Qt.AlignmentFlag.AlignVCenter, WEEKDAYS[weekday])
+            for hour, count in enumerate(row):
+                t = count / peak
+                color = QColor(int(low.red() + (high.red() - low.red()) * t),
+                               int(low.green() + (high.green() - low.green()) * t),
+                               int(low.blue() + (high.blue() - low.blue()) * t))
+                painter.fillRect(QRectF(left + hour * cell_w + 1, y + 1, cell_w - 2, cell_h - 2), color)
+        painter.setPen(QColor(theme.TEXT_MUTED))
+        for hour in range(0, 24, 3):
+            painter.drawText(QRect(int(left + hour * cell_w), top + 7 * cell_h + 4, int(cell_w * 3), 14),
+                             Qt.AlignmentFlag.AlignLeft, f"{hour:02d}:00")
+
+
+class StatsWindow(QWidget):
+    """Writing statistics, computed from entry metadata (no entry is decrypted to draw them)"""
+
+    def __init__(self, key, parent=None):
+        super().__init__()
+        self.key = key
+        self.parent_window = parent
+        self.analytics = DiaryAnalytics(key)
+        self.loaded = False
+        self.pending_changes = []  # writes seen while the initial load runs
+
+        self.setWindowTitle("📈 Writing Stats")
+        self.setGeometry(450, 150, 900, 720)
+        self.setObjectName("StatsWindow")
+        apply_theme()
+
+        self.setup_ui()
+
+        # Aggregates follow writes made while the window is open
+        self.diary_changes = DiaryChanges(self)
+        self.diary_changes.changed.connect(self.on_diary_changed)
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.signals = _LoadSignals(self)
+        self.signals.done.connect(self.on_loaded)
+        self.signals.error.connect(self.on_load_failed)
+        self.pool.start(LoadTask(key, self.signals))
+
+    def setup_ui(self):
+        outer = QVBoxLayout()
+        outer.setContentsMargins(20, 20, 20, 20)
+
+        title = QLabel("📈 Writing Stats")
+        title.setFont(QFont("Segoe UI", 18, QFont.Weight.Bold))
+        title.setProperty("role", "title")
+        outer.addWidget(title)
+
+        self.summary_label = QLabel("Loading...")
+        self.summary_label.setProperty("role", "muted")
+        self.summary_label.setWordWrap(True)
+        outer.addWidget(self.summary_label)
+
+        content = QWidget()
+        layout = QVBoxLayout(content)
+        layout.setSpacing(8)
+
+        self.volume_chart = BarChart()
+        self.mood_chart = MoodTrendChart()
+        self.heatmap = ActivityHeatmap()
+        for heading, chart in [(f"📝 Words per month (last {VOLUME_MONTHS} months)", self.volume_chart),
+                               (f"😊 Moods per month (last {MOOD_MONTHS} months)", self.mood_chart),
+                               ("🕐 When you write", self.heatmap)]:
+            label = QLabel(heading)
+            label.setProperty("role", "field")
+            layout.addSpacing(10)
+            layout.addWidget(label)
+            layout.addWidget(chart)
+        layout.addStretch()
+
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(content)
+        outer.addWidget(scroll, stretch=1)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        close_btn = QPushButton("✖ Close")
+        close_btn.clicked.connect(self.close)
+        btn_layout.addWidget(close_btn)
+        outer.addLayout(btn_layout)
+
+        self.setLayout(outer)
+
+    def on_loaded(self, rows):
+        self.analytics.load(rows)
+        self.loaded = True
+        for change in self.pending_changes:
+            self.analytics.apply_change(*change)
+        self.pending_changes = []
+        self.refresh()
+
+    def on_load_failed(self, message):
+        self.summary_label.setText(f"⚠️ Error loading stats: {message}")
+
+    @metrics.timed("ui.StatsWindow.on_diary_changed")
+    def on_diary_changed(self, change, entry_id):
+        if not self.loaded:
+            self.pending_changes.append((change, entry_id))
+            return
+        self.analytics.apply_change(change, entry_id)
+        self.refresh()
+
+    def refresh(self):
+        """Redraw everything from the current aggregates"""
+        s = self.analytics.summary()
+        text = (f"📊 {s['entries']} entries | 📝 {s['words']:,} words (≈{s['average_words']} per entry) | "
+                f"📅 {s['active_days']} days written | 🔥 current streak {s['current_streak']} days, "
+                f"longest {s['longest_streak']} days")
+        if s["uncounted"]:
+            text += f" | ⚠️ {s['uncounted']} undecryptable entries not counted"
+        self.summary_label.setText(text)
+        self.volume_chart.set_series([(month, words) for month, _, words, _ in
+                                      self.analytics.monthly_volume(VOLUME_MONTHS)])
+        self.mood_chart.set_trend(self.analytics.mood_trend(MOOD_MONTHS))
+        self.heatmap.set_grid(self.analytics.heatmap)
+
+    def closeEvent(self, event):
+        self.diary_changes.disconnect_database()
+        self.pool.clear()
+        super().closeEvent(event)
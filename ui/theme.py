@@ -0,0 +1,153 @@
+# ui/theme.py
+"""
+Application-wide look and feel.
+
+The stylesheet is installed once on QApplication; windows and widgets only set
+an object name or a dynamic property, never their own stylesheet:
+
+    window.setObjectName("DiaryWindow")        # per-window rules
+    button.setProperty("variant", "danger")     # primary / danger / caution
+    label.setProperty("role", "muted")          # title / field / muted / caption / ...
+
+Properties changed after a widget is shown need a re-polish: use set_style().
+The entry card delegate paints with the same palette constants.
+"""
+from PyQt6.QtWidgets import QApplication
+
+# Palette
+BACKGROUND = "#0a0a0a"
+SURFACE = "#1a1a1a"
+BORDER = "#2a2a2a"
+BUTTON_HOVER = "#3a3a3a"
+TEXT = "#EEEEEE"
+TEXT_STRONG = "#FFFFFF"
+TEXT_BODY = "#CCCCCC"
+TEXT_SECONDARY = "#AAAAAA"
+TEXT_MUTED = "#888888"
+TEXT_FAINT = "#666666"
+ACCENT = "#8b7355"
+ACCENT_HOVER = "#a0866f"
+ACCENT_PRESSED = "#6b5844"
+ACCENT_DIM = "#4a3d2e"          # favorite card border
+HIGHLIGHT = "#6b5424"           # search matches in entry cards
+DANGER = "#8b0000"
+CAUTION = "#8b4513"
+CAUTION_HOVER = "#a0522d"
+ERROR = "#FF6666"
+WARNING = "#FFA500"
+STRENGTH = {"Weak": "#FF4444", "Medium": "#FFA500", "Strong": "#00FF00"}
+MOOD_COLORS = {
+    "Happy": "#e0b040", "Sad": "#4a6fa5", "Excited": "#e07a3f", "Angry": "#b03a2e",
+    "Calm": "#5f9e8f", "Anxious": "#8e6fb0", "Grateful": "#9bb55a", "Reflective": "#7d8a99",
+    "Loved": "#c9677f", "Tired": "#5c5c6e",
+}
+
+STYLESHEET = f"""
+QWidget {{
+    background-color: {BACKGROUND};
+    color: {TEXT};
+    font-family: 'Segoe UI', Arial;
+}}
+
+/* Buttons: neutral by default, variants through the "variant" property */
+QPushButton {{
+    background-color: {BORDER};
+    border: none;
+    border-radius: 6px;
+    padding: 10px;
+    color: {TEXT};
+    font-weight: bold;
+}}
+QPushButton:hover {{ background-color: {BUTTON_HOVER}; }}
+QPushButton[variant="primary"] {{ background-color: {ACCENT}; }}
+QPushButton[variant="primary"]:hover {{ background-color: {ACCENT_HOVER}; }}
+QPushButton[variant="primary"]:pressed {{ background-color: {ACCENT_PRESSED}; }}
+QPushButton[variant="danger"] {{ background-color: {DANGER}; }}
+QPushButton[variant="caution"] {{ background-color: {CAUTION}; }}
+QPushButton[variant="caution"]:hover {{ background-color: {CAUTION_HOVER}; }}
+
+/* Inputs */
+QLineEdit, QTextEdit, QComboBox {{
+    background-color: {SURFACE};
+    border: 2px solid {BORDER};
+    border-radius: 6px;
+    padding: 10px;
+    color: {TEXT};
+    font-size: 13px;
+}}
+QLineEdit:focus, QTextEdit:focus, QComboBox:focus {{ border: 2px solid {ACCENT}; }}
+QComboBox {{ padding: 8px; }}
+QComboBox::drop-down {{ border: none; }}
+QComboBox::down-arrow {{
+    image: none;
+    border-left: 5px solid transparent;
+    border-right: 5px solid transparent;
+    border-top: 5px solid {TEXT};
+}}
+QCheckBox {{ color: {TEXT_SECONDARY}; spacing: 8px; }}
+QProgressBar {{
+    border: 2px solid {BORDER};
+    border-radius: 5px;
+    text-align: center;
+    background-color: {SURFACE};
+}}
+QProgressBar::chunk {{ border-radius: 3px; }}
+QListView {{ border: none; background-color: {BACKGROUND}; }}
+
+/* Labels: text roles through the "role" property */
+QLabel[role="title"] {{ color: {TEXT_STRONG}; }}
+QLabel[role="subtitle"] {{ color: {TEXT_MUTED}; }}
+QLabel[role="field"] {{ color: {TEXT_BODY}; }}
+QLabel[role="muted"] {{ color: {TEXT_MUTED}; font-size: 12px; }}
+QLabel[role="caption"] {{ color: {TEXT_MUTED}; font-size: 11px; }}
+QLabel[role="mood"] {{ color: {TEXT_SECONDARY}; font-size: 12px; }}
+QLabel[role="tags"] {{ color: {ACCENT}; font-size: 11px; }}
+QLabel[role="star"] {{ font-size: 16px; }}
+QLabel[role="error"] {{ color: {ERROR}; font-size: 12px; }}
+QLabel[role="warning"] {{ color: {WARNING}; font-size: 12px; }}
+QLabel[role="empty"] {{ color: {TEXT_FAINT}; font-size: 16px; padding: 100px; }}
+QLabel[role="footer"] {{ color: {TEXT_FAINT}; font-size: 11px; font-style: italic; }}
+QLabel[strength="Weak"] {{ color: {STRENGTH["Weak"]}; font-size: 14px; font-weight: bold; }}
+QLabel[strength="Medium"] {{ color: {STRENGTH["Medium"]}; font-size: 14px; font-weight: bold; }}
+QLabel[strength="Strong"] {{ color: {STRENGTH["Strong"]}; font-size: 14px; font-weight: bold; }}
+QProgressBar[strength="Weak"]::chunk {{ background-color: {STRENGTH["Weak"]}; }}
+QProgressBar[strength="Medium"]::chunk {{ background-color: {STRENGTH["Medium"]}; }}
+QProgressBar[strength="Strong"]::chunk {{ background-color: {STRENGTH["Strong"]}; }}
+
+/* Login window: larger controls, accent buttons */
+#LoginWindow QLineEdit {{ border-radius: 8px; padding: 12px; }}
+#LoginWindow QPushButton {{
+    background-color: {ACCENT};
+    color: white;
+    border-radius: 8px;
+    padding: 12px;
+    font-size: 14px;
+}}
+#LoginWindow QPushButton:hover {{ background-color: {ACCENT_HOVER}; }}
+#LoginWindow QPushButton:pressed {{ background-color: {ACCENT_PRESSED}; }}
+
+/* Main window: compact toolbar buttons and filters */
+#DiaryWindow QPushButton {{ padding: 8px 15px; min-width: 80px; }}
+#DiaryWindow QLineEdit, #DiaryWindow QComboBox {{ padding: 8px; }}
+
+/* Entry reader */
+#EntryViewer QTextEdit {{ padding: 15px; font-size: 14px; }}
+"""
+
+
+def apply_theme(app=None):
+    """Install the stylesheet on the application (only the first call does any work)"""
+    app = app or QApplication.instance()
+    if app is None or app.property("securediary_theme"):
+        return
+    app.setStyleSheet(STYLESHEET)
+    app.setProperty("securediary_theme", True)
+
+
+def set_style(widget, **properties):
+    """Change style properties of a visible widget and re-polish it"""
+    for name, value in properties.items():
+        widget.setProperty(name, value)
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)
@@ -0,0 +1,157 @@
+# ui/trash_ui.py
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QMessageBox, QListWidget, QListWidgetItem
+)
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QFont
+from database import ENTRY_ADDED, ENTRY_DELETED, fetch_trash
+from maintenance import trash_days
+from ui.entry_list import DiaryChanges
+from ui.theme import apply_theme
+from ui.write_status import WriteCompletion
+from utils import format_timestamp, get_mood_emoji
+from write_queue import IMMEDIATE
+
+
+class TrashWindow(QWidget):
+    """Deleted entries: restore them, or delete them for good before the trash expires them"""
+
+    def __init__(self, key, writes, parent=None):
+        super().__init__()
+        self.key = key
+        self.writes = writes  # the diary window's write_queue.WriteQueue
+        self.parent_window = parent
+        self.write_done = WriteCompletion(self)
+
+        self.setWindowTitle("🗑️ Trash")
+        self.setGeometry(500, 180, 640, 560)
+        self.setObjectName("TrashWindow")
+        apply_theme()
+
+        self.setup_ui()
+        self.load()
+
+        # Deletes and restores made elsewhere while the window is open
+        self.diary_changes = DiaryChanges(self)
+        self.diary_changes.changed.connect(self.on_diary_changed)
+
+    def setup_ui(self):
+        layout = QVBoxLayout()
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        title = QLabel("🗑️ Trash")
+        title.setFont(QFont("Segoe UI", 18, QFont.Weight.Bold))
+        title.setProperty("role", "title")
+        layout.addWidget(title)
+
+        self.summary_label = QLabel()
+        self.summary_label.setProperty("role", "muted")
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+
+        self.list = QListWidget()
+        self.list.setSelectionMode(QListWidget.SelectionMode.ExtendedSelection)
+        self.list.itemSelectionChanged.connect(self.update_buttons)
+        layout.addWidget(self.list, stretch=1)
+
+        btn_layout = QHBoxLayout()
+        self.restore_btn = QPushButton("♻️ Restore")
+        self.restore_btn.setProperty("variant", "primary")
+        self.restore_btn.clicked.connect(self.restore_selected)
+
+        self.purge_btn = QPushButton("🔥 Delete Forever")
+        self.purge_btn.setProperty("variant", "danger")
+        self.purge_btn.clicked.connect(self.purge_selected)
+
+        self.empty_btn = QPushButton("🧹 Empty Trash")
+        self.empty_btn.setProperty("variant", "caution")
+        self.empty_btn.clicked.connect(self.empty_trash)
+
+        close_btn = QPushButton("✖ Close")
+        close_btn.clicked.connect(self.close)
+
+        for b in [self.restore_btn, self.purge_btn, self.empty_btn]:
+            btn_layout.addWidget(b)
+        btn_layout.addStretch()
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+
+        self.setLayout(layout)
+
+    def load(self):
+        """(Re)read the trash"""
+        self.list.clear()
+        entries = fetch_trash(self.key)
+        for entry in entries:
+            item = QListWidgetItem(f"{get_mood_emoji(entry['mood'])} {entry['title']}\n"
+                                   f"    🗑️ Deleted {format_timestamp(entry['deleted_at'])}")
+            item.setData(Qt.ItemDataRole.UserRole, entry["id"])
+            self.list.addItem(item)
+        days = trash_days()
+        self.summary_label.setText(
+            f"{len(entries)} entr{'y' if len(entries) == 1 else 'ies'} in the trash. "
+            f"Entries are deleted for good {days} day{'' if days == 1 else 's'} after they were moved here."
+        )
+        self.empty_btn.setEnabled(bool(entries))
+        self.update_buttons()
+
+    def update_buttons(self):
+        selected = bool(self.list.selectedItems())
+        self.restore_btn.setEnabled(selected)
+        self.purge_btn.setEnabled(selected)
+
+    def selected_ids(self):
+        return [item.data(Qt.ItemDataRole.UserRole) for item in self.list.selectedItems()]
+
+    def restore_selected(self):
+        """Queue the selected entries back into the diary; the list reloads as each one commits"""
+        for entry_id in self.selected_ids():
+            self.write_done.watch(self.writes.restore_entry(entry_id, durability=IMMEDIATE), self.on_restored)
+
+    def on_restored(self, entry_id, error):
+        if error is not None:
+            QMessageBox.critical(self, "❌ Error", f"Failed to restore:\n{str(error)}")
+            self.load()
+
+    def on_diary_changed(self, change, entry_id):
+        if change in (ENTRY_ADDED, ENTRY_DELETED):
+            self.load()
+
+    def purge_selected(self):
+        ids = self.selected_ids()
+        count = f"{len(ids)} entr{'y' if len(ids) == 1 else 'ies'}"
+        reply = QMessageBox.question(
+            self,
+            "🔥 Delete Forever?",
+            f"Delete {count} for good?\n\n⚠️ This action cannot be undone!",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            self.purge(ids)
+
+    def empty_trash(self):
+        reply = QMessageBox.question(
+            self,
+            "🧹 Empty Trash?",
+            f"Delete all {self.list.count()} entries in the trash for good?\n\n⚠️ This action cannot be undone!",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            self.purge(None)
+
+    def purge(self, entry_ids):
+        # The freed space is handed back to the file system by idle maintenance (ui/scrub_task.py)
+        self.write_done.watch(self.writes.purge_trash(entry_ids, durability=IMMEDIATE), self.on_purged)
+
+    def on_purged(self, purged, error):
+        if error is not None:
+            QMessageBox.critical(self, "❌ Error", f"Failed to delete:\n{str(error)}")
+        self.load()
+
+    def closeEvent(self, event):
+        self.diary_changes.disconnect_database()
+        self.list.clear()  # decrypted titles
+        super().closeEvent(event)
@@ -0,0 +1,32 @@
+# ui/write_status.py
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+class WriteCompletion(QObject):
+    """
+    Completion signal for queued writes (write_queue.py futures): the callback
+    runs on the GUI thread once the write has committed or failed.
+    """
+
+    finished = pyqtSignal(object, object, object)  # callback, result (entry id), exception or None
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.finished.connect(self._deliver)
+
+    def watch(self, future, callback):
+        """Call callback(result, error) on the GUI thread; error is None on success"""
+        future.add_done_callback(lambda done: self._emit(done, callback))
+        return future
+
+    def _emit(self, future, callback):
+        # Called on the writer thread; the signal is queued to this object's thread
+        error = future.exception()
+        try:
+            self.finished.emit(callback, None if error else future.result(), error)
+        except RuntimeError:
+            pass  # the window was destroyed before its write finished
+
+    @staticmethod
+    def _deliver(callback, result, error):
+        callback(result, error)
@@ -0,0 +1,268 @@
+# write_queue.py
+"""
+Background write queue with group commits.
+
+A single writer thread owns one SQLite connection and applies queued
+mutations (add, update, delete, restore, purge, favorite). Callers encrypt on their own
+thread before enqueueing and get a concurrent.futures.Future back, so the
+GUI thread never waits for SQLite or the disk. Writes that arrive close
+together share one transaction, and so one journal sync, instead of one
+each. Every write runs in its own savepoint: one failing write (e.g. an
+entry deleted meanwhile) fails only its own future. An update that changes
+nothing (same fingerprint, see metadata_crypto.py) commits nothing and
+notifies no one; one that keeps the text is not encrypted again.
+
+Durability modes, per write:
+- IMMEDIATE: committed as soon as the writer reaches it
+- GROUPED:   committed with whatever else arrives within FLUSH_WINDOW_MS
+- DEFERRED:  committed with the next group, at flush() / close(), or after DEFERRED_MAX_MS
+
+Futures resolve (with the entry id) once their transaction has committed,
+and database change listeners are notified from the writer thread as with
+the synchronous API.
+
+    writes = WriteQueue(key)
+    future = writes.add_entry("Title", "Text", mood="Calm")
+    future.result()                 # entry id, after the commit
+    writes.toggle_favorite(42, durability=DEFERRED)
+    writes.close()                  # flushes everything still pending
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+import database
+import metadata_crypto
+import metrics
+
+IMMEDIATE = "immediate"
+GROUPED = "grouped"
+DEFERRED = "deferred"
+DURABILITY_MODES = (IMMEDIATE, GROUPED, DEFERRED)
+
+FLUSH_WINDOW_MS = 20      # how long a grouped write waits for company
+DEFERRED_MAX_MS = 1000    # deferred writes are committed at the latest after this
+MAX_GROUP = 500           # writes per transaction
+
+_STOP = object()
+
+
+class _Write:
+    __slots__ = ("change", "apply", "durability", "future")
+
+    def __init__(self, change, apply, durability):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability!r}")
+        self.change = change        # database.ENTRY_* notified after the commit (None: nothing changed)
+        self.apply = apply          # apply(cursor) -> entry id, run inside the transaction
+        self.durability = durability
+        self.future = Future()
+
+
+class _Flush:
+    """Marker asking the writer to commit everything before it"""
+    __slots__ = ("future",)
+
+    def __init__(self):
+        self.future = Future()
+
+
+def _fail_pending(group, error):
+    """Resolve every write of `group` that has no result yet with `error`"""
+    for write in group:
+        if not write.future.done():
+            write.future.set_exception(error)
+
+
+class WriteQueue:
+    """Single writer thread committing queued diary writes in groups; see the module docstring"""
+
+    def __init__(self, key, flush_window_ms=FLUSH_WINDOW_MS, deferred_max_ms=DEFERRED_MAX_MS,
+                 max_group=MAX_GROUP):
+        self.key = key
+        self.wait_ms = {IMMEDIATE: 0, GROUPED: flush_window_ms, DEFERRED: deferred_max_ms}
+        self.max_group = max_group
+        self._queue = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="diary-writer", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------ writes
+
+    def add_entry(self, title, content, mood=None, tags=None, created_at=None, updated_at=None,
+                  is_favorite=False, durability=GROUPED):
+        """Future of the new entry's id"""
+        self._check_open()
+        enc_content = database.encrypt_content(content, self.key)
+        sealed = database.seal_metadata(title, mood, tags, self.key)
+        fingerprint = database.entry_fingerprint(title, content, mood, tags, self.key)
+        counts = database.text_counts(content)
+        now = datetime.now()
+
+        def apply(cur):
+            return database._insert_entry(cur, title, enc_content, mood, tags, created_at or now,
+                                          updated_at or created_at or now, is_favorite, *counts, sealed, fingerprint)
+        return self._submit(_Write(database.ENTRY_ADDED, apply, durability))
+
+    def update_entry(self, entry_id, title, content, mood=None, tags=None, durability=GROUPED,
+                     base_fingerprint=None):
+        """
+        Future of the entry id. `base_fingerprint`: the entry dict's "fingerprint" when
+        the editor loaded it; if the text is still the same it is not encrypted again.
+        """
+        self._check_open()
+        key = self.key
+        fingerprint = database.entry_fingerprint(title, content, mood, tags, key)
+        base = metadata_crypto.parse_fingerprint(base_fingerprint) if base_fingerprint else None
+        same_text = base is not None and base.content == fingerprint.content
+        enc_content = None if same_text else database.encrypt_content(content, key)
+        sealed = database.seal_metadata(title, mood, tags, key)
+        counts = database.text_counts(content)
+        updated_at = datetime.now()  # when the user saved, not when the group commits
+        write = _Write(database.ENTRY_UPDATED, None, durability)
+
+        def apply(cur):
+            text = enc_content
+            if text is None:
+                stored = database._stored_fingerprint(cur.connection, entry_id)
+                if stored is None or stored.content != fingerprint.content:
+                    text = database.encrypt_content(content, key)  # changed elsewhere since it was loaded
+            if not database._update_entry(cur, entry_id, title, text, mood, tags, updated_at, *counts, sealed,
+                                          fingerprint):
+                write.change = None
+            return entry_id
+        write.apply = apply
+        return self._submit(write)
+
+    def delete_entry(self, entry_id, durability=GROUPED):
+        def apply(cur):
+            database._delete_entry(cur, entry_id)
+            return entry_id
+        return self._submit(_Write(database.ENTRY_DELETED, apply, durability))
+
+    def restore_entry(self, entry_id, durability=GROUPED):
+        """Future of the entry id once it is back out of the trash"""
+        def apply(cur):
+            if not database._restore_entry(cur, entry_id):
+                raise LookupError(f"Entry {entry_id} is no longer in the trash")
+            return entry_id
+        return self._submit(_Write(database.ENTRY_ADDED, apply, durability))
+
+    def purge_trash(self, entry_ids=None, durability=GROUPED):
+        """Future of how many trashed entries were deleted for good: `entry_ids`, or the whole trash"""
+        def apply(cur):
+            return len(database._purge_trash(cur, entry_ids))
+        return self._submit(_Write(None, apply, durability))
+
+    def toggle_favorite(self, entry_id, durability=GROUPED):
+        def apply(cur):
+            database._toggle_favorite(cur, entry_id)
+            return entry_id
+        return self._submit(_Write(database.ENTRY_FAVORITED, apply, durability))
+
+    def flush(self, timeout=None):
+        """Commit everything queued so far and wait for it"""
+        marker = _Flush()
+        self._submit(marker)
+        marker.future.result(timeout)
+
+    def close(self, timeout=None):
+        """Flush pending writes, stop the writer thread and forget the key (lock / window close)"""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self.key = None
+
+    def _check_open(self):
+        if self._closed:
+            raise RuntimeError("WriteQueue is closed")
+
+    def _submit(self, item):
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("WriteQueue is closed")
+            self._queue.put(item)
+        return item.future
+
+    # ------------------------------------------------------------ writer thread
+
+    def _run(self):
+        conn = database._connect()
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                group, flushes, stopping = self._collect(item)
+                try:
+                    if group:
+                        self._commit_group(conn, group)
+                except Exception as e:
+                    # Never let one group stop the writer thread; its callers get the error
+                    _fail_pending(group, e)
+                for marker in flushes:
+                    marker.future.set_result(None)
+        finally:
+            conn.close()
+
+    def _collect(self, first):
+        """
+        A group of writes starting with `first`: waits while the group's earliest deadline
+        allows, and stops early at a flush marker, close, or MAX_GROUP writes.
+        Returns (writes, flush markers reached, stop requested).
+        """
+        group, flushes = [], []
+        deadline = None
+        item = first
+        while True:
+            if item is _STOP:
+                return group, flushes, True
+            if isinstance(item, _Flush):
+                flushes.append(item)
+                return group, flushes, False
+            group.append(item)
+            item_deadline = time.monotonic() + self.wait_ms[item.durability] / 1000
+            deadline = item_deadline if deadline is None else min(deadline, item_deadline)
+            if len(group) >= self.max_group:
+                return group, flushes, False
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                return group, flushes, False
+
+    @metrics.timed("write_queue.commit_group")
+    def _commit_group(self, conn, group):
+        cur = conn.cursor()
+        done = []
+        try:
+            # Explicit: a savepoint outside a transaction would commit on release
+            cur.execute("BEGIN")
+            for write in group:
+                cur.execute("SAVEPOINT queued_write")
+                try:
+                    entry_id = write.apply(cur)
+                except Exception as e:
+                    cur.execute("ROLLBACK TO queued_write")
+                    cur.execute("RELEASE queued_write")
+                    write.future.set_exception(e)
+                    continue
+                cur.execute("RELEASE queued_write")
+                done.append((write, entry_id))
+            database._commit(conn)
+        except Exception as e:
+            conn.rollback()
+            _fail_pending(group, e)  # the whole group, not only the writes applied before the error
+            return
+        metrics.incr("write_queue.groups")
+        metrics.incr("write_queue.writes", len(done))
+        for write, entry_id in done:
+            write.future.set_result(entry_id)
+            if write.change is not None:
+                database._notify(write.change, entry_id)